@@ -0,0 +1,121 @@
+"""
+Process-wide cache of router/policy classifier decisions.
+
+Short follow-ups ("继续", "yes", "apply it", "keep going") recur constantly and
+used to cost an LLM round-trip in the router's CHAT/TASK prompt and again in the
+write-authorization prompt. Decisions are memoized under the inputs the prompt
+actually sees:
+
+- intent:     normalized user text + digest of the previous AI message
+- write_auth: normalized user text only (the prompt has no other context),
+              so those entries are shared across sessions
+
+plus agent_mode and the model id. Entries expire after a TTL so prompt or
+model-side drift cannot pin a stale verdict forever.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+
+# Long, one-off messages never repeat; caching them only churns the LRU.
+MAX_CACHED_TEXT_CHARS = 500
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Trailing punctuation that does not change meaning. A question mark does ("delete
+# it?" must not reuse the verdict for "delete it"), so it is folded to one "?" instead.
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s!.。,，~?]+$")
+
+DecisionKey = Tuple[str, str, str, str, str]
+
+
+def normalize_decision_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    # NFKC already mapped full-width ！～？ to their ASCII forms.
+    match = _TRAILING_PUNCTUATION_RE.search(text)
+    if not match:
+        return text
+    return text[:match.start()] + ("?" if "?" in match.group(0) else "")
+
+
+def context_digest(text: str) -> str:
+    if not text:
+        return ""
+    return hashlib.sha1(normalize_decision_text(text).encode("utf-8")).hexdigest()[:16]
+
+
+def model_id_of(llm: Any) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
+
+
+class DecisionCache:
+    """Bounded LRU with per-entry TTL and per-kind hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: "OrderedDict[DecisionKey, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def key(self, kind: str, user_text: str, context: str = "", agent_mode: str = "", model_id: str = "") -> Optional[DecisionKey]:
+        """Cache key, or None when the text is empty or too long to be worth caching."""
+        normalized = normalize_decision_text(user_text)
+        if not normalized or len(normalized) > MAX_CACHED_TEXT_CHARS:
+            return None
+        return (kind, normalized, context_digest(context), agent_mode or "", model_id or "")
+
+    def _count(self, kind: str, field: str) -> None:
+        self.counters.setdefault(kind, {"hits": 0, "misses": 0, "expired": 0})[field] += 1
+
+    def get(self, key: Optional[DecisionKey]) -> Optional[Any]:
+        if key is None or self.max_entries == 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self._count(key[0], "expired")
+                entry = None
+            if entry is None:
+                self._count(key[0], "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(key[0], "hits")
+            return entry[0]
+
+    def put(self, key: Optional[DecisionKey], value: Any) -> None:
+        if key is None or self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_kind = {}
+            for kind, counts in self.counters.items():
+                lookups = counts["hits"] + counts["misses"]
+                by_kind[kind] = {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else None}
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "kinds": by_kind,
+            }
+
+
+decision_cache = DecisionCache(settings.DECISION_CACHE_SIZE, settings.DECISION_CACHE_TTL_SECONDS)
@@ -11,21 +11,32 @@ It implements a production-grade ReAct pattern with:
 Architecture:
     START  -> router  -> [fast_chat  -> END]
                     -> [agent  -> tools  -> agent...]  -> END
+
+Tools run one per agent step, except that a batch of independent read-only
+calls (e.g. reading two notes to compare them) runs concurrently in one step.
 """
+import asyncio
 import json
 import hashlib
 import os
+import time
 from typing import Literal, Optional, Callable, Any, TypedDict
 import re
 import uuid
 
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.types import interrupt
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 
+from agent.decision_cache import decision_cache, model_id_of
+from agent.history_budget import CompactedHistory, compact_history
+from agent.intent_classifier import get_intent_classifier
+from agent.prefetch import SEARCH_TOP_K, note_key, search_key, tool_session, turn_prefetch
 from agent.state import NoteAgentState
+from agent.tool_memo import tool_memo
 from core.llm import get_llm
 from core.config import settings
 
@@ -54,6 +65,13 @@ DOOM_LOOP_THRESHOLD = 3  # Same tool+input triggers safety stop (OpenCode style)
 # Write operations: success = workflow done
 WRITE_TOOLS = {"delete_note", "create_note", "rename_note", "update_note", "set_note_category"}
 
+# Side-effect-free tools that may run concurrently when emitted in one step.
+# An explicit allow-list: anything not listed here keeps the one-at-a-time path.
+PARALLEL_SAFE_TOOLS = {"search_knowledge", "read_note_content", "list_recent_notes", "list_categories"}
+
+# Router/policy classifier calls: their labels must never reach the token stream.
+INTERNAL_LLM_CONFIG = {"tags": [TAG_NOSTREAM], "run_name": "internal_classifier"}
+
 
 class ToolPolicyDecision(TypedDict):
     action: Literal["allow", "deny"]
@@ -120,10 +138,13 @@ class NoteAgentGraph:
         self.checkpointer = checkpointer  # Will be set during build()
         
         # Bind tools to LLM for function calling
-        # parallel_tool_calls=False forces sequential execution: chat  -> tool  -> chat  -> tool
-        self.model_with_tools = self.llm.bind_tools(tools, parallel_tool_calls=False)
+        # parallel_tool_calls=False forces sequential execution: chat  -> tool  -> chat  -> tool.
+        # With PARALLEL_READ_TOOLS the model may batch reads; _coerce_tool_calls still
+        # keeps write tools to one call per step.
+        parallel = settings.PARALLEL_READ_TOOLS
+        self.model_with_tools = self.llm.bind_tools(tools, parallel_tool_calls=parallel)
         # Read-only binding to reduce accidental write tool selection for non-write intents.
-        self.model_with_read_tools = self.llm.bind_tools(self.read_only_tools, parallel_tool_calls=False)
+        self.model_with_read_tools = self.llm.bind_tools(self.read_only_tools, parallel_tool_calls=parallel)
         
     async def build(self, checkpointer=None) -> StateGraph:
         """
@@ -146,6 +167,7 @@ class NoteAgentGraph:
         # NEW: 3-node tool execution for chat-tool-chat pattern
         workflow.add_node("pick_one_tool", self._pick_one_tool_node)
         workflow.add_node("run_one_tool", self._run_one_tool_node)
+        workflow.add_node("run_read_tools", self._run_read_tools_node)
         workflow.add_node("status", self._status_node)
         
         # ====== Add Edges ======
@@ -175,9 +197,17 @@ class NoteAgentGraph:
             }
         )
         
-        # pick_one_tool  -> run_one_tool  -> status  -> agent (loop)
-        workflow.add_edge("pick_one_tool", "run_one_tool")
+        # pick_one_tool  -> run_one_tool | run_read_tools  -> status  -> agent (loop)
+        workflow.add_conditional_edges(
+            "pick_one_tool",
+            self._route_picked_tools,
+            {
+                "single": "run_one_tool",
+                "batch": "run_read_tools"
+            }
+        )
         workflow.add_edge("run_one_tool", "status")
+        workflow.add_edge("run_read_tools", "status")
         workflow.add_edge("status", "agent")
         
         # ====== Compile with Checkpointer ======
@@ -189,55 +219,111 @@ class NoteAgentGraph:
     # NODE IMPLEMENTATIONS
     # ========================================================================
     
-    def _router_node(self, state: NoteAgentState) -> dict:
+    async def _router_node(self, state: NoteAgentState) -> dict:
         """
-        Intent classification node.
-        Determines whether to use fast chat or tool-using agent.
+        Intent classification node (turn pre-pass).
+        Determines whether to use fast chat or tool-using agent, and decides
+        write authorization for the turn in the same step.
+
+        The CHAT/TASK and ALLOW/DENY classifiers are independent LLM calls, so
+        they run concurrently; the agent node reuses `write_authorized` instead
+        of classifying again.
         
         Returns:
-            {"intent": "CHAT" | "TASK"}
+            {"intent": "CHAT" | "TASK", "write_authorized": bool, "prepass_ms": float}
         """
+        start = time.perf_counter()
+        messages = state.get("messages", [])
+        interaction_mode = str(state.get("agent_mode", "agent") or "agent").strip().lower()
+
+        # Predictable reads start now and overlap with the classifier calls below.
+        self._start_prefetch(state, messages)
+
+        async def _write_authorization() -> bool:
+            # Ask mode is read-only whatever the user says; skip the classifier.
+            if interaction_mode == "ask":
+                return False
+            return await self._classify_write_authorization(messages)
+
+        def _result(intent: str, write_authorized: bool, reason: str) -> dict:
+            prepass_ms = round((time.perf_counter() - start) * 1000, 1)
+            safe_print(
+                f"[ROUTER] Pre-pass {intent} write={'ALLOW' if write_authorized else 'DENY'} "
+                f"({reason}) in {prepass_ms} ms"
+            )
+            return {"intent": intent, "write_authorized": write_authorized, "prepass_ms": prepass_ms}
+
         # ========== Force TASK if use_knowledge is flagged (@) ==========
         if state.get("use_knowledge"):
-            return {"intent": "TASK"}
+            return _result("TASK", await _write_authorization(), "knowledge search requested")
 
-        messages = state.get("messages", [])
         if not messages:
-            return {"intent": "TASK"}
+            return _result("TASK", False, "no messages")
         
         last_message = messages[-1]
         if not hasattr(last_message, 'content'):
-            return {"intent": "TASK"}
+            return _result("TASK", await _write_authorization(), "non-text message")
         
         query = self._extract_text_content(last_message.content)
         has_image_input = self._message_has_image_content(last_message.content)
         has_attachment_context = bool(str(state.get("attachment_context") or "").strip())
 
+        # ========== LOCAL FAST PATH ==========
+        # Rules + a small model trained on logged router decisions. Image/attachment
+        # turns always need the write classifier, so they go straight to the LLMs.
+        classifier = get_intent_classifier()
+        local_decision = None
+        if classifier.mode != "off" and not has_image_input and not has_attachment_context:
+            local_decision = classifier.classify(query)
+            if classifier.mode == "on" and classifier.is_confident(local_decision):
+                classifier.record_fast_path()
+                reason = f"local {local_decision.source} {local_decision.confidence:.2f}"
+                if local_decision.intent == "CHAT":
+                    # fast_chat binds no tools, so write authorization is moot.
+                    return _result("CHAT", False, reason)
+                return _result("TASK", await _write_authorization(), reason)
+
+        # ========== MODERN SEMANTIC ROUTING ==========
+        # No more fragile keywords. We use the LLM to analyze the FULL context.
+        llm_intent, write_authorized = await asyncio.gather(
+            self._classify_intent(messages, query, interaction_mode),
+            _write_authorization(),
+        )
+        # Only real LLM verdicts train/score the local classifier, never the failure default.
+        intent = llm_intent or "TASK"
+        if llm_intent and classifier.mode != "off" and not has_image_input and not has_attachment_context:
+            await asyncio.to_thread(classifier.record_llm_decision, query, llm_intent, local_decision)
+
         # Vision-first routing:
         # If the user attached an image and did not explicitly authorize a write operation,
         # route to CHAT path to avoid unnecessary tool-binding on multimodal turns.
         # Some OpenAI-compatible providers can degrade image handling when tools are bound.
-        if has_image_input and not state.get("use_knowledge"):
-            if not self._classify_write_authorization(messages):
-                safe_print("[ROUTER] Image input detected without write intent -> CHAT")
-                return {"intent": "CHAT"}
+        if has_image_input and not write_authorized:
+            return _result("CHAT", False, "image input without write intent")
 
         # File/image attachment question turns should default to CHAT unless
         # the user explicitly authorizes a write operation.
-        if has_attachment_context and not state.get("use_knowledge"):
-            if not self._classify_write_authorization(messages):
-                safe_print("[ROUTER] Attachment context detected without write intent -> CHAT")
-                return {"intent": "CHAT"}
-        
-        # ========== MODERN SEMANTIC ROUTING ==========
-        # No more fragile keywords. We use the LLM to analyze the FULL context.
+        if has_attachment_context and not write_authorized:
+            return _result("CHAT", False, "attachment context without write intent")
+
+        return _result(intent, write_authorized, "context-aware intent")
+
+    async def _classify_intent(self, messages: list, query: str, agent_mode: str = "agent") -> Optional[str]:
+        """LLM CHAT/TASK classification of the latest user message in context; None if the call failed."""
         context_summary = f"User just said: '{query}'"
+        prev_text = ""
         if len(messages) > 1:
             prev_msg = messages[-2]
             if hasattr(prev_msg, 'content'):
                 prev_text = self._extract_text_content(prev_msg.content)
                 context_summary = f"Context: Last AI said '{prev_text}'. Now user says: '{query}'"
 
+        # Same text after the same AI message -> same verdict ("继续", "yes", "keep going").
+        cache_key = decision_cache.key("intent", query, prev_text, agent_mode, model_id_of(self.llm))
+        cached = decision_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         classification_prompt = """
         You are the Intent Router for LmNotebook (assistant name: Origin). 
         Analyze the conversation to decide if the next step should be a casual CHAT or a functional TASK.
@@ -253,21 +339,54 @@ class NoteAgentGraph:
         """
         
         try:
-            resp = self.llm.invoke([
-                HumanMessage(content=classification_prompt.format(context=context_summary))
-            ])
-            intent = resp.content.strip().upper()
-            safe_print(f"[ROUTER] Context-aware intent: {intent}")
-            return {"intent": "TASK" if "TASK" in intent else "CHAT"}
+            resp = await self.llm.ainvoke(
+                [HumanMessage(content=classification_prompt.format(context=context_summary))],
+                config=INTERNAL_LLM_CONFIG,
+            )
+            intent = "TASK" if "TASK" in resp.content.strip().upper() else "CHAT"
+            decision_cache.put(cache_key, intent)
+            return intent
         except Exception as e:
             safe_print(f"[ROUTER] Error in classification: {e}")
-            return {"intent": "TASK"} # Default to TASK to be safe
+            return None  # caller defaults to TASK to be safe
     
+    def _start_prefetch(self, state: NoteAgentState, messages: list) -> None:
+        """
+        Speculatively load what the tools will probably ask for this turn (see
+        agent/prefetch.py): the referenced/active note, and the knowledge search
+        for the user's text when @knowledge is on.
+        """
+        if not settings.SPECULATIVE_PREFETCH:
+            return
+        session_id = str(state.get("session_id") or "")
+        turn_prefetch.begin_turn(session_id)
+        try:
+            from services.note_service import NoteService
+            from services.rag_service import RAGService
+
+            note_id = state.get("context_note_id") or state.get("active_note_id")
+            if note_id:
+                turn_prefetch.start(session_id, note_key(note_id), lambda: NoteService().get_note(note_id))
+
+            if state.get("use_knowledge"):
+                query = next(
+                    (self._extract_text_content(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)),
+                    "",
+                ).strip()
+                if query:
+                    turn_prefetch.start(
+                        session_id,
+                        search_key(query),
+                        lambda: RAGService().search(query, top_k=SEARCH_TOP_K),
+                    )
+        except Exception as e:
+            safe_print(f"[PREFETCH] Failed to start speculative reads: {e}")
+
     def _route_by_intent(self, state: NoteAgentState) -> Literal["CHAT", "TASK"]:
         """Conditional routing based on intent."""
         return state.get("intent", "TASK")
     
-    def _fast_chat_node(self, state: NoteAgentState) -> dict:
+    async def _fast_chat_node(self, state: NoteAgentState) -> dict:
         """
         Fast chat node - Direct LLM response without tools.
         For general knowledge questions.
@@ -315,12 +434,14 @@ class NoteAgentGraph:
                     )
                 )
             )
-        messages += filtered_messages
+        compacted = await self._budget_history(state, filtered_messages)
+        messages += compacted.messages
 
-        response = self.llm.invoke(messages)
-        return {"messages": [response]}
+        # Awaited on the event loop; tokens reach the "messages" stream as they arrive.
+        response = await self.llm.ainvoke(messages)
+        return {"messages": [response], **compacted.updates}
     
-    def _agent_node(self, state: NoteAgentState) -> dict:
+    async def _agent_node(self, state: NoteAgentState) -> dict:
         """
         Main agent node - LLM with tool binding.
         Handles reasoning and tool call decisions.
@@ -401,11 +522,12 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         lang = self._detect_user_language(filtered_history)
         lang_instruction = SystemMessage(content=f"Always respond in the user's language ({lang}).")
 
+        compacted = await self._budget_history(state, filtered_history)
         messages = [
             SystemMessage(content=SUPERVISOR_PROMPT),
             SystemMessage(content=f"[当前上下文]\n{context_msg}"),
             lang_instruction,
-        ] + filtered_history
+        ] + compacted.messages
         
         # Check if we're at max turns
         tool_count = state.get("tool_call_count", 0)
@@ -430,11 +552,14 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
                 )
             )
         else:
-            write_authorized = self._classify_write_authorization(filtered_history)
+            # Decided by the router pre-pass; classify here only if it did not run.
+            write_authorized = state.get("write_authorized")
+            if write_authorized is None:
+                write_authorized = await self._classify_write_authorization(filtered_history)
         model_for_turn = self.model_with_tools if write_authorized else self.model_with_read_tools
 
         # Invoke LLM with tools
-        response = model_for_turn.invoke(messages)
+        response = await model_for_turn.ainvoke(messages)
 
         # Standard tool-loop guard:
         # Only force tool call on turns that are truly tool-required.
@@ -454,14 +579,14 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
                     )
                 )
             ]
-            forced_response = model_for_turn.invoke(forced_messages)
+            forced_response = await model_for_turn.ainvoke(forced_messages)
             if hasattr(forced_response, "tool_calls") and forced_response.tool_calls:
                 response = forced_response
 
         # Hard policy alignment: in ask mode, never allow write tool calls to proceed.
         # Some providers may still hallucinate write tool names even when bound to read-only tools.
         if interaction_mode == "ask":
-            response = self._enforce_ask_mode_response(
+            response = await self._enforce_ask_mode_response(
                 response=response,
                 base_messages=messages,
                 model_for_turn=model_for_turn,
@@ -475,17 +600,19 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
 
         # Critical integrity guard:
         # Some providers may still emit multiple tool calls in a single assistant turn.
-        # This workflow executes one tool at a time; keeping extra tool_calls in history
-        # causes provider-side "tool_calls must be followed by tool messages" errors.
-        response = self._coerce_single_tool_call(response)
+        # This workflow executes one tool (or one read-only batch) per step; keeping extra
+        # tool_calls in history causes provider-side "tool_calls must be followed by tool
+        # messages" errors.
+        response = self._coerce_tool_calls(response)
         response = self._strip_pre_tool_content(response)
         
         return {
             "messages": [response],
             "write_authorized": write_authorized,
+            **compacted.updates,
         }
 
-    def _enforce_ask_mode_response(
+    async def _enforce_ask_mode_response(
         self,
         response: AIMessage,
         base_messages: list,
@@ -514,7 +641,7 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
                 )
             )
         ]
-        retry_response = model_for_turn.invoke(retry_messages)
+        retry_response = await model_for_turn.ainvoke(retry_messages)
 
         retry_calls = list(getattr(retry_response, "tool_calls", []) or [])
         retry_has_write = any((tc or {}).get("name", "") in WRITE_TOOLS for tc in retry_calls)
@@ -537,30 +664,44 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         )
         return AIMessage(content=content, tool_calls=cleaned_calls)
 
-    def _coerce_single_tool_call(self, response: AIMessage) -> AIMessage:
+    def _coerce_tool_calls(self, response: AIMessage) -> AIMessage:
         """
-        Keep at most one tool_call in assistant response history.
+        Keep only the tool_calls this step will execute in assistant response history.
 
-        The graph runs tools sequentially (one tool per loop). If multiple tool_calls
-        are persisted in one AIMessage but only one ToolMessage is produced, future
-        model calls can fail strict provider validation.
+        The graph runs tools sequentially (one tool per loop), except for a leading run
+        of read-only calls (PARALLEL_SAFE_TOOLS) which executes as one concurrent batch.
+        Anything after that (e.g. a write) is dropped and re-issued by the model next
+        step. If tool_calls were persisted in one AIMessage without a ToolMessage each,
+        future model calls could fail strict provider validation.
         """
         tool_calls = list(getattr(response, "tool_calls", []) or [])
         if not tool_calls:
             return response
 
-        first_call = self._normalize_tool_call(tool_calls[0])
-        if len(tool_calls) > 1:
+        kept_calls = [self._normalize_tool_call(tc) for tc in tool_calls[:self._parallel_batch_size(tool_calls)]]
+        if len(tool_calls) > len(kept_calls):
             safe_print(
-                f"[AGENT] Coercing multi-tool response -> single tool call: "
-                f"kept={first_call.get('name', 'unknown')} dropped={len(tool_calls) - 1}"
+                f"[AGENT] Coercing multi-tool response: "
+                f"kept={[tc.get('name', 'unknown') for tc in kept_calls]} "
+                f"dropped={len(tool_calls) - len(kept_calls)}"
             )
         return AIMessage(
             content=getattr(response, "content", ""),
-            tool_calls=[first_call],
+            tool_calls=kept_calls,
             additional_kwargs=getattr(response, "additional_kwargs", {}) or {},
         )
 
+    def _parallel_batch_size(self, tool_calls: list) -> int:
+        """Number of leading tool_calls that may run together (always at least one)."""
+        if not settings.PARALLEL_READ_TOOLS:
+            return 1
+        size = 0
+        for tc in tool_calls[:max(1, settings.MAX_PARALLEL_TOOL_CALLS)]:
+            if (tc or {}).get("name", "") not in PARALLEL_SAFE_TOOLS:
+                break
+            size += 1
+        return max(1, size)
+
     def _normalize_tool_call(self, tool_call: dict) -> dict:
         """Ensure tool_call has stable shape and non-empty id for provider compatibility."""
         normalized = dict(tool_call or {})
@@ -651,6 +792,48 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
             additional_kwargs=getattr(response, "additional_kwargs", {}) or {},
         )
 
+    async def _budget_history(self, state: NoteAgentState, history: list) -> CompactedHistory:
+        """Bound the history sent to the LLM; see agent/history_budget.py."""
+        compacted = await compact_history(
+            history,
+            summary=state.get("history_summary"),
+            summary_until_id=state.get("history_summary_until_id"),
+            budget_tokens=settings.HISTORY_TOKEN_BUDGET,
+            recent_turns=settings.HISTORY_RECENT_TURNS,
+            summary_max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+            summarize=self._summarize_history,
+        )
+        if compacted.updates.get("history_summary"):
+            safe_print(f"[HISTORY] Rolled older turns into summary; prompt history ~{compacted.tokens} tokens")
+        return compacted
+
+    async def _summarize_history(self, previous: Optional[str], messages: list) -> str:
+        """Fold older messages into the running conversation summary (internal LLM call)."""
+        transcript = []
+        for m in messages:
+            text = " ".join(self._extract_text_content(getattr(m, "content", "")).split())
+            if isinstance(m, HumanMessage):
+                transcript.append(f"User: {text[:1500]}")
+            elif isinstance(m, ToolMessage):
+                transcript.append(f"Tool {getattr(m, 'name', '') or 'tool'}: {text[:300]}")
+            elif isinstance(m, AIMessage):
+                calls = ", ".join(tc.get("name", "") for tc in (m.tool_calls or []))
+                if text:
+                    transcript.append(f"Assistant: {text[:800]}")
+                if calls:
+                    transcript.append(f"Assistant called: {calls}")
+        prompt = (
+            "Update the running summary of a conversation between a user and a notes assistant.\n"
+            "Keep: the user's goals and preferences, decisions made, note IDs/titles and categories "
+            "that were read or changed, results of write operations, and anything still pending.\n"
+            "Drop pleasantries and verbatim note text. Write in the user's language, as short bullet points, "
+            f"at most {settings.HISTORY_SUMMARY_MAX_TOKENS // 2} words.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\n"
+            "New messages:\n" + "\n".join(transcript) + "\n\nUpdated summary:"
+        )
+        resp = await self.llm.ainvoke([HumanMessage(content=prompt)], config=INTERNAL_LLM_CONFIG)
+        return str(getattr(resp, "content", "") or "")
+
     def _sanitize_history_for_provider(self, messages: list) -> list:
         """
         Remove malformed or orphan tool-call metadata from history before passing
@@ -698,21 +881,30 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
     def _pick_one_tool_node(self, state: NoteAgentState) -> dict:
         """
         Pick only the FIRST tool_call from agent output.
-        Discards additional tool_calls to force one-at-a-time execution.
+        Discards additional tool_calls to force one-at-a-time execution, unless the
+        calls form a read-only batch (see _coerce_tool_calls), which runs as a whole.
         """
         messages = state.get("messages", [])
         if not messages:
-            return {"next_tool_call": None}
+            return {"next_tool_call": None, "next_tool_batch": None}
         
         last_message = messages[-1]
         
         if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-            return {"next_tool_call": None}
+            return {"next_tool_call": None, "next_tool_batch": None}
         
+        tool_calls = list(last_message.tool_calls)
+        if len(tool_calls) > 1 and self._parallel_batch_size(tool_calls) == len(tool_calls):
+            batch = [self._normalize_tool_call(tc) for tc in tool_calls]
+            return {"next_tool_call": None, "next_tool_batch": batch}
+
         # Take only the first tool_call
-        first_tool = self._normalize_tool_call(last_message.tool_calls[0])
+        first_tool = self._normalize_tool_call(tool_calls[0])
         
-        return {"next_tool_call": first_tool}
+        return {"next_tool_call": first_tool, "next_tool_batch": None}
+
+    def _route_picked_tools(self, state: NoteAgentState) -> Literal["single", "batch"]:
+        return "batch" if state.get("next_tool_batch") else "single"
     
     async def _run_one_tool_node(self, state: NoteAgentState) -> dict:
         """
@@ -769,7 +961,7 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         ).hexdigest()
 
         # Global write-policy safety gate: centralized decision before approval/execution.
-        policy_decision = self._evaluate_tool_policy(
+        policy_decision = await self._evaluate_tool_policy(
             state=state,
             tool_name=current_tool_name,
             tool_args=tool_args,
@@ -830,22 +1022,21 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
                     "next_tool_call": None,
                 }
         
-        # Create a minimal state for single tool execution
-        # We need to create an AIMessage with just this one tool_call
-        single_tool_message = AIMessage(content="", tool_calls=[next_tool_call])
-        mini_state = {"messages": [single_tool_message]}
-        
-        # Execute via ToolNode
-        result = await self.tool_node.ainvoke(mini_state)
+        # Execute via ToolNode (repeat reads are served from the thread's tool memo)
+        tool_messages = await self._invoke_tool_call(next_tool_call, str(state.get("session_id") or ""))
         
         # Detect success
-        tool_messages = result.get("messages", [])
         tool_success = False
         tool_result_content = ""
         if tool_messages:
             last_tool_msg = tool_messages[-1]
             tool_result_content = getattr(last_tool_msg, 'content', str(last_tool_msg))
             tool_success = not tool_result_content.strip().startswith("Error:")
+
+        # Speculative search results may predate this write; notes revalidate on read.
+        if current_tool_name not in PARALLEL_SAFE_TOOLS:
+            turn_prefetch.discard(str(state.get("session_id") or ""), kind="search")
+            tool_memo.invalidate_write(current_tool_name, tool_args)
         
         # Don't set workflow_done here - let agent decide when done
         # This allows multi-step tasks to continue
@@ -859,6 +1050,125 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
             "next_tool_call": None,  # Clear after execution
         }
 
+    async def _run_read_tools_node(self, state: NoteAgentState) -> dict:
+        """
+        Execute a batch of independent read-only tool calls concurrently.
+
+        Only PARALLEL_SAFE_TOOLS reach this node, so the write policy and approval
+        gate do not apply. Identical calls run once; every call still gets its own
+        ToolMessage, in the original call order.
+        """
+        batch = list(state.get("next_tool_batch") or [])
+        if not batch:
+            return {"messages": [], "next_tool_batch": None}
+
+        tool_call_count = state.get("tool_call_count", 0)
+        history = state.get("messages", [])
+        user_text = self._get_last_user_text(history)
+
+        # Same context-note guard as the single-tool path.
+        context_note_id = state.get("context_note_id")
+        force_context_read = bool(context_note_id) and self._is_referenced_note_content_query(user_text, state)
+
+        calls = []
+        for raw_call in batch:
+            call = self._normalize_tool_call(raw_call)
+            tool_name = call.get("name", "")
+            tool_args = call.get("args", {}) or {}
+            if force_context_read and tool_name != "read_note_content":
+                tool_name, tool_args = "read_note_content", {"note_id": context_note_id}
+            tool_args = self._normalize_note_id_args(tool_args, state, tool_name, history=history)
+            calls.append({**call, "name": tool_name, "args": tool_args})
+
+        call_keys = [json.dumps([c["name"], c["args"]], sort_keys=True) for c in calls]
+        batch_hash = hashlib.md5(json.dumps(call_keys).encode()).hexdigest()
+        last_call_name = calls[-1]["name"]
+
+        # Doom loop: the same batch again counts as one repeated step, like a single tool.
+        if last_call_name == state.get("last_tool_name") and batch_hash == state.get("last_tool_input_hash"):
+            consecutive = tool_call_count + 1
+            if consecutive >= DOOM_LOOP_THRESHOLD:
+                return {
+                    "messages": [
+                        ToolMessage(
+                            content=f"[DOOM LOOP DETECTED] Tool {c['name']} called repeatedly ({consecutive}); workflow stopped.",
+                            tool_call_id=c["id"],
+                        )
+                        for c in calls
+                    ],
+                    "tool_call_count": consecutive,
+                    "next_tool_batch": None,
+                }
+
+        unique_calls = {}
+        for key, call in zip(call_keys, calls):
+            unique_calls.setdefault(key, call)
+
+        session_id = str(state.get("session_id") or "")
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._invoke_tool_call(call, session_id) for call in unique_calls.values()),
+            return_exceptions=True,
+        )
+        outputs = {}
+        for key, result in zip(unique_calls, results):
+            if isinstance(result, BaseException) or not result:
+                error = result if isinstance(result, BaseException) else "tool returned no result"
+                outputs[key] = ToolMessage(content=f"Error: {error}", tool_call_id=unique_calls[key]["id"])
+            else:
+                outputs[key] = result[-1]
+        safe_print(
+            f"[TOOLS] Ran {len(unique_calls)} read-only tool(s) concurrently for {len(calls)} call(s) "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+        tool_messages = [
+            ToolMessage(
+                content=self._extract_text_content(outputs[key].content),
+                tool_call_id=call["id"],
+                name=call["name"],
+                additional_kwargs=dict(outputs[key].additional_kwargs or {}),
+            )
+            for key, call in zip(call_keys, calls)
+        ]
+        return {
+            "messages": tool_messages,
+            "tool_call_count": tool_call_count + len(calls),
+            "last_tool_name": last_call_name,
+            "last_tool_input_hash": batch_hash,
+            "last_tool_success": not any(m.content.strip().startswith("Error:") for m in tool_messages),
+            "next_tool_batch": None,
+        }
+
+    async def _invoke_tool_call(self, tool_call: dict, session_id: str = "") -> list:
+        """
+        Run one tool call through the ToolNode and return its ToolMessages.
+        Read-only results are memoized per thread (agent/tool_memo.py); a memo hit
+        is marked with additional_kwargs["cached"] for the UI.
+        """
+        tool_name = tool_call.get("name", "")
+        tool_args = tool_call.get("args", {}) or {}
+        lookup = await tool_memo.lookup(session_id, tool_name, tool_args)
+        if lookup.content is not None:
+            safe_print(f"[TOOLS] Memo hit: {tool_name}")
+            return [ToolMessage(
+                content=lookup.content,
+                tool_call_id=tool_call.get("id", ""),
+                name=tool_name,
+                additional_kwargs={"cached": True},
+            )]
+
+        # Tools consume only this session's speculative prefetches.
+        token = tool_session.set(session_id)
+        try:
+            result = await self.tool_node.ainvoke({"messages": [AIMessage(content="", tool_calls=[tool_call])]})
+        finally:
+            tool_session.reset(token)
+        tool_messages = result.get("messages", [])
+        if tool_messages:
+            tool_memo.store(session_id, tool_name, tool_args, getattr(tool_messages[-1], "content", ""), lookup)
+        return tool_messages
+
     def _build_write_approval_payload(self, tool_name: str, tool_call: dict, tool_args: dict, state: NoteAgentState) -> dict:
         note_id = tool_args.get("note_id") or state.get("active_note_id") or state.get("context_note_id")
         note_title = state.get("active_note_title") or state.get("context_note_title")
@@ -1093,30 +1403,9 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         try:
             from services.note_service import NoteService
 
-            categories = await NoteService().get_all_categories()
-            if not categories:
-                return None
-
-            def _norm(value: str) -> str:
-                return re.sub(r"\s+", "", (value or "").strip().lower())
-
-            hint_norm = _norm(hint)
-            # 1) Exact id match
-            for c in categories:
-                cid = str(c.get("id", "") or "")
-                if _norm(cid) == hint_norm:
-                    return cid
-            # 2) Exact name match
-            for c in categories:
-                cname = str(c.get("name", "") or "")
-                if _norm(cname) == hint_norm:
-                    return str(c.get("id", "") or "")
-            # 3) Contains match
-            for c in categories:
-                cname = str(c.get("name", "") or "")
-                if hint_norm and hint_norm in _norm(cname):
-                    return str(c.get("id", "") or "")
-            return None
+            # Normalized id, then name, then "contains" - all dict lookups on the catalog.
+            catalog = await NoteService().get_category_catalog()
+            return catalog.resolve_hint(hint)
         except Exception as e:
             safe_print(f"[Agent] Failed to resolve category hint '{hint}': {e}")
             return None
@@ -1179,7 +1468,7 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
                 return True
         return False
 
-    def _evaluate_tool_policy(
+    async def _evaluate_tool_policy(
         self,
         state: NoteAgentState,
         tool_name: str,
@@ -1220,7 +1509,7 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
             }
         cached_auth = state.get("write_authorized")
         if cached_auth is None:
-            cached_auth = self._classify_write_authorization(history)
+            cached_auth = await self._classify_write_authorization(history)
 
         if cached_auth:
             return {"action": "allow", "code": "semantic_allow_write", "reason": "Semantic policy indicates explicit write authorization."}
@@ -1240,7 +1529,7 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
             "reason": "No explicit write authorization in user intent for this turn.",
         }
 
-    def _classify_write_authorization(self, history: list) -> bool:
+    async def _classify_write_authorization(self, history: list) -> bool:
         """
         Semantic write authorization for the current turn.
         Returns True only when the user explicitly authorizes persisted note changes.
@@ -1249,6 +1538,13 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         if not user_text:
             return False
 
+        # The prompt sees only the user text, so verdicts are shared across sessions.
+        # Only agent mode ever reaches this classifier (ask mode is read-only).
+        cache_key = decision_cache.key("write_auth", user_text, "", "agent", model_id_of(self.llm))
+        cached = decision_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         semantic_prompt = f"""
         You are a strict write-authorization policy classifier for a notes assistant.
         Determine whether the user EXPLICITLY authorized modifying persisted note data in this turn.
@@ -1265,17 +1561,19 @@ Do NOT use placeholders. If no ID is provided, ask for clarification.""")
         {user_text}
         """
         try:
-            resp = self.llm.invoke([HumanMessage(content=semantic_prompt)])
+            resp = await self.llm.ainvoke([HumanMessage(content=semantic_prompt)], config=INTERNAL_LLM_CONFIG)
             raw = str(getattr(resp, "content", "") or "").strip().upper()
             # Robustly parse the first control token. Some models may return
             # variants like "ALLOW..." or "ALLOW_WRITE ..." with extra text.
             token_match = re.match(r"^\s*(ALLOW_WRITE|DENY_WRITE|ALLOW|DENY)\b", raw)
             token = token_match.group(1) if token_match else ""
             if token in {"ALLOW_WRITE", "ALLOW"}:
+                decision_cache.put(cache_key, True)
                 return True
             if token in {"DENY_WRITE", "DENY"}:
+                decision_cache.put(cache_key, False)
                 return False
-            # Conservative fallback.
+            # Conservative fallback (not cached: the next turn may parse).
             return False
         except Exception as e:
             safe_print(f"[POLICY] semantic classify failed: {e}")
@@ -0,0 +1,248 @@
+"""
+Token-budgeted conversation history for the agent and fast-chat prompts.
+
+The checkpointed history grows without bound (tool outputs such as full note
+bodies included), so every turn used to resend all of it. `compact_history`
+bounds what is sent:
+
+1. Messages already rolled into the running summary are skipped.
+2. The last `recent_turns` user turns are kept verbatim.
+3. Older messages keep their shape, but large tool outputs and tool-call
+   arguments become short stubs.
+4. If that is still over budget, the oldest turns are rolled into the summary
+   (down to a low-water mark, so summarizing happens every few turns rather than
+   on every turn). The summary and the id of the first unsummarized message are
+   stored in the checkpoint, making the summary incremental.
+5. If the current turn alone exceeds the budget, earlier tool outputs are
+   stubbed and the current turn's tool results are truncated proportionally;
+   they are never stubbed, since the agent is still answering from them.
+
+Cuts only ever happen at user-message boundaries, so an AI tool call is never
+separated from its tool result.
+"""
+import math
+import re
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+# Per-message framing overhead in chat-completion prompts.
+MESSAGE_OVERHEAD_TOKENS = 4
+STUB_MIN_CHARS = 240
+# Roll history down to this share of the budget, leaving headroom for new turns.
+LOW_WATER_RATIO = 0.6
+
+Summarizer = Callable[[Optional[str], List[BaseMessage]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Tokenizer-free estimate: CJK characters are roughly one token each, other
+    text about four characters per token. Errs high for code-heavy text.
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if isinstance(item, dict):
+                if item.get("type") == "text":
+                    parts.append(str(item.get("text", "")))
+                elif item.get("type") in ("image_url", "image"):
+                    parts.append(" " * 3000)  # images are billed far above their URL length
+            else:
+                parts.append(str(item))
+        return "".join(parts)
+    return str(content or "")
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_content_text(getattr(message, "content", "")))
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(str(call.get("name", ""))) + estimate_tokens(str(call.get("args", "")))
+    return tokens
+
+
+def _stub_text(label: str, text: str) -> str:
+    head = " ".join(text[:160].split())
+    return f"[{label} elided, {len(text)} chars; starts: {head}...]"
+
+
+def stub_message(message: BaseMessage) -> BaseMessage:
+    """Shrink a large tool output or large tool-call arguments to a stub."""
+    if isinstance(message, ToolMessage):
+        text = _content_text(message.content)
+        if len(text) <= STUB_MIN_CHARS:
+            return message
+        return message.model_copy(update={"content": _stub_text(f"{message.name or 'tool'} output", text)})
+    if isinstance(message, AIMessage) and message.tool_calls:
+        changed = False
+        calls = []
+        for call in message.tool_calls:
+            args = {}
+            for key, value in (call.get("args") or {}).items():
+                if isinstance(value, str) and len(value) > STUB_MIN_CHARS:
+                    value = _stub_text(key, value)
+                    changed = True
+                args[key] = value
+            calls.append({**call, "args": args})
+        if changed:
+            return message.model_copy(update={"tool_calls": calls})
+    return message
+
+
+def clip_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Longest prefix (or suffix) of `text` whose estimate fits in `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        part = text[-mid:] if keep_end else text[:mid]
+        if estimate_tokens(part) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[-lo:] if keep_end and lo else text[:lo]
+
+
+def _truncate_message(message: BaseMessage, max_tokens: int) -> BaseMessage:
+    text = _content_text(getattr(message, "content", ""))
+    if not isinstance(getattr(message, "content", None), str) or estimate_tokens(text) <= max_tokens:
+        return message
+    marker = f"\n...[truncated, {len(text)} chars total]"
+    body = clip_to_tokens(text, max(0, max_tokens - estimate_tokens(marker) - MESSAGE_OVERHEAD_TOKENS))
+    return message.model_copy(update={"content": body + marker})
+
+
+def _turn_starts(messages: List[BaseMessage]) -> List[int]:
+    return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"[Summary of earlier conversation]\n{summary}")
+
+
+def extractive_summary(previous: Optional[str], messages: List[BaseMessage], max_tokens: int) -> str:
+    """LLM-free fallback: one line per user request / tool result, newest kept."""
+    lines = [previous] if previous else []
+    for m in messages:
+        text = " ".join(_content_text(m.content).split())
+        if isinstance(m, HumanMessage):
+            lines.append(f"- User: {text[:160]}")
+        elif isinstance(m, ToolMessage):
+            status = "error" if text.lower().startswith("error") else "ok"
+            lines.append(f"- Tool {m.name or 'tool'}: {status}")
+        elif isinstance(m, AIMessage) and text:
+            lines.append(f"- Assistant: {text[:120]}")
+    return clamp_summary("\n".join(lines), max_tokens)
+
+
+def clamp_summary(summary: str, max_tokens: int) -> str:
+    """Keep the newest part of an over-long summary."""
+    if estimate_tokens(summary) <= max_tokens:
+        return summary
+    return "..." + clip_to_tokens(summary, max_tokens - 1, keep_end=True)
+
+
+class CompactedHistory(NamedTuple):
+    messages: List[BaseMessage]          # what to send (summary message first, if any)
+    updates: Dict[str, Any]              # checkpoint fields to persist (may be empty)
+    tokens: int                          # estimated size of `messages`
+
+
+async def compact_history(
+    history: List[BaseMessage],
+    summary: Optional[str],
+    summary_until_id: Optional[str],
+    budget_tokens: int,
+    recent_turns: int,
+    summary_max_tokens: int,
+    summarize: Summarizer,
+) -> CompactedHistory:
+    updates: Dict[str, Any] = {}
+
+    # 1) Skip what the summary already covers; a missing anchor (history was edited) resets it.
+    start = 0
+    if summary and summary_until_id:
+        ids = [getattr(m, "id", None) for m in history]
+        if summary_until_id in ids:
+            start = ids.index(summary_until_id)
+        else:
+            summary, summary_until_id = None, None
+            updates.update({"history_summary": None, "history_summary_until_id": None})
+    elif summary:
+        summary = None
+        updates.update({"history_summary": None, "history_summary_until_id": None})
+    active = list(history[start:])
+
+    # 2) Recent turns verbatim, 3) older turns with stubbed tool payloads.
+    starts = _turn_starts(active)
+    window_start = starts[-recent_turns] if len(starts) >= recent_turns else (starts[0] if starts else 0)
+    older = [stub_message(m) for m in active[:window_start]]
+    recent = active[window_start:]
+
+    def _size(summary_text: Optional[str], msgs: List[BaseMessage]) -> int:
+        base = message_tokens(summary_message(summary_text)) if summary_text else 0
+        return base + sum(message_tokens(m) for m in msgs)
+
+    kept = older + recent
+    if _size(summary, kept) > budget_tokens:
+        # 4) Roll the oldest whole turns into the summary, down to the low-water mark.
+        target = int(budget_tokens * LOW_WATER_RATIO)
+        # Candidate cut points; the last one keeps just the current turn.
+        boundaries = [i for i in _turn_starts(kept) if i > 0]
+        cut = 0
+        sizes = [message_tokens(m) for m in kept]
+        remaining = sum(sizes)
+        summary_allowance = summary_max_tokens + MESSAGE_OVERHEAD_TOKENS
+        for boundary in boundaries:
+            remaining -= sum(sizes[cut:boundary])
+            cut = boundary
+            if remaining + summary_allowance <= target:
+                break
+        anchor_id = getattr(kept[cut], "id", None) if cut else None
+        if cut and anchor_id:
+            rolled = [active[i] for i in range(cut)]  # originals, not stubs: better summaries
+            try:
+                new_summary = await summarize(summary, rolled)
+            except Exception:
+                new_summary = ""
+            if not new_summary.strip():
+                new_summary = extractive_summary(summary, rolled, summary_max_tokens)
+            summary = clamp_summary(new_summary.strip(), summary_max_tokens)
+            kept = kept[cut:]
+            updates.update({"history_summary": summary, "history_summary_until_id": anchor_id})
+
+    # 5) The current turn alone may still exceed the budget (e.g. several full note reads).
+    #    Earlier turns' tool outputs become stubs; the current turn's results are never
+    #    stubbed (the agent is still working with them), only truncated proportionally.
+    starts = _turn_starts(kept)
+    turn_start = starts[-1] if starts else 0
+    if _size(summary, kept) > budget_tokens:
+        kept = [stub_message(m) for m in kept[:turn_start]] + kept[turn_start:]
+    if _size(summary, kept) > budget_tokens:
+        overflow = _size(summary, kept) - budget_tokens
+        current = [i for i in range(turn_start, len(kept)) if isinstance(kept[i], ToolMessage)]
+        tool_tokens = sum(message_tokens(kept[i]) for i in current)
+        if tool_tokens:
+            share = max(0.0, 1 - overflow / tool_tokens)
+            for i in current:
+                kept[i] = _truncate_message(kept[i], max(64, int(message_tokens(kept[i]) * share)))
+    if _size(summary, kept) > budget_tokens and kept:
+        overflow = _size(summary, kept) - budget_tokens
+        largest = max(range(len(kept)), key=lambda i: message_tokens(kept[i]))
+        allowed = max(64, message_tokens(kept[largest]) - overflow)
+        kept[largest] = _truncate_message(kept[largest], allowed)
+
+    messages = ([summary_message(summary)] if summary else []) + kept
+    return CompactedHistory(messages, updates, _size(summary, kept))
@@ -0,0 +1,341 @@
+"""
+Local fast-path intent classifier for the router (CHAT vs TASK).
+
+Two tiers run ahead of the LLM router and answer in well under a millisecond:
+
+1. Rules: greetings/thanks/closings are CHAT, an explicit note command
+   ("delete this note", "总结这篇笔记") is TASK.
+2. A small logistic-regression model over word and CJK character features,
+   trained on the (query, intent) pairs the LLM router logged on this machine.
+
+Modes (settings.INTENT_FAST_PATH_MODE):
+- "off":    not consulted.
+- "shadow": the LLM still routes every turn; local decisions are only compared
+            with it, and the agreement rates are exposed for review.
+- "on":     a decision at or above INTENT_FAST_PATH_THRESHOLD replaces the LLM
+            call; anything less confident still goes to the LLM.
+
+Training data is the (query, intent) pairs of actual LLM router verdicts, so
+the model never learns from its own (or the rules') output, nor from the TASK
+default used when the router call fails. Logging stores raw user queries in
+intent_routing_log.jsonl in the data directory and is opt-in
+(settings.INTENT_ROUTING_LOG); without it shadow mode only keeps in-memory
+agreement counters and the model is not retrained.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from core.config import settings
+
+
+# Safe print for Windows GBK encoding
+def safe_print(msg: str):
+    """Print message safely on Windows by handling encoding errors."""
+    try:
+        print(msg)
+    except UnicodeEncodeError:
+        try:
+            import sys
+            sys.stdout.buffer.write((msg + '\n').encode('utf-8', errors='replace'))
+            sys.stdout.buffer.flush()
+        except Exception:
+            print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+
+
+INTENT_LOG_FILENAME = "intent_routing_log.jsonl"
+INTENT_MODEL_FILENAME = "intent_model.json"
+INTENT_LOG_MAX_BYTES = 2 * 1024 * 1024
+MIN_TRAINING_EXAMPLES = 50
+MAX_TRAINING_EXAMPLES = 20000
+FAST_PATH_MODES = ("off", "shadow", "on")
+
+
+class IntentDecision(NamedTuple):
+    intent: str         # "CHAT" | "TASK"
+    confidence: float   # 0.5 .. 1.0
+    source: str         # "rule" | "model"
+
+
+# ========== Rule tier ==========
+
+_TRAILING_NOISE_RE = re.compile(r"[\s!！.。,，~～?？:：)）(（]+$")
+
+_CHAT_RE = re.compile(
+    r"^(?:hi|hello|hey|yo|thanks|thank you(?: so much| very much)?|thx|ty|bye|goodbye|see you|"
+    r"good (?:morning|afternoon|evening|night)|who are you|what can you do|"
+    r"你好|您好|嗨|哈喽|谢谢(?:你|啦)?|多谢|感谢|辛苦了|再见|拜拜|早上好|早安|下午好|晚上好|晚安|"
+    r"你是谁|你能做什么)(?:\s*(?:origin|啊|呀|哦|哈|!|！|~|～))*$"
+)
+
+_TASK_VERBS_ZH = r"(?:删除|删掉|删了|创建|新建|写一篇|重命名|改名|总结|概括|摘要|搜索|查找|找一下|整理|分类|归类|移到|更新|修改|编辑|改写|润色|读取|打开|列出)"
+_TASK_NOUNS_ZH = r"(?:笔记|这篇|文章|分类|知识库)"
+_TASK_ZH_RE = re.compile(rf"{_TASK_VERBS_ZH}.{{0,15}}{_TASK_NOUNS_ZH}|{_TASK_NOUNS_ZH}.{{0,15}}{_TASK_VERBS_ZH}")
+_TASK_EN_RE = re.compile(
+    r"\b(?:delete|remove|create|write|rename|summari[sz]e|search|find|list|categori[sz]e|move|"
+    r"update|edit|rewrite|read|open|organi[sz]e)\b[^.?!]{0,40}\b(?:notes?|notebook|categor(?:y|ies)|knowledge base)\b"
+)
+
+
+def _normalize_query(query: str) -> str:
+    return unicodedata.normalize("NFKC", query or "").strip().lower()
+
+
+def rule_intent(query: str) -> Optional[str]:
+    """CHAT/TASK for unambiguous queries, None otherwise."""
+    text = _normalize_query(query)
+    if not text:
+        return None
+    if _CHAT_RE.match(_TRAILING_NOISE_RE.sub("", text)):
+        return "CHAT"
+    if _TASK_ZH_RE.search(text) or _TASK_EN_RE.search(text):
+        return "TASK"
+    return None
+
+
+# ========== Linear model tier ==========
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+
+
+def intent_features(query: str) -> List[str]:
+    """Binary features: words, CJK unigrams/bigrams and a length bucket."""
+    text = _normalize_query(query)
+    features = {"bias"}
+    features.update(f"w:{word}" for word in _WORD_RE.findall(text))
+    for run in _CJK_RUN_RE.findall(text):
+        features.update(f"c:{ch}" for ch in run)
+        features.update(f"c:{run[i:i + 2]}" for i in range(len(run) - 1))
+    length = len(text)
+    features.add("len:short" if length <= 8 else "len:medium" if length <= 40 else "len:long")
+    return list(features)
+
+
+class LinearIntentModel:
+    """Logistic regression P(TASK | query) with sparse string-keyed weights."""
+
+    def __init__(self, weights: Dict[str, float], trained_on: int = 0):
+        self.weights = weights
+        self.trained_on = trained_on
+
+    def task_probability(self, query: str) -> float:
+        score = sum(self.weights.get(f, 0.0) for f in intent_features(query))
+        score = max(-30.0, min(30.0, score))
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def decide(self, query: str) -> IntentDecision:
+        p = self.task_probability(query)
+        return IntentDecision("TASK" if p >= 0.5 else "CHAT", max(p, 1.0 - p), "model")
+
+    @classmethod
+    def train(
+        cls,
+        examples: List[Tuple[str, str]],
+        epochs: int = 12,
+        learning_rate: float = 0.3,
+        l2: float = 1e-4,
+    ) -> "LinearIntentModel":
+        """Plain SGD; a few thousand short queries train in well under a second."""
+        data = [(intent_features(q), 1.0 if intent == "TASK" else 0.0) for q, intent in examples]
+        weights: Dict[str, float] = {}
+        rng = random.Random(0)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1.0 + epoch)
+            for features, label in data:
+                score = max(-30.0, min(30.0, sum(weights.get(f, 0.0) for f in features)))
+                gradient = 1.0 / (1.0 + math.exp(-score)) - label
+                for f in features:
+                    w = weights.get(f, 0.0)
+                    weights[f] = w - rate * (gradient + l2 * w)
+        return cls({f: round(w, 6) for f, w in weights.items() if abs(w) > 1e-6}, len(examples))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"version": 1, "trained_on": self.trained_on, "weights": self.weights}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "LinearIntentModel":
+        return cls(dict(data.get("weights") or {}), int(data.get("trained_on") or 0))
+
+
+# ========== Classifier ==========
+
+class IntentClassifier:
+    """Rules + linear model with LLM-decision logging and shadow-mode agreement counters."""
+
+    def __init__(self, data_dir: Optional[Path] = None):
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.model: Optional[LinearIntentModel] = None
+        self._model_loaded = False
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "local_decisions": 0,
+            "confident": 0,
+            "fast_path_used": 0,
+            "llm_fallbacks": 0,
+            "shadow_compared": 0,
+            "shadow_agreed": 0,
+            "confident_compared": 0,
+            "confident_agreed": 0,
+            "rule_compared": 0,
+            "rule_agreed": 0,
+            "model_compared": 0,
+            "model_agreed": 0,
+        }
+
+    @property
+    def mode(self) -> str:
+        mode = str(settings.INTENT_FAST_PATH_MODE or "off").strip().lower()
+        return mode if mode in FAST_PATH_MODES else "off"
+
+    @property
+    def threshold(self) -> float:
+        return float(settings.INTENT_FAST_PATH_THRESHOLD)
+
+    def _dir(self) -> Path:
+        return self.data_dir or settings.data_directory
+
+    @property
+    def log_path(self) -> Path:
+        return self._dir() / INTENT_LOG_FILENAME
+
+    @property
+    def model_path(self) -> Path:
+        return self._dir() / INTENT_MODEL_FILENAME
+
+    def _ensure_model(self) -> None:
+        if self._model_loaded:
+            return
+        self._model_loaded = True
+        try:
+            if self.model_path.exists():
+                with open(self.model_path, "r", encoding="utf-8") as f:
+                    self.model = LinearIntentModel.from_json(json.load(f))
+        except Exception as e:
+            safe_print(f"[ROUTER] Could not load intent model: {e}")
+
+    def classify(self, query: str) -> Optional[IntentDecision]:
+        """Local decision (rules, else model) or None when neither tier applies."""
+        intent = rule_intent(query)
+        if intent is not None:
+            decision = IntentDecision(intent, 1.0, "rule")
+        else:
+            self._ensure_model()
+            if self.model is None:
+                return None
+            decision = self.model.decide(query)
+        with self._lock:
+            self.counters["local_decisions"] += 1
+            if self.is_confident(decision):
+                self.counters["confident"] += 1
+        return decision
+
+    def is_confident(self, decision: Optional[IntentDecision]) -> bool:
+        return decision is not None and decision.confidence >= self.threshold
+
+    def record_fast_path(self) -> None:
+        with self._lock:
+            self.counters["fast_path_used"] += 1
+
+    def record_llm_decision(self, query: str, llm_intent: str, local: Optional[IntentDecision]) -> None:
+        """
+        Score the local decision against an LLM verdict and, if enabled, log the pair
+        for training. Blocking file I/O: call it off the event loop.
+        """
+        with self._lock:
+            if self.mode == "on":
+                self.counters["llm_fallbacks"] += 1
+            if local is not None:
+                agreed = int(local.intent == llm_intent)
+                self.counters["shadow_compared"] += 1
+                self.counters["shadow_agreed"] += agreed
+                self.counters[f"{local.source}_compared"] += 1
+                self.counters[f"{local.source}_agreed"] += agreed
+                if self.is_confident(local):
+                    # What the fast path would have decided on its own in "on" mode.
+                    self.counters["confident_compared"] += 1
+                    self.counters["confident_agreed"] += agreed
+        if settings.INTENT_ROUTING_LOG:
+            self._append_log({"query": str(query or "")[:500], "intent": llm_intent})
+
+    def _append_log(self, entry: Dict[str, Any]) -> None:
+        try:
+            path = self.log_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                if path.exists() and path.stat().st_size > INTENT_LOG_MAX_BYTES:
+                    os.replace(path, path.with_name(path.name + ".1"))
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            safe_print(f"[ROUTER] Could not log intent decision: {e}")
+
+    def load_training_examples(self) -> List[Tuple[str, str]]:
+        examples: List[Tuple[str, str]] = []
+        for path in (self.log_path.with_name(self.log_path.name + ".1"), self.log_path):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("intent") in ("CHAT", "TASK") and entry.get("query"):
+                        examples.append((entry["query"], entry["intent"]))
+        return examples[-MAX_TRAINING_EXAMPLES:]
+
+    def retrain(self, min_new_examples: int = MIN_TRAINING_EXAMPLES) -> Optional[Dict[str, Any]]:
+        """Retrain from the routing log when it grew enough; returns a summary or None."""
+        self._ensure_model()
+        examples = self.load_training_examples()
+        previous = self.model.trained_on if self.model else 0
+        if len(examples) < MIN_TRAINING_EXAMPLES or abs(len(examples) - previous) < min_new_examples:
+            return None
+        model = LinearIntentModel.train(examples)
+        correct = sum(1 for q, intent in examples if model.decide(q).intent == intent)
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.model_path.with_name(self.model_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(model.to_json(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.model_path)
+        self.model = model
+        summary = {"examples": len(examples), "train_accuracy": round(correct / len(examples), 4)}
+        safe_print(f"[ROUTER] Intent model retrained: {summary}")
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+
+        def _rate(agreed: str, compared: str) -> Optional[float]:
+            return round(counters[agreed] / counters[compared], 4) if counters[compared] else None
+
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "query_logging": bool(settings.INTENT_ROUTING_LOG),
+            "model_trained_on": self.model.trained_on if self.model else 0,
+            "agreement_rate": _rate("shadow_agreed", "shadow_compared"),
+            "confident_agreement_rate": _rate("confident_agreed", "confident_compared"),
+            "rule_agreement_rate": _rate("rule_agreed", "rule_compared"),
+            "model_agreement_rate": _rate("model_agreed", "model_compared"),
+            **counters,
+        }
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
@@ -0,0 +1,170 @@
+"""
+Speculative prefetch of tool reads, started while the router is still classifying.
+
+The router's LLM calls leave the event loop idle for hundreds of milliseconds,
+yet some tool calls are predictable from the turn state alone:
+
+- a referenced (context) or active note  -> read_note_content(note_id)
+- the @knowledge flag                     -> search_knowledge(<user text>)
+  (the agent is instructed to use the user's query as the search term)
+
+`TurnPrefetcher` starts those loads as background tasks at the top of the
+router and keeps them in a per-session, per-turn table keyed by (session id,
+what the tool will ask for). Tools `take()` a matching entry of their own
+session (awaiting it if still in flight) instead of starting the work again;
+the graph publishes the running session through `tool_session` while a tool
+executes. Every entry is used at most once, is dropped when the session's next
+turn starts or after a write tool runs in that session, and expires after
+PREFETCH_TTL_SECONDS. Unused entries are counted as wasted per
+kind so the predictions can be tuned (see /diagnostics/cache).
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from core.config import settings
+
+# Tool defaults the prefetched search must match (see agent.tools.search_knowledge).
+SEARCH_TOP_K = 5
+
+# Session (thread) id of the tool call being executed; set by the graph around each call.
+tool_session: "contextvars.ContextVar[str]" = contextvars.ContextVar("tool_session", default="")
+
+
+def safe_print(msg: str):
+    try:
+        print(msg)
+    except UnicodeEncodeError:
+        try:
+            import sys
+            sys.stdout.buffer.write((msg + '\n').encode('utf-8', errors='replace'))
+            sys.stdout.buffer.flush()
+        except Exception:
+            print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+
+
+def note_key(note_id: str) -> Tuple[str, str]:
+    return ("note", str(note_id or "").strip())
+
+
+def search_key(query: str, top_k: int = SEARCH_TOP_K, rank_mode: Optional[str] = None) -> Tuple[str, str, int, str]:
+    return ("search", " ".join(str(query or "").split()), int(top_k), rank_mode or "")
+
+
+class _Entry:
+    __slots__ = ("task", "session_id", "started")
+
+    def __init__(self, task: "asyncio.Future", session_id: str):
+        self.task = task
+        self.session_id = session_id
+        self.started = time.monotonic()
+
+
+EntryKey = Tuple[str, Hashable]  # (session id, note_key()/search_key())
+
+
+class TurnPrefetcher:
+    """In-flight and finished speculative loads per session, consumed at most once each."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: Dict[EntryKey, _Entry] = {}
+        self._sessions: Dict[str, Set[EntryKey]] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, field: str, amount: int = 1) -> None:
+        self.counters.setdefault(kind, {"started": 0, "hits": 0, "wasted": 0, "errors": 0})[field] += amount
+
+    def _drop(self, entry_key: EntryKey, wasted: bool) -> Optional[_Entry]:
+        """Remove an entry (lock held); unused entries are counted as wasted."""
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return None
+        keys = self._sessions.get(entry.session_id)
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                self._sessions.pop(entry.session_id, None)
+        if wasted:
+            self._count(entry_key[1][0], "wasted")
+            if not entry.task.done():
+                entry.task.cancel()
+        return entry
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.started > self.ttl_seconds
+
+    def begin_turn(self, session_id: str) -> None:
+        """Drop what the session's previous turn prefetched but never used."""
+        self.discard(session_id)
+
+    def start(self, session_id: str, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> bool:
+        """Start `factory()` in the background unless the session already has the same load pending."""
+        session_id = str(session_id or "")
+        entry_key = (session_id, key)
+        with self._lock:
+            for stale_key in [k for k, e in self._entries.items() if self._expired(e)]:
+                self._drop(stale_key, wasted=True)
+            if entry_key in self._entries:
+                return False
+            task = asyncio.ensure_future(factory())
+            # Failures surface (and are counted) in take(); never as "exception was never retrieved".
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._entries[entry_key] = _Entry(task, session_id)
+            self._sessions.setdefault(session_id, set()).add(entry_key)
+            self._count(key[0], "started")
+            return True
+
+    async def take(self, session_id: str, key: Hashable) -> Optional[Any]:
+        """Result of the session's pending prefetch for `key` (awaited if still running), or None."""
+        entry_key = (str(session_id or ""), key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._drop(entry_key, wasted=True)
+                return None
+            self._drop(entry_key, wasted=False)
+        try:
+            result = await entry.task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            with self._lock:
+                self._count(key[0], "errors")
+            safe_print(f"[PREFETCH] {key[0]} prefetch failed: {e}")
+            return None
+        with self._lock:
+            self._count(key[0], "hits")
+        return result
+
+    def discard(self, session_id: Optional[str] = None, kind: Optional[str] = None) -> None:
+        """Drop pending entries of one session (or all), optionally of one kind only."""
+        with self._lock:
+            if session_id is None:
+                keys = list(self._entries)
+            else:
+                keys = list(self._sessions.get(session_id, ()))
+            for entry_key in keys:
+                if kind is None or entry_key[1][0] == kind:
+                    self._drop(entry_key, wasted=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {}
+            for kind, counts in self.counters.items():
+                settled = counts["hits"] + counts["wasted"]
+                kinds[kind] = {**counts, "hit_rate": round(counts["hits"] / settled, 4) if settled else None}
+            return {
+                "enabled": settings.SPECULATIVE_PREFETCH,
+                "pending": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "kinds": kinds,
+            }
+
+
+turn_prefetch = TurnPrefetcher(settings.PREFETCH_TTL_SECONDS)
@@ -0,0 +1,240 @@
+"""
+Section-scoped editing for large notes (used by the update_note tool).
+
+A whole-document edit makes the model re-emit the entire note, so latency grows
+with note length even for a one-paragraph change, and long notes can exceed the
+completion limit. For notes above SECTION_EDIT_MIN_CHARS the edit is instead:
+
+1. split into sections at Markdown headings (never inside fenced code);
+2. planned: the model sees an outline and picks the sections to change;
+3. rewritten: adjacent picks are merged into one span, and independent spans
+   are regenerated concurrently, each through the structure guard
+   (agent/structure_guard.py);
+4. spliced back, leaving every other byte of the note untouched.
+
+`edit_sections` returns None whenever the whole-document path is the better
+fit (too small, no headings, formatting requests, or a plan touching most of
+the note), and the caller falls back to it.
+"""
+import asyncio
+import json
+import re
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agent.structure_guard import generate_markdown_edit
+from core.config import settings
+
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+# Whole-document restructuring: section edits would only reformat fragments.
+# English words are anchored on ASCII letters only ("information" is not a format
+# request), which also lets them match inside Chinese text ("帮我format一下").
+_FORMAT_REQUEST_RE = re.compile(
+    r"(?<![a-z])(?:(?:re)?format(?:s|ted|ting)?|organi[sz](?:e|ed|ing)|tidy|restructure|reorder)(?![a-z])"
+    r"|整理|排版|格式",
+    re.IGNORECASE,
+)
+
+OUTLINE_PREVIEW_CHARS = 120
+
+
+class Section(NamedTuple):
+    index: int
+    heading: str        # heading text ("" for the preamble before the first heading)
+    level: int          # 1-6, 0 for the preamble
+    text: str           # exact source text, heading line included
+
+
+class Span(NamedTuple):
+    first: int          # first section index
+    last: int           # last section index (inclusive)
+    text: str
+
+
+def split_sections(markdown_text: str) -> List[Section]:
+    """Split at ATX headings outside code fences; "".join(texts) == markdown_text."""
+    sections: List[Section] = []
+    heading, level, lines = "", 0, []
+    fence = None
+    for line in markdown_text.splitlines(keepends=True):
+        stripped = line.rstrip("\r\n")
+        fence_match = _FENCE_RE.match(stripped)
+        if fence_match:
+            marker = fence_match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+        heading_match = _HEADING_RE.match(stripped) if fence is None and not fence_match else None
+        if heading_match:
+            if lines:
+                sections.append(Section(len(sections), heading, level, "".join(lines)))
+            heading, level, lines = heading_match.group(2).strip(), len(heading_match.group(1)), []
+        lines.append(line)
+    if lines:
+        sections.append(Section(len(sections), heading, level, "".join(lines)))
+    return sections
+
+
+def outline(sections: List[Section]) -> str:
+    rows = []
+    for section in sections:
+        body = " ".join(section.text.split())
+        label = f"{'#' * section.level} {section.heading}" if section.level else "(untitled intro)"
+        rows.append(f"[{section.index}] {label} ({len(section.text)} chars): {body[:OUTLINE_PREVIEW_CHARS]}")
+    return "\n".join(rows)
+
+
+def merge_spans(sections: List[Section], picked: List[int]) -> List[Span]:
+    """Adjacent picked sections become one span, so edits across them stay coherent."""
+    spans: List[Span] = []
+    for index in sorted(set(picked)):
+        if spans and spans[-1].last == index - 1:
+            prev = spans[-1]
+            spans[-1] = Span(prev.first, index, prev.text + sections[index].text)
+        else:
+            spans.append(Span(index, index, sections[index].text))
+    return spans
+
+
+def parse_plan(text: str, section_count: int) -> Optional[List[int]]:
+    """Section indices from the planner reply ({"sections": [...]}), or None if unusable."""
+    match = _JSON_OBJECT_RE.search(str(text or ""))
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except Exception:
+        return None
+    raw = data.get("sections") if isinstance(data, dict) else None
+    if not isinstance(raw, list):
+        return None
+    picked = []
+    for value in raw:
+        try:
+            index = int(value)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= index < section_count:
+            return None
+        picked.append(index)
+    return sorted(set(picked)) or None
+
+
+def _strip_code_wrapper(text: str, original: str) -> str:
+    """Drop a ``` wrapper the model put around its answer (not one the part really has)."""
+    text = text.strip()
+    if original.lstrip().startswith("```"):
+        return text
+    if text.startswith("```markdown"):
+        return text.split("```markdown", 1)[1].rsplit("```", 1)[0].strip()
+    if text.startswith("```") and text.endswith("```") and text.count("```") == 2:
+        return text[3:-3].strip()
+    return text
+
+
+def _with_original_spacing(original: str, edited: str) -> str:
+    """Keep the span's trailing whitespace so the splice joins cleanly."""
+    trailing = original[len(original.rstrip()):]
+    return edited.rstrip() + (trailing or "")
+
+
+PLAN_PROMPT = """You plan edits to a long Markdown note.
+Given the note outline and an edit instruction, list the sections whose text must change.
+- Pick as few sections as possible.
+- To add new content, pick the section it belongs in (or the one it should follow).
+- If the change needs most of the note rewritten, pick all affected sections anyway.
+Reply with JSON only: {"sections": [<section numbers>]}"""
+
+SPAN_RULES = """
+
+SECTION EDIT MODE:
+- You are given ONE part of a larger note, plus the outline of the whole note.
+- Apply the instruction to this part only and output ONLY its replacement Markdown.
+- Start with the part's own heading line (if it has one), unchanged unless the instruction asks otherwise.
+- Do not repeat other sections."""
+
+
+async def _rewrite_span(
+    llm: Any,
+    span: Span,
+    doc_outline: str,
+    instruction: str,
+    sys_prompt: str,
+    strict_suffix: str,
+    log: Callable[[str], None],
+) -> str:
+    user_prompt = (
+        f"Outline of the whole note:\n{doc_outline}\n\n"
+        f"Part to edit (sections {span.first}-{span.last}):\n---\n{span.text}\n---\n"
+        f"Edit instruction: {instruction}\n\nOutput the edited part directly:"
+    )
+    edited = await generate_markdown_edit(
+        llm, sys_prompt + SPAN_RULES, sys_prompt + strict_suffix + SPAN_RULES, user_prompt,
+        source=span.text, clean=lambda text: _strip_code_wrapper(text, span.text), log=log,
+    )
+    return _with_original_spacing(span.text, edited)
+
+
+async def edit_sections(
+    llm: Any,
+    content: str,
+    instruction: str,
+    sys_prompt: str,
+    strict_suffix: str,
+    log: Callable[[str], None] = print,
+) -> Optional[str]:
+    """
+    Edit only the sections the instruction touches and splice them back in.
+    Returns the full edited Markdown, or None to use the whole-document edit.
+    """
+    if len(content) < settings.SECTION_EDIT_MIN_CHARS or _FORMAT_REQUEST_RE.search(instruction or ""):
+        return None
+    sections = split_sections(content)
+    if len(sections) < 2:
+        return None
+
+    doc_outline = outline(sections)
+    try:
+        plan = await llm.ainvoke([
+            SystemMessage(content=PLAN_PROMPT),
+            HumanMessage(content=f"Outline:\n{doc_outline}\n\nEdit instruction: {instruction}"),
+        ])
+    except Exception as e:
+        log(f"[TOOL] Section edit: planner failed ({e}), editing whole note")
+        return None
+    picked = parse_plan(getattr(plan, "content", ""), len(sections))
+    if not picked:
+        log("[TOOL] Section edit: no usable plan, editing whole note")
+        return None
+    spans = merge_spans(sections, picked)
+    span_chars = sum(len(span.text) for span in spans)
+    if span_chars > len(content) * settings.SECTION_EDIT_MAX_SHARE:
+        log(f"[TOOL] Section edit: plan covers {span_chars}/{len(content)} chars, editing whole note")
+        return None
+
+    log(
+        f"[TOOL] Section edit: {len(picked)}/{len(sections)} sections in {len(spans)} span(s), "
+        f"{span_chars}/{len(content)} chars"
+    )
+    try:
+        edited_spans = await asyncio.gather(*(
+            _rewrite_span(llm, span, doc_outline, instruction, sys_prompt, strict_suffix, log)
+            for span in spans
+        ))
+    except Exception as e:
+        log(f"[TOOL] Section edit: span rewrite failed ({e}), editing whole note")
+        return None
+
+    replacement = {span.first: edited for span, edited in zip(spans, edited_spans)}
+    covered = {index for span in spans for index in range(span.first, span.last + 1)}
+    parts = []
+    for section in sections:
+        if section.index in replacement:
+            parts.append(replacement[section.index])
+        elif section.index not in covered:
+            parts.append(section.text)
+    return "".join(parts)
@@ -63,10 +63,16 @@ class NoteAgentState(TypedDict, total=False):
     auto_accept_writes: bool
     agent_mode: str  # "ask" | "agent"
     write_authorized: Optional[bool]
+    prepass_ms: Optional[float]  # Router pre-pass latency for this turn
+    # Rolling summary of history older than history_summary_until_id (kept across turns;
+    # deliberately not part of create_initial_state so per-turn input never resets it)
+    history_summary: Optional[str]
+    history_summary_until_id: Optional[str]
     
     # Workflow state machine
     workflow_done: bool       # System-level task completion flag
     next_tool_call: Optional[dict]  # Single tool to execute (for chat-tool-chat pattern)
+    next_tool_batch: Optional[list]  # Independent read-only tools to execute concurrently
 
 
 # Default state factory
@@ -103,6 +109,8 @@ def create_initial_state(
         auto_accept_writes=auto_accept_writes,
         agent_mode=agent_mode if agent_mode in {"ask", "agent"} else "agent",
         write_authorized=None,
+        prepass_ms=None,
         workflow_done=False,
         next_tool_call=None,
+        next_tool_batch=None,
     )
@@ -63,6 +63,9 @@ WRITE_TOOLS = {
 
 _note_service = NoteService()
 
+# Nodes whose LLM tokens are user-facing replies.
+STREAMED_NODES = ("agent", "fast_chat")
+
 INTERNAL_CONTROL_LABELS = {
     "CHAT",
     "TASK",
@@ -100,7 +103,8 @@ def _is_internal_control_text(text: str) -> bool:
     return all(p in simple_labels for p in parts)
 
 
-_CONTROL_TOKEN_PATTERN = r"(?:CHAT|TASK|ALLOW_WRITE|DENY_WRITE|ALLOW|DENY|WRITE|READ|UNCLEAR|YES|NO)"
+# The lookahead keeps ordinary words that start with a label ("Now", "Tasks") intact.
+_CONTROL_TOKEN_PATTERN = r"(?:CHAT|TASK|ALLOW_WRITE|DENY_WRITE|ALLOW|DENY|WRITE|READ|UNCLEAR|YES|NO)(?![a-z])"
 _CONTROL_CHAIN_PATTERN = rf"{_CONTROL_TOKEN_PATTERN}(?:[_\-\s]+{_CONTROL_TOKEN_PATTERN})*"
 _CONTROL_PREFIX_RE = re.compile(
     rf"^\s*[\\/]*[_\-\s]*{_CONTROL_CHAIN_PATTERN}\s*[:：\-]?\s*",
@@ -114,11 +118,28 @@ _CONTROL_LINE_PREFIX_RE = re.compile(
 )
 
 
-def _sanitize_user_visible_text(text: str, trim_edges: bool = True) -> str:
+_SIMPLE_CONTROL_LABELS = {"CHAT", "TASK", "ALLOW", "DENY", "WRITE", "READ", "UNCLEAR", "YES", "NO"}
+
+
+def _may_become_control_text(text: str) -> bool:
     """
-    Remove leaked internal control labels when they are prefixed to normal content,
-    e.g. "DENY_WRITE该笔记..." -> "该笔记..."
+    True while the start of a streamed message could still grow into a control
+    label ("DE" -> "DENY_WRITE"), so the stream holds it back a little longer.
     """
+    compact = re.sub(r"[\s\-:：/\\\uFF3F]+", "_", (text or "").upper()).strip("_")
+    if not compact:
+        return True
+    if not re.fullmatch(r"[A-Z_]+", compact):
+        return False
+    *complete, last = [p for p in compact.split("_") if p]
+    return (
+        all(p in _SIMPLE_CONTROL_LABELS for p in complete)
+        and any(label.startswith(last) for label in _SIMPLE_CONTROL_LABELS)
+    )
+
+
+def _normalize_stream_text(text: str) -> str:
+    """Character-level cleanup that is safe on individual tokens."""
     if not text or not isinstance(text, str):
         return ""
     # Strip format/invisible characters that can split leaked control tokens
@@ -127,6 +148,17 @@ def _sanitize_user_visible_text(text: str, trim_edges: bool = True) -> str:
     cleaned = cleaned.replace("\uFF3F", "_")
     cleaned = re.sub(r"[\u00A0\u1680\u2000-\u200A\u202F\u205F\u3000]", " ", cleaned)
     cleaned = re.sub(r"\r\n?", "\n", cleaned)
+    return re.sub(r"[\uE000-\uF8FF]", "", cleaned)
+
+
+def _sanitize_user_visible_text(text: str, trim_edges: bool = True) -> str:
+    """
+    Remove leaked internal control labels when they are prefixed to normal content,
+    e.g. "DENY_WRITE该笔记..." -> "该笔记..."
+    """
+    if not text or not isinstance(text, str):
+        return ""
+    cleaned = _normalize_stream_text(text)
     # Strip repeated control prefixes defensively.
     for _ in range(8):
         next_cleaned = _CONTROL_PREFIX_RE.sub("", cleaned)
@@ -143,7 +175,6 @@ def _sanitize_user_visible_text(text: str, trim_edges: bool = True) -> str:
         if next_cleaned == cleaned:
             break
         cleaned = next_cleaned
-    cleaned = re.sub(r"[\uE000-\uF8FF]", "", cleaned)
     cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
     if trim_edges:
         cleaned = cleaned.strip()
@@ -252,8 +283,11 @@ async def langgraph_stream_to_sse(
     # Track pending tool calls by ID for proper completion matching
     pending_tools = {}
     
-    # Buffer for accumulating text to filter out tool descriptions
+    # Head of the current streamed message, held until it cannot be a control label
     text_buffer = ""
+    current_message_id = None
+    # Messages whose head was released; their remaining tokens stream unbuffered
+    released_message_ids = set()
     
     # Resolve note titles from request context so status labels can show user-friendly names.
     note_title_lookup = _build_note_title_lookup(input_state)
@@ -281,46 +315,55 @@ async def langgraph_stream_to_sse(
                 # Get the node that generated this message
                 langgraph_node = metadata.get("langgraph_node", "") if isinstance(metadata, dict) else ""
                 
-                # CRITICAL: Only stream content from 'agent' node.
-                # 'status' node messages are internal workflow markers, NOT user-facing content.
-                if langgraph_node != "agent":
+                # CRITICAL: Only stream content from the reply nodes.
+                # 'status' node messages are internal workflow markers, NOT user-facing content,
+                # and router/policy classifier calls are tagged nostream in the graph.
+                if langgraph_node not in STREAMED_NODES:
                     continue
                 
                 # Only process AIMessage/AIMessageChunk content
                 if isinstance(message, (AIMessage, AIMessageChunk)):
                     content = message.content
-                    if content and isinstance(content, str):
-                        # Preserve boundary whitespace/newlines in stream chunks.
-                        content = _sanitize_user_visible_text(content, trim_edges=False)
-                        if not content.strip():
-                            continue
-                        # Skip internal control labels (router/policy/classifier outputs).
-                        if _is_internal_control_text(content.strip()):
-                            continue
-                        
-                        # Accumulate text into buffer
-                        text_buffer += content
-                        
-                        # Check for sentence completion or significant buffer size
-                        # Check for sentence completion or significant buffer size.
-                        # Use robust punctuation detection to avoid encoding-related truncation.
-                        if re.search(r"[。！？.!?\n]", text_buffer) or len(text_buffer) > 50:
-                            chunk_text = text_buffer
-                            if chunk_text.strip():
-                                final_clean = _sanitize_user_visible_text(chunk_text, trim_edges=False)
-                                if not final_clean:
-                                    text_buffer = ""
-                                    continue
-                                if _is_internal_control_text(final_clean.strip()):
-                                    text_buffer = ""
-                                    continue
-                                # Record this content to avoid duplicates in 'updates' mode
-                                seen_content_hashes.add(final_clean.strip())
-                                yield json.dumps({
-                                    "part_type": "text",
-                                    "delta": final_clean
-                                })
-                            text_buffer = ""
+                    if not content or not isinstance(content, str):
+                        continue
+                    message_id = getattr(message, "id", None) or langgraph_node
+                    if message_id != current_message_id:
+                        # A new LLM call started; a held head of the previous one is dropped
+                        # only if it was a control label.
+                        held = _sanitize_user_visible_text(text_buffer, trim_edges=False)
+                        if held.strip() and not _is_internal_control_text(held.strip()):
+                            seen_content_hashes.add(held.strip())
+                            yield json.dumps({"part_type": "text", "delta": held})
+                        text_buffer = ""
+                        current_message_id = message_id
+
+                    if message_id in released_message_ids:
+                        # Past the head of the message: forward every token as it arrives.
+                        delta = _normalize_stream_text(content)
+                        if delta:
+                            yield json.dumps({"part_type": "text", "delta": delta})
+                        continue
+
+                    # Head of the message: hold only while it could still be a leaked
+                    # control label, then release it through the full sanitizer.
+                    text_buffer += content
+                    if _may_become_control_text(text_buffer):
+                        continue
+                    final_clean = _sanitize_user_visible_text(text_buffer, trim_edges=False)
+                    if not final_clean.strip():
+                        # Only a label plus boundary ("ALLOW_WRITE\n"): drop it, keep holding.
+                        text_buffer = ""
+                        continue
+                    if _is_internal_control_text(final_clean.strip()):
+                        continue
+                    text_buffer = ""
+                    released_message_ids.add(message_id)
+                    # Record this content to avoid duplicates in 'updates' mode
+                    seen_content_hashes.add(final_clean.strip())
+                    yield json.dumps({
+                        "part_type": "text",
+                        "delta": final_clean
+                    })
                 
             # ============================================================
             # Handle "updates" mode - Node state updates
@@ -357,7 +400,10 @@ async def langgraph_stream_to_sse(
                     if node_name == "router":
                         if not has_started:
                             # Part-Based: status is still a separate event type
-                            yield json.dumps({"type": "status", "text": "Thinking..."})
+                            status_event = {"type": "status", "text": "Thinking..."}
+                            if node_output.get("prepass_ms") is not None:
+                                status_event["prepass_ms"] = node_output["prepass_ms"]
+                            yield json.dumps(status_event)
                             has_started = True
                     
                     # ========== Agent Node (tool calls) ==========
@@ -399,7 +445,7 @@ async def langgraph_stream_to_sse(
                     
                     # ========== Run One Tool Node (results) ==========
                     # NOTE: Changed from 'tools' to 'run_one_tool' after 3-node refactor
-                    elif node_name in ["tools", "run_one_tool"]:
+                    elif node_name in ["tools", "run_one_tool", "run_read_tools"]:
                         for msg in messages:
                             if isinstance(msg, ToolMessage):
                                 content = msg.content if hasattr(msg, 'content') else str(msg)
@@ -421,7 +467,9 @@ async def langgraph_stream_to_sse(
                                     "tool": tool_name,
                                     "tool_id": tool_call_id,
                                     "status": tool_status,
-                                    "output": output_summary
+                                    "output": output_summary,
+                                    # Served from the thread's tool memo (agent/tool_memo.py)
+                                    "cached": bool((getattr(msg, "additional_kwargs", None) or {}).get("cached")),
                                 })
                                 
                                 # Also emit legacy tool events for specific actions
@@ -433,6 +481,9 @@ async def langgraph_stream_to_sse(
                         # Safety Check: If messages mode didn't push everything, 
                         # or if we need to emit a final complete message.
                         for msg in messages:
+                            # Already delivered token by token through "messages" mode.
+                            if getattr(msg, "id", None) in released_message_ids:
+                                continue
                             if isinstance(msg, (AIMessage, AIMessageChunk)):
                                 content = msg.content
                                 if content and isinstance(content, str):
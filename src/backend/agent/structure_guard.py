@@ -0,0 +1,286 @@
+"""
+Markdown structure guard for note edits (update_note and section edits).
+
+Models sometimes "edit" a structured note by flattening it into plain
+paragraphs. The guard used to be a post-hoc check: a flattened result was only
+noticed after the whole response had been generated, and then regenerated
+from scratch with a stricter prompt, doubling latency on the slowest path.
+
+Edits are now streamed through a `StructureWatcher` that counts headings,
+list items, table rows and code fences line by line. Once the output has gone
+without structure for clearly longer than the longest structure-free stretch
+of the source (so an added intro or a long rewritten paragraph is fine), the
+generation is aborted and re-run with the strict prompt plus an explicit note
+about the failed attempt. The post-hoc
+check still runs on completed output. Retry rate and the latency spent on
+discarded attempts are recorded for /diagnostics/structure-guard.
+"""
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from core.config import settings
+
+_STRUCTURE_LINE_PATTERNS = {
+    "headings": re.compile(r"^\s{0,3}#{1,6}\s+\S"),
+    "lists": re.compile(r"^\s{0,3}(?:[-*+]|\d+\.)\s+\S"),
+    "tables": re.compile(r"^\s*\|.+\|\s*$"),
+    "code_fences": re.compile(r"^\s*```"),
+}
+
+# Below this the source is too short for a regression verdict (as before).
+MIN_SOURCE_CHARS = 160
+# Output may run structure-free for GAP_SLACK x the source's longest such stretch,
+# plus STRUCTURE_GUARD_MIN_CHARS, before it counts as flattened.
+GAP_SLACK = 1.5
+
+RESTEER_NOTE = """
+
+A previous attempt at this edit flattened the note into plain paragraphs and was discarded.
+Keep every heading, list and table of the source as Markdown."""
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {kind: 0 for kind in _STRUCTURE_LINE_PATTERNS}
+
+
+def _classify(line: str) -> Optional[str]:
+    for kind, pattern in _STRUCTURE_LINE_PATTERNS.items():
+        if pattern.match(line):
+            return kind
+    return None
+
+
+def count_markdown_structures(text: str) -> Dict[str, int]:
+    counts = _empty_counts()
+    for line in (text or "").split("\n"):
+        kind = _classify(line)
+        if kind:
+            counts[kind] += 1
+    return counts
+
+
+def has_structure(counts: Dict[str, int]) -> bool:
+    return (
+        counts["headings"] >= 1
+        or counts["lists"] >= 3
+        or counts["tables"] >= 2
+        or counts["code_fences"] >= 2
+    )
+
+
+def is_collapsed(counts: Dict[str, int]) -> bool:
+    return (
+        counts["headings"] == 0
+        and counts["lists"] <= 1
+        and counts["tables"] == 0
+        and counts["code_fences"] == 0
+    )
+
+
+def looks_like_structure_regression(original: str, edited: str) -> bool:
+    """
+    Guardrail: if original has clear markdown structure and edited collapses to plain text,
+    force one strict retry before persisting.
+    """
+    if not original or not edited:
+        return False
+    if len(original) < MIN_SOURCE_CHARS:
+        return False
+    return has_structure(count_markdown_structures(original)) and is_collapsed(count_markdown_structures(edited))
+
+
+class StructureWatcher:
+    """Incremental structure counters over streamed output, compared to the source."""
+
+    def __init__(self, source: str):
+        source = source or ""
+        self.active = len(source) >= MIN_SOURCE_CHARS and has_structure(count_markdown_structures(source))
+        # Longest structure-free stretch of the source (leading and trailing prose included).
+        self.source_gap = 0
+        run = 0
+        for line in source.split("\n"):
+            if _classify(line):
+                self.source_gap = max(self.source_gap, run)
+                run = 0
+            else:
+                run += len(line) + 1
+        self.source_gap = max(self.source_gap, run)
+        self.counts = _empty_counts()
+        self.emitted = 0
+        self.flat_run = 0  # output chars since its last structure line
+        self._partial = ""
+        self._lines = 0
+        # A ```markdown wrapper around the answer is not structure of the note.
+        self._wrapper_possible = not source.lstrip().startswith("```")
+
+    def _kind(self, line: str) -> Optional[str]:
+        kind = _classify(line)
+        if kind == "code_fences" and self._lines == 0 and self._wrapper_possible:
+            return None
+        return kind
+
+    def feed(self, chunk: str) -> bool:
+        """Consume one streamed chunk; True once the output is doomed to be flat."""
+        if not chunk:
+            return False
+        self.emitted += len(chunk)
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            kind = self._kind(line)
+            if kind:
+                self.counts[kind] += 1
+                self.flat_run = 0
+            else:
+                self.flat_run += len(line) + 1
+            if line.strip():
+                self._lines += 1
+        return self.doomed()
+
+    @property
+    def gap_limit(self) -> int:
+        return int(self.source_gap * GAP_SLACK) + settings.STRUCTURE_GUARD_MIN_CHARS
+
+    def doomed(self) -> bool:
+        if not self.active:
+            return False
+        counts = dict(self.counts)
+        kind = self._kind(self._partial)
+        if kind:
+            counts[kind] += 1
+            return False
+        # Same verdict as the final check, reached once the flat stretch is
+        # longer than anything structure-free the source contains.
+        return is_collapsed(counts) and self.flat_run + len(self._partial) > self.gap_limit
+
+
+class StructureGuardMetrics:
+    """How often edits need a structure retry, and what those retries cost."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "generations": 0,
+            "streamed": 0,
+            "early_aborts": 0,
+            "late_regressions": 0,
+            "retries": 0,
+            "discarded_ms": 0.0,      # time spent on attempts that were thrown away
+            "retry_ms": 0.0,          # time spent on the strict retries
+            "chars_not_generated": 0,  # estimated output avoided by aborting early
+        }
+
+    def record(self, streamed: bool, outcome: str = "ok", discarded_ms: float = 0.0,
+               retry_ms: float = 0.0, chars_not_generated: int = 0) -> None:
+        with self._lock:
+            c = self.counters
+            c["generations"] += 1
+            c["streamed"] += int(streamed)
+            if outcome == "early":
+                c["early_aborts"] += 1
+            elif outcome == "late":
+                c["late_regressions"] += 1
+            if outcome != "ok":
+                c["retries"] += 1
+                c["discarded_ms"] += discarded_ms
+                c["retry_ms"] += retry_ms
+                c["chars_not_generated"] += max(0, int(chars_not_generated))
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in self.counters:
+                self.counters[key] = 0.0 if key.endswith("_ms") else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+        retries = c["retries"]
+        return {
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in c.items()},
+            "retry_rate": round(retries / c["generations"], 4) if c["generations"] else None,
+            "avg_retry_cost_ms": round((c["discarded_ms"] + c["retry_ms"]) / retries, 1) if retries else None,
+        }
+
+
+structure_guard_metrics = StructureGuardMetrics()
+
+
+def _text_of(content: Any) -> str:
+    return content if isinstance(content, str) else ""
+
+
+async def _stream_until_doomed(llm: Any, messages: list, watcher: StructureWatcher) -> Tuple[str, bool]:
+    parts: List[str] = []
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            text = _text_of(getattr(chunk, "content", ""))
+            parts.append(text)
+            if watcher.feed(text):
+                return "".join(parts), True
+    finally:
+        # Stops the provider stream when aborting early.
+        await stream.aclose()
+    return "".join(parts), False
+
+
+async def generate_markdown_edit(
+    llm: Any,
+    sys_prompt: str,
+    strict_sys_prompt: str,
+    user_prompt: str,
+    source: Optional[str],
+    clean: Callable[[str], str] = str.strip,
+    log: Callable[[str], None] = print,
+) -> str:
+    """
+    Generate edited Markdown for `source` (None: no structure to preserve).
+    Returns `clean()` of the accepted attempt; the final regression check sees the cleaned text.
+    """
+    messages = [SystemMessage(content=sys_prompt), HumanMessage(content=user_prompt)]
+    watcher = StructureWatcher(source) if source else None
+    streamed = bool(
+        watcher is not None and watcher.active
+        and settings.STRUCTURE_GUARD_STREAMING and hasattr(llm, "astream")
+    )
+
+    started = time.perf_counter()
+    if streamed:
+        text, aborted = await _stream_until_doomed(llm, messages, watcher)
+    else:
+        response = await llm.ainvoke(messages)
+        text, aborted = _text_of(response.content), False
+    text = clean(text)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    if aborted:
+        log(f"[TOOL] Structure guard: output still flat after {watcher.emitted} chars, aborting and re-steering")
+        outcome = "early"
+    elif source and looks_like_structure_regression(source, text):
+        log("[TOOL] Detected markdown structure regression, retrying with stricter preservation prompt")
+        outcome = "late"
+    else:
+        structure_guard_metrics.record(streamed)
+        return text
+
+    retry_started = time.perf_counter()
+    retry = await llm.ainvoke([
+        SystemMessage(content=strict_sys_prompt + (RESTEER_NOTE if aborted else "")),
+        HumanMessage(content=user_prompt),
+    ])
+    retry_text = clean(_text_of(retry.content))
+    structure_guard_metrics.record(
+        streamed,
+        outcome,
+        discarded_ms=first_ms,
+        retry_ms=(time.perf_counter() - retry_started) * 1000,
+        chars_not_generated=len(source) - watcher.emitted if aborted else 0,
+    )
+    # A partial (aborted) attempt is never usable; a complete one is kept if the retry is empty.
+    if aborted or retry_text:
+        return retry_text
+    return text
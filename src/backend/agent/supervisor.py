@@ -24,6 +24,7 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, Tool
 from langgraph.types import Command
 
 from core.llm import get_llm
+from core.database import get_pool
 from agent.tools import get_all_agent_tools
 from agent.state import NoteAgentState, create_initial_state
 from agent.graph import create_note_agent_graph, NoteAgentGraph
@@ -183,8 +184,7 @@ class AgentSupervisor:
             return False
         try:
             from agent.graph import CHECKPOINT_DB_PATH
-            import aiosqlite
-            async with aiosqlite.connect(CHECKPOINT_DB_PATH) as db:
+            async with get_pool(CHECKPOINT_DB_PATH).read() as db:
                 cp_cursor = await db.execute(
                     "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC LIMIT 1",
                     (session_id,),
@@ -225,10 +225,9 @@ class AgentSupervisor:
             return False
         try:
             from agent.graph import CHECKPOINT_DB_PATH
-            import aiosqlite
             from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 
-            async with aiosqlite.connect(CHECKPOINT_DB_PATH) as db:
+            async with get_pool(CHECKPOINT_DB_PATH).read() as db:
                 cursor = await db.execute(
                     "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC LIMIT 1",
                     (session_id,),
@@ -271,12 +270,10 @@ class AgentSupervisor:
         if not session_id:
             return
         from agent.graph import CHECKPOINT_DB_PATH
-        import aiosqlite
 
-        async with aiosqlite.connect(CHECKPOINT_DB_PATH) as db:
+        async with get_pool(CHECKPOINT_DB_PATH).write() as db:
             await db.execute("DELETE FROM writes WHERE thread_id = ?", (session_id,))
             await db.execute("DELETE FROM checkpoints WHERE thread_id = ?", (session_id,))
-            await db.commit()
         safe_print(f"[Agent] Cleared corrupted checkpoint state for session {session_id}")
 
     def _build_live_state_update(
@@ -551,8 +548,7 @@ class AgentSupervisor:
             # would start a fresh graph with no context, causing "Hello!" replies.
             try:
                 from agent.graph import CHECKPOINT_DB_PATH
-                import aiosqlite
-                async with aiosqlite.connect(CHECKPOINT_DB_PATH) as db:
+                async with get_pool(CHECKPOINT_DB_PATH).read() as db:
                     cursor = await db.execute(
                         "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?",
                         (session_id,)
@@ -0,0 +1,215 @@
+"""
+Per-thread memoization of read-only tool results.
+
+Within a session the agent re-runs the same reads across steps and turns
+(`read_note_content(same id)`, `list_categories()`, `search_knowledge(same
+query)`), each costing SQLite work or an embedding API call. Results are
+memoized per thread under (tool name, canonical JSON args) together with what
+they depend on:
+
+- read_note_content           -> that note
+- search_knowledge,
+  list_recent_notes           -> any note (a new or edited note can change the hits)
+- list_categories             -> the category catalog version
+
+Invalidation is precise and covers writes from anywhere:
+
+- backend write tools call `invalidate_write()` right after they run;
+- every lookup first replays the note change feed (services/change_feed.py)
+  since the thread's last sync, so edits made in the Electron app drop the
+  affected entries as well;
+- list_categories entries are checked against the catalog version counter.
+
+If the feed cannot be read, memoization is bypassed rather than risking stale
+results.
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from core.config import settings
+from services.change_feed import get_change_feed
+
+MEMOIZED_TOOLS = {"read_note_content", "search_knowledge", "list_recent_notes", "list_categories"}
+# Tools whose results may change whenever any note changes.
+ANY_NOTE_TOOLS = {"search_knowledge", "list_recent_notes"}
+
+FEED_BATCH = 500
+
+MemoKey = Tuple[str, str]
+
+
+def canonical_args(args: Any) -> str:
+    return json.dumps(args or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class MemoLookup(NamedTuple):
+    content: Optional[str]                # cached result, or None on a miss
+    seq: Optional[int]                    # change-feed position the thread was synced to
+    category_version: Optional[int] = None
+
+
+class _Entry(NamedTuple):
+    content: str
+    notes: FrozenSet[str]
+    any_note: bool
+    category_version: Optional[int]
+
+
+class _ThreadMemo:
+    def __init__(self):
+        self.entries: "OrderedDict[MemoKey, _Entry]" = OrderedDict()
+        self.seq: Optional[int] = None
+
+
+class ToolMemo:
+    """LRU of threads, each an LRU of memoized tool results."""
+
+    def __init__(self, max_entries_per_thread: int, max_threads: int):
+        self.max_entries_per_thread = max(0, int(max_entries_per_thread))
+        self.max_threads = max(1, int(max_threads))
+        self._threads: "OrderedDict[str, _ThreadMemo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "write_invalidations": 0,
+                         "feed_invalidations": 0, "resets": 0, "bypassed": 0}
+        self.hits_by_tool: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.TOOL_MEMO_ENABLED) and self.max_entries_per_thread > 0
+
+    def _thread(self, thread_id: str) -> _ThreadMemo:
+        memo = self._threads.get(thread_id)
+        if memo is None:
+            memo = self._threads[thread_id] = _ThreadMemo()
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(thread_id)
+        return memo
+
+    def _invalidate_note(self, memo: _ThreadMemo, note_id: Optional[str]) -> int:
+        stale = [
+            key for key, entry in memo.entries.items()
+            if entry.any_note or (note_id is not None and note_id in entry.notes)
+        ]
+        for key in stale:
+            del memo.entries[key]
+        return len(stale)
+
+    async def _sync(self, thread_id: str) -> Optional[int]:
+        """Replay note changes since the thread's last sync; returns the new position."""
+        feed = get_change_feed()
+        with self._lock:
+            since = self._thread(thread_id).seq
+        if since is None:
+            seq = await feed.latest_seq()
+            with self._lock:
+                memo = self._thread(thread_id)
+                memo.seq = seq if memo.seq is None else memo.seq
+                return memo.seq
+
+        result = await feed.read_since(since, limit=FEED_BATCH)
+        with self._lock:
+            memo = self._thread(thread_id)
+            if result["reset"] or len(result["events"]) >= FEED_BATCH:
+                self.counters["resets"] += 1
+                memo.entries.clear()
+            else:
+                for event in result["events"]:
+                    self.counters["feed_invalidations"] += self._invalidate_note(memo, event["noteId"])
+            memo.seq = max(memo.seq or 0, int(result["last_id"]))
+            return memo.seq
+
+    async def lookup(self, thread_id: str, tool_name: str, args: Any) -> MemoLookup:
+        # No thread, no scope to memoize in (e.g. direct tool invocations).
+        if not self.enabled or tool_name not in MEMOIZED_TOOLS or not thread_id:
+            return MemoLookup(None, None)
+        thread_id = str(thread_id)
+        try:
+            seq = await self._sync(thread_id)
+            category_version = None
+            if tool_name == "list_categories":
+                from services.note_service import NoteService
+
+                category_version = (await NoteService().get_category_catalog()).version
+        except Exception:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return MemoLookup(None, None)
+
+        key = (tool_name, canonical_args(args))
+        with self._lock:
+            memo = self._thread(thread_id)
+            entry = memo.entries.get(key)
+            if entry is not None and tool_name == "list_categories" and (
+                category_version is None or entry.category_version != category_version
+            ):
+                del memo.entries[key]
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return MemoLookup(None, seq, category_version)
+            memo.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            self.hits_by_tool[tool_name] = self.hits_by_tool.get(tool_name, 0) + 1
+            return MemoLookup(entry.content, seq, category_version)
+
+    def store(self, thread_id: str, tool_name: str, args: Any, content: str, lookup: MemoLookup) -> bool:
+        """Memoize a successful result fetched after `lookup` missed."""
+        if not self.enabled or tool_name not in MEMOIZED_TOOLS or not thread_id or lookup.seq is None:
+            return False
+        if not isinstance(content, str) or content.strip().startswith("Error:"):
+            return False
+        if tool_name == "list_categories" and lookup.category_version is None:
+            return False
+        note_id = (args or {}).get("note_id") if tool_name == "read_note_content" else None
+        entry = _Entry(
+            content=content,
+            notes=frozenset([str(note_id)]) if note_id else frozenset(),
+            any_note=tool_name in ANY_NOTE_TOOLS,
+            category_version=lookup.category_version,
+        )
+        with self._lock:
+            memo = self._thread(str(thread_id))
+            # A concurrent call synced past changes this result may already reflect
+            # stale data for; they were replayed without it, so do not keep it.
+            if memo.seq != lookup.seq:
+                return False
+            memo.entries[(tool_name, canonical_args(args))] = entry
+            memo.entries.move_to_end((tool_name, canonical_args(args)))
+            while len(memo.entries) > self.max_entries_per_thread:
+                memo.entries.popitem(last=False)
+            self.counters["stores"] += 1
+        return True
+
+    def invalidate_write(self, tool_name: str, args: Any) -> None:
+        """Drop results a backend write may have changed, in every thread."""
+        note_id = (args or {}).get("note_id") if isinstance(args, dict) else None
+        with self._lock:
+            for memo in self._threads.values():
+                # Without a note id (create_note), only "any note" results are affected.
+                self.counters["write_invalidations"] += self._invalidate_note(memo, str(note_id) if note_id else None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._threads.clear()
+            for field in self.counters:
+                self.counters[field] = 0
+            self.hits_by_tool.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "enabled": self.enabled,
+                "threads": len(self._threads),
+                "entries": sum(len(m.entries) for m in self._threads.values()),
+                "max_entries_per_thread": self.max_entries_per_thread,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                "hits_by_tool": dict(self.hits_by_tool),
+            }
+
+
+tool_memo = ToolMemo(settings.TOOL_MEMO_MAX_ENTRIES, settings.TOOL_MEMO_MAX_THREADS)
@@ -4,12 +4,17 @@ Converted from hardcoded workers into reusable, schema-defined tools.
 """
 from typing import Dict, Any, List, Optional
 from langchain_core.tools import tool
+from agent.prefetch import SEARCH_TOP_K, note_key, search_key, tool_session, turn_prefetch
+from agent.section_editor import edit_sections
+from agent.structure_guard import generate_markdown_edit
 from services.note_service import NoteService
 from services.rag_service import RAGService
+from services.snippets import MAX_BUDGET_CHARS, MIN_BUDGET_CHARS, build_snippets
+from services.html_text import html_to_editable_text
+from core.config import settings
 import json
 import re
 import markdown
-import html as html_lib
 
 # Safe print for Windows GBK encoding
 def safe_print(msg: str):
@@ -29,43 +34,13 @@ note_service = NoteService()
 rag_service = RAGService()
 
 
-def _count_markdown_structures(text: str) -> dict:
-    if not text:
-        return {"headings": 0, "lists": 0, "tables": 0, "code_fences": 0}
-    headings = len(re.findall(r"(?m)^\s{0,3}#{1,6}\s+\S", text))
-    lists = len(re.findall(r"(?m)^\s{0,3}(?:[-*+]|\d+\.)\s+\S", text))
-    table_rows = len(re.findall(r"(?m)^\s*\|.+\|\s*$", text))
-    code_fences = len(re.findall(r"(?m)^\s*```", text))
-    return {"headings": headings, "lists": lists, "tables": table_rows, "code_fences": code_fences}
+_STRICT_OUTPUT_GATE = """
 
-
-def _looks_like_structure_regression(original: str, edited: str) -> bool:
-    """
-    Guardrail: if original has clear markdown structure and edited collapses to plain text,
-    force one strict retry before persisting.
-    """
-    if not original or not edited:
-        return False
-    if len(original) < 160:
-        return False
-
-    before = _count_markdown_structures(original)
-    after = _count_markdown_structures(edited)
-
-    # If source had meaningful structure, but output lost nearly all structure.
-    had_structure = (
-        before["headings"] >= 1
-        or before["lists"] >= 3
-        or before["tables"] >= 2
-        or before["code_fences"] >= 2
-    )
-    collapsed = (
-        after["headings"] == 0
-        and after["lists"] <= 1
-        and after["tables"] == 0
-        and after["code_fences"] == 0
-    )
-    return had_structure and collapsed
+STRICT OUTPUT QUALITY GATE:
+- Keep Markdown structure readable and renderable.
+- Preserve headings, lists, and tables when they exist in source.
+- Never flatten the entire note into one plain paragraph.
+- Return ONLY Markdown content, no commentary."""
 
 
 def _html_to_editable_text(html_content: str) -> str:
@@ -73,41 +48,41 @@ def _html_to_editable_text(html_content: str) -> str:
     Convert stored HTML into a readable multiline text fallback for editing/matching.
     This is only used when markdownSource is missing.
     """
-    if not html_content:
-        return ""
-    text = html_content
-    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.IGNORECASE)
-    text = re.sub(r"</(p|div|li|tr|h[1-6]|blockquote|pre|table|ul|ol)>", "\n", text, flags=re.IGNORECASE)
-    text = re.sub(r"<[^>]+>", "", text)
-    text = html_lib.unescape(text)
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = re.sub(r"[ \t\f\v]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
+    return html_to_editable_text(html_content)
 
 @tool
-async def search_knowledge(query: str) -> str:
+async def search_knowledge(query: str, prefer_recent: bool = False, max_chars: Optional[int] = None) -> str:
     """
     Search across all user notes using semantic search.
     Use this when the user asks a question about their knowledge base, 
     asks 'what do I have on X', or needs to find related information.
+    - prefer_recent: Set to True when the user asks about recent work
+      ("what was I working on", "latest notes about X") to favor recently edited notes.
+    - max_chars: Optional total size of the returned passages across all hits.
     
-    Returns note previews with content. For simple Q&A, the preview may be enough.
+    Returns the passages of each note that best match the query. For simple Q&A, they may be enough.
     Only call read_note_content if you need the COMPLETE content for detailed analysis.
     """
-    safe_print(f"[TOOL] Tool: search_knowledge -> {query}")
-    results = await rag_service.search(query, top_k=5)
+    safe_print(f"[TOOL] Tool: search_knowledge -> {query} (prefer_recent={prefer_recent})")
+    rank_mode = "recency" if prefer_recent else None
+    # Started by the router when @knowledge is on; None unless the query matches.
+    results = await turn_prefetch.take(tool_session.get(), search_key(query, SEARCH_TOP_K, rank_mode))
+    if results is None:
+        results = await rag_service.search(query, top_k=SEARCH_TOP_K, rank_mode=rank_mode)
     if not results:
         return "No relevant notes found for this query."
-    
+
+    # One budget shared by all hits; passages are picked by BM25 over sentence windows.
+    budget = max_chars if max_chars else settings.SEARCH_SNIPPET_BUDGET_CHARS
+    budget = min(max(int(budget), MIN_BUDGET_CHARS), MAX_BUDGET_CHARS)
+    snippets = build_snippets(query, [r.get('content') or "" for r in results], budget)
+
     formatted = []
-    for r in results:
-        # Return more content (1500 chars) to reduce need for read_note_content
-        content_preview = r['content'][:1500] + "..." if len(r['content']) > 1500 else r['content']
-        formatted.append(f"Title: {r['title']}\nID: {r.get('id', 'N/A')}\nContent: {content_preview}")
+    for r, snippet in zip(results, snippets):
+        formatted.append(f"Title: {r['title']}\nID: {r.get('id', 'N/A')}\nContent: {snippet['text']}")
     
     result_text = "\n\n---\n\n".join(formatted)
-    return f"{result_text}\n\n[NOTE: If content is truncated (...), use read_note_content(note_id) for full text.]"
+    return f"{result_text}\n\n[NOTE: If content is truncated (…), use read_note_content(note_id) for full text.]"
 
 @tool
 async def read_note_content(note_id: str) -> str:
@@ -116,6 +91,8 @@ async def read_note_content(note_id: str) -> str:
     Use this when you need the exact text of 'the current note' or a specific note found via search.
     """
     safe_print(f"[TOOL] Tool: read_note_content -> {note_id}")
+    # A prefetched load only warms the note cache; get_note still revalidates it.
+    await turn_prefetch.take(tool_session.get(), note_key(note_id))
     note = await note_service.get_note(note_id)
     if not note:
         return f"Error: Note with ID {note_id} not found."
@@ -148,7 +125,7 @@ async def rename_note(note_id: str, new_title: str) -> str:
         return f"Error: Note {note_id} not found."
     
     old_title = note.get('title', 'Untitled')
-    await note_service.update_note(note_id=note_id, title=new_title)
+    await note_service.update_note(note_id=note_id, title=new_title, current=note)
     
     return f"Successfully renamed note from '{old_title}' to '{new_title}'"
 
@@ -217,12 +194,11 @@ async def update_note(note_id: str, instruction: str, force_rewrite: bool = Fals
             for img_tag in existing_img_tags:
                 html_result += f"<p>{img_tag}</p>\n"
         
-        await note_service.update_note(note_id=note_id, content=html_result, markdown_source="")
+        await note_service.update_note(note_id=note_id, content=html_result, markdown_source="", current=note)
         return f"Successfully updated note (ID: {note_id}). (Content cleared, images preserved)"
 
     # 3. LLM Edit
     from core.llm import get_llm
-    from langchain_core.messages import SystemMessage, HumanMessage
     llm = get_llm()
     
     if force_rewrite:
@@ -253,28 +229,25 @@ If the user asks to "format", "organize", "tidy up", "鏁寸悊鏍煎紡", "鎺
 - IMPORTANT: If you see repeating patterns that look like table data (e.g., header words followed by corresponding values in groups), reconstruct them as Markdown tables using | syntax while preserving original mappings exactly."""
         user_prompt = f"Original content:\n---\n{current_content}\n---\nEdit instruction: {instruction}\n\nOutput the edited content directly:"
 
-    response = await llm.ainvoke([SystemMessage(content=sys_prompt), HumanMessage(content=user_prompt)])
-    new_content = response.content.strip()
-
-    if (not force_rewrite) and _looks_like_structure_regression(current_content, new_content):
-        safe_print("[TOOL] Detected markdown structure regression, retrying with stricter preservation prompt")
-        strict_sys_prompt = sys_prompt + """
+    # Large notes: regenerate only the sections the instruction touches.
+    new_content = None
+    if not force_rewrite:
+        new_content = await edit_sections(
+            llm, current_content, instruction, sys_prompt, _STRICT_OUTPUT_GATE, log=safe_print,
+        )
 
-STRICT OUTPUT QUALITY GATE:
-- Keep Markdown structure readable and renderable.
-- Preserve headings, lists, and tables when they exist in source.
-- Never flatten the entire note into one plain paragraph.
-- Return ONLY Markdown content, no commentary."""
-        retry = await llm.ainvoke([SystemMessage(content=strict_sys_prompt), HumanMessage(content=user_prompt)])
-        retry_content = retry.content.strip()
-        if retry_content:
-            new_content = retry_content
+    if new_content is None:
+        # Streamed through the structure guard: a flattening edit is aborted early and re-steered.
+        new_content = await generate_markdown_edit(
+            llm, sys_prompt, sys_prompt + _STRICT_OUTPUT_GATE, user_prompt,
+            source=None if force_rewrite else current_content, log=safe_print,
+        )
     
-    # Strip markdown code blocks if present
-    if new_content.startswith("```markdown"):
-        new_content = new_content.split("```markdown")[1].split("```")[0].strip()
-    elif new_content.startswith("```"):
-        new_content = new_content.split("```")[1].split("```")[0].strip()
+        # Strip markdown code blocks if present
+        if new_content.startswith("```markdown"):
+            new_content = new_content.split("```markdown")[1].split("```")[0].strip()
+        elif new_content.startswith("```"):
+            new_content = new_content.split("```")[1].split("```")[0].strip()
     
     # Clean up excessive blank lines
     new_content = re.sub(r'\n{3,}', '\n\n', new_content)
@@ -289,7 +262,7 @@ STRICT OUTPUT QUALITY GATE:
         for img_tag in existing_img_tags:
             html_content += f"\n<p>{img_tag}</p>"
     
-    await note_service.update_note(note_id=note_id, content=html_content, markdown_source=new_content)
+    await note_service.update_note(note_id=note_id, content=html_content, markdown_source=new_content, current=note)
     
     return f"Successfully updated note (ID: {note_id}). [SYSTEM: DO NOT output the note content.]"
 
@@ -318,15 +291,14 @@ async def create_note(title: str, content: str = "", category_id: Optional[str]
     normalized_category_id = (category_id or "").strip() or None
     category_name = None
     if normalized_category_id:
-        categories = await note_service.get_all_categories()
-        category_map = {str(c.get("id", "")): str(c.get("name", "")) for c in categories}
-        if normalized_category_id not in category_map:
-            valid_ids = ", ".join(f'"{cid}"' for cid in category_map.keys())
+        catalog = await note_service.get_category_catalog()
+        category_name = catalog.name_of(normalized_category_id)
+        if category_name is None:
+            valid_ids = ", ".join(f'"{cid}"' for cid in catalog.by_id.keys())
             return (
                 f"Error: Category '{normalized_category_id}' does not exist. "
                 f"Use a valid category_id from list_categories. Valid IDs: {valid_ids}"
             )
-        category_name = category_map[normalized_category_id]
 
     note = await note_service.create_note(
         title=title,
@@ -388,7 +360,7 @@ async def patch_note(note_id: str, old_text: str, new_text: str) -> str:
         updated_md = markdown_source.replace(old_text, new_text, 1)
         updated_html = markdown.markdown(updated_md, extensions=['fenced_code', 'tables'])
         updated_html = re.sub(r'<p>\s*</p>', '', updated_html)
-        await note_service.update_note(note_id=note_id, content=updated_html, markdown_source=updated_md)
+        await note_service.update_note(note_id=note_id, content=updated_html, markdown_source=updated_md, current=note)
         return f"Successfully patched note (ID: {note_id}). Replaced '{old_text[:30]}...' with '{new_text[:30]}...'"
 
     # Try to find in plain text or html
@@ -416,7 +388,7 @@ async def patch_note(note_id: str, old_text: str, new_text: str) -> str:
         updated_html = ''.join(f'<p>{line}</p>' for line in updated_plain.split('\n') if line.strip())
         updated_md = updated_plain
     
-    await note_service.update_note(note_id=note_id, content=updated_html, markdown_source=updated_md)
+    await note_service.update_note(note_id=note_id, content=updated_html, markdown_source=updated_md, current=note)
     
     return f"Successfully patched note (ID: {note_id}). Replaced '{old_text[:30]}...' with '{new_text[:30]}...'"
 
@@ -428,7 +400,7 @@ async def list_categories() -> str:
     IMPORTANT: When using set_note_category, you MUST use the exact category_id returned here.
     """
     safe_print(f"[TOOL] Tool: list_categories")
-    categories = await note_service.get_all_categories()
+    categories = (await note_service.get_category_catalog()).all()
     if not categories:
         return "No categories exist yet. The user can create categories in the sidebar."
     
@@ -454,22 +426,17 @@ async def set_note_category(note_id: str, category_id: str) -> str:
         return f"Error: Failed to update note {note_id}."
 
     # Validate category exists
-    categories = await note_service.get_all_categories()
-    valid_ids = [c['id'] for c in categories]
-    cat_names = {c['id']: c['name'] for c in categories}
-    
-    if category_id not in valid_ids:
-        # Fallback: Check if AI passed a Name instead of an ID
-        name_to_id = {c['name']: c['id'] for c in categories}
-        if category_id in name_to_id:
-            category_id = name_to_id[category_id]
-        else:
-            suggestions = ", ".join([f'"{cid}" ({cat_names[cid]})' for cid in valid_ids])
-            return f"Error: Category '{category_id}' does not exist. Use a valid ID from list_categories or an empty string \"\" to remove. Valid IDs: {suggestions}"
+    catalog = await note_service.get_category_catalog()
+    # Fallback inside resolve_id_or_name: the AI may pass a Name instead of an ID
+    resolved_id = catalog.resolve_id_or_name(category_id)
+    if resolved_id is None:
+        suggestions = ", ".join([f'"{cid}" ({catalog.name_of(cid)})' for cid in catalog.by_id])
+        return f"Error: Category '{category_id}' does not exist. Use a valid ID from list_categories or an empty string \"\" to remove. Valid IDs: {suggestions}"
+    category_id = resolved_id
     
     success = await note_service.set_note_category(note_id, category_id)
     if success:
-        cat_name = cat_names.get(category_id, "Unknown")
+        cat_name = catalog.name_of(category_id) or "Unknown"
         return f"Successfully assigned note to category: {cat_name}"
     
     return f"Error: Failed to update note {note_id}. Note might not exist or is in trash."
@@ -13,6 +13,7 @@ from fastapi.responses import StreamingResponse
 
 from agent.supervisor import AgentSupervisor, invalidate_agent_runtime_cache
 from core.model_manager import model_manager
+from core.database import get_pool
 
 router = APIRouter()
 
@@ -390,17 +391,31 @@ def _content_to_text(content: Any) -> str:
     return _sanitize(str(content))
 
 
-async def _ensure_session_meta_table(db):
-    await db.execute(
-        """
-        CREATE TABLE IF NOT EXISTS session_meta (
-            thread_id TEXT PRIMARY KEY,
-            title TEXT,
-            generated_at INTEGER,
-            updated_at INTEGER
+# Checkpoint dbs whose session_meta table is known to exist. Read-pool connections
+# are query_only, so the table is created once through the write pool and read
+# paths treat a missing table as "no titles".
+_session_meta_ready: set = set()
+
+
+async def _ensure_session_meta_table(checkpoint_db: str) -> None:
+    if checkpoint_db in _session_meta_ready:
+        return
+    async with get_pool(checkpoint_db).write() as db:
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_meta (
+                thread_id TEXT PRIMARY KEY,
+                title TEXT,
+                generated_at INTEGER,
+                updated_at INTEGER
+            )
+            """
         )
-        """
-    )
+    _session_meta_ready.add(checkpoint_db)
+
+
+def _is_missing_table(error: Exception) -> bool:
+    return "no such table" in str(error).lower()
 
 
 def _sanitize_session_title(raw: str) -> str:
@@ -424,7 +439,6 @@ def _fallback_session_title(messages: List[dict]) -> str:
 
 
 async def _load_session_titles(checkpoint_db: str, thread_ids: List[str]) -> dict[str, str]:
-    import aiosqlite
 
     if not thread_ids:
         return {}
@@ -434,8 +448,7 @@ async def _load_session_titles(checkpoint_db: str, thread_ids: List[str]) -> dic
         return {}
 
     try:
-        async with aiosqlite.connect(checkpoint_db) as db:
-            await _ensure_session_meta_table(db)
+        async with get_pool(checkpoint_db).read() as db:
             placeholders = ",".join("?" for _ in cleaned)
             cursor = await db.execute(
                 f"SELECT thread_id, title FROM session_meta WHERE thread_id IN ({placeholders})",
@@ -444,19 +457,20 @@ async def _load_session_titles(checkpoint_db: str, thread_ids: List[str]) -> dic
             rows = await cursor.fetchall()
         return {str(r[0]): str(r[1]) for r in rows if r and r[0] and r[1]}
     except Exception as e:
+        if _is_missing_table(e):
+            return {}
         safe_print(f"[API] Failed to load session titles: {e}")
         return {}
 
 
 async def _save_session_title(checkpoint_db: str, session_id: str, title: str) -> None:
-    import aiosqlite
 
     if not session_id or not title:
         return
 
     now = int(time.time())
-    async with aiosqlite.connect(checkpoint_db) as db:
-        await _ensure_session_meta_table(db)
+    await _ensure_session_meta_table(checkpoint_db)
+    async with get_pool(checkpoint_db).write() as db:
         await db.execute(
             """
             INSERT INTO session_meta (thread_id, title, generated_at, updated_at)
@@ -467,18 +481,15 @@ async def _save_session_title(checkpoint_db: str, session_id: str, title: str) -
             """,
             (session_id, title, now, now),
         )
-        await db.commit()
 
 
 async def _has_session_title(checkpoint_db: str, session_id: str) -> bool:
-    import aiosqlite
 
     if not session_id:
         return False
 
     try:
-        async with aiosqlite.connect(checkpoint_db) as db:
-            await _ensure_session_meta_table(db)
+        async with get_pool(checkpoint_db).read() as db:
             cursor = await db.execute(
                 "SELECT 1 FROM session_meta WHERE thread_id = ? AND title IS NOT NULL AND title != '' LIMIT 1",
                 (session_id,),
@@ -570,7 +581,6 @@ async def _get_checkpoint_messages(checkpoint_db: str, thread_id: str):
     """
     Get messages from a checkpoint using LangGraph's serialization.
     """
-    import aiosqlite
     
     try:
         # Use LangGraph's serde to properly deserialize
@@ -578,8 +588,7 @@ async def _get_checkpoint_messages(checkpoint_db: str, thread_id: str):
         
         serde = JsonPlusSerializer()
         
-        async with aiosqlite.connect(checkpoint_db) as db:
-            db.row_factory = aiosqlite.Row
+        async with get_pool(checkpoint_db).read() as db:
             cursor = await db.execute("""
                 SELECT type, checkpoint FROM checkpoints 
                 WHERE thread_id = ? 
@@ -630,7 +639,6 @@ async def list_sessions():
     List all chat sessions with generated title or fallback preview.
     Returns sessions sorted by last update time.
     """
-    import aiosqlite
     from core.config import settings
     import os
     
@@ -641,8 +649,7 @@ async def list_sessions():
     
     sessions = []
     try:
-        async with aiosqlite.connect(checkpoint_db) as db:
-            db.row_factory = aiosqlite.Row
+        async with get_pool(checkpoint_db).read() as db:
             # Get unique thread_ids with their latest checkpoint
             cursor = await db.execute("""
                 SELECT DISTINCT thread_id, MAX(checkpoint_id) as latest_checkpoint
@@ -717,7 +724,6 @@ async def delete_session(session_id: str):
     """
     Delete a specific session and its checkpoints.
     """
-    import aiosqlite
     from core.config import settings
     import os
     
@@ -727,12 +733,11 @@ async def delete_session(session_id: str):
         raise HTTPException(status_code=404, detail="No sessions found")
     
     try:
-        async with aiosqlite.connect(checkpoint_db) as db:
-            await _ensure_session_meta_table(db)
+        await _ensure_session_meta_table(checkpoint_db)
+        async with get_pool(checkpoint_db).write() as db:
             await db.execute("DELETE FROM checkpoints WHERE thread_id = ?", (session_id,))
             await db.execute("DELETE FROM writes WHERE thread_id = ?", (session_id,))
             await db.execute("DELETE FROM session_meta WHERE thread_id = ?", (session_id,))
-            await db.commit()
         
         return {"status": "success", "deleted": session_id}
     except Exception as e:
@@ -0,0 +1,63 @@
+"""
+Diagnostics API - cache and pool counters, schema migrations, query plans,
+router fast-path agreement and note-edit structure retries for tuning.
+"""
+from fastapi import APIRouter, HTTPException
+
+from core.config import settings
+from agent.decision_cache import decision_cache
+from agent.intent_classifier import get_intent_classifier
+from agent.prefetch import turn_prefetch
+from agent.structure_guard import structure_guard_metrics
+from agent.tool_memo import tool_memo
+from core.database import pool_stats
+from services.note_service import category_catalog, note_cache
+from services.rag_service import RAGService
+from services.schema_migrations import applied_migrations, explain_hot_queries
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit/miss counters and sizes of the in-process caches."""
+    rag = RAGService()
+    return {
+        "note_cache": note_cache.stats(),
+        "category_catalog": category_catalog.stats(),
+        "decision_cache": decision_cache.stats(),
+        "prefetch": turn_prefetch.stats(),
+        "tool_memo": tool_memo.stats(),
+        "snippet_cache": {"entries": len(rag._snippet_cache), "max_entries": settings.SNIPPET_CACHE_SIZE},
+        "sqlite_pools": pool_stats(),
+    }
+
+
+@router.get("/schema")
+async def schema_status():
+    """Backend migrations recorded in notes.db."""
+    try:
+        return {"migrations": await applied_migrations(settings.NOTES_DB_PATH)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/query-plans")
+async def query_plans():
+    """EXPLAIN QUERY PLAN of the backend's hot queries against notes.db."""
+    try:
+        return {"queries": await explain_hot_queries(settings.NOTES_DB_PATH)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/intent-classifier")
+async def intent_classifier_stats():
+    """Local router fast path: mode, decision counts and agreement with the LLM router."""
+    return get_intent_classifier().stats()
+
+
+@router.get("/structure-guard")
+async def structure_guard_stats():
+    """Note edits: structure-regression retry rate, early aborts and their latency cost."""
+    return structure_guard_metrics.stats()
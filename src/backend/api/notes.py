@@ -1,14 +1,21 @@
 ﻿"""
 Notes API endpoints for direct note operations.
 """
+import json
 from typing import Optional, List
 from pydantic import BaseModel, Field
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from services.note_service import NoteService
+from services.note_service import NoteService, MAX_BATCH_OPERATIONS, MAX_LIST_PAGE_SIZE, decode_list_cursor
+from services.change_feed import get_change_feed
+from services.snippets import build_snippets
 
 router = APIRouter()
 
+# Idle SSE connections get a comment line this often so proxies keep them open.
+CHANGE_STREAM_KEEPALIVE_SECONDS = 15.0
+
 
 # Safe print for Windows GBK encoding
 def safe_print(msg: str):
@@ -43,19 +50,127 @@ class NoteSearchRequest(BaseModel):
     """Semantic search request."""
     query: str = Field(..., description="Search query")
     top_k: int = Field(default=5, description="Number of results")
+    rank_mode: Optional[str] = Field(None, description="'similarity' or 'recency' (blends in updatedAt decay)")
+    half_life_days: Optional[float] = Field(None, description="Recency half-life override in days")
+    category_id: Optional[str] = Field(None, description="Restrict search to one category")
+    snippet_chars: Optional[int] = Field(None, description="If set, add query-matched snippets sharing this character budget")
+    mode: str = Field(default="semantic", description="'semantic' (vector index) or 'keyword' (full-text substring match)")
 
 
 @router.get("/")
-async def list_notes():
-    """List all notes."""
+async def list_notes(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_PAGE_SIZE, description="Page size; omit to list everything"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,title,updatedAt"),
+    format: str = Query("json", description="'json' or 'ndjson' (one note per line, streamed)"),
+):
+    """
+    List live notes, newest first.
+
+    With `limit` the response is one keyset page plus `next_cursor` (also sent as
+    the X-Next-Cursor header for NDJSON). Without it every note is returned, as before.
+    """
     try:
         service = NoteService()
-        notes = await service.get_all_notes()
-        return {"notes": notes}
+        projection = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+
+        page = None
+        if limit is not None:
+            page = await service.list_notes_page(limit=limit, cursor=cursor, fields=projection)
+        else:
+            # Validate the projection/cursor up front so errors are not raised mid-stream.
+            service.resolve_list_fields(projection)
+            if cursor:
+                decode_list_cursor(cursor)
+
+        if format == "ndjson":
+            headers = {"X-Next-Cursor": page["next_cursor"]} if page and page["next_cursor"] else {}
+            return StreamingResponse(
+                _ndjson_lines(service, page, cursor, projection),
+                media_type="application/x-ndjson",
+                headers=headers,
+            )
+
+        if page is not None:
+            return page
+        notes = []
+        async for batch in service.iter_note_batches(
+            fields=projection, batch_size=MAX_LIST_PAGE_SIZE, cursor=cursor
+        ):
+            notes.extend(batch)
+        return {"notes": notes, "next_cursor": None}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _ndjson_lines(service: NoteService, page, cursor: Optional[str], fields: Optional[List[str]]):
+    if page is not None:
+        for note in page["notes"]:
+            yield json.dumps(note, ensure_ascii=False) + "\n"
+        return
+    async for batch in service.iter_note_batches(fields=fields, batch_size=MAX_LIST_PAGE_SIZE, cursor=cursor):
+        for note in batch:
+            yield json.dumps(note, ensure_ascii=False) + "\n"
+
+
+@router.get("/changes")
+async def note_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Last event id seen; omit to start from now"),
+    format: str = Query("sse", description="'sse' (event stream) or 'json' (long-poll)"),
+    timeout: float = Query(25.0, ge=0, le=60, description="Long-poll wait in seconds (json format)"),
+    limit: int = Query(500, ge=1, le=5000),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Note change events (created/updated/deleted/restored/purged) from the notes.db changelog.
+
+    Event ids are resumable: pass the last seen id as `since` (or let the browser
+    send Last-Event-ID on reconnect). A `reset` event/flag means older events were
+    pruned and the subscriber must resynchronize from a full listing.
+    """
+    try:
+        if format not in ("sse", "json"):
+            raise HTTPException(status_code=400, detail="format must be 'sse' or 'json'")
+        feed = get_change_feed()
+        if since is None and last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)
+        if since is None:
+            since = await feed.latest_seq()
+
+        if format == "json":
+            return await feed.wait_for_changes(since, timeout=timeout, limit=limit)
+
+        return StreamingResponse(
+            _change_events(request, feed, since, limit),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _change_events(request: Request, feed, since: int, limit: int):
+    yield f"retry: 3000\nid: {since}\n\n"
+    while not await request.is_disconnected():
+        result = await feed.wait_for_changes(since, timeout=CHANGE_STREAM_KEEPALIVE_SECONDS, limit=limit)
+        if result["reset"]:
+            yield f"event: reset\nid: {result['last_id']}\ndata: {{}}\n\n"
+        for event in result["events"]:
+            yield f"event: note\nid: {event['id']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        if not result["events"] and not result["reset"]:
+            yield ": keepalive\n\n"
+        since = result["last_id"]
+
+
 @router.get("/{note_id}")
 async def get_note(note_id: str):
     """Get a specific note by ID."""
@@ -107,19 +222,69 @@ async def update_note(note_id: str, request: NoteUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class NoteBatchOperation(BaseModel):
+    """One operation of a bulk mutation."""
+    op: str = Field(..., description="'create', 'update', 'delete' or 'categorize'")
+    id: Optional[str] = Field(None, description="Note ID (required except for create)")
+    title: Optional[str] = None
+    content: Optional[str] = None
+    category_id: Optional[str] = None
+    markdown_source: Optional[str] = None
+
+
+class NoteBatchRequest(BaseModel):
+    """Bulk note mutation applied in a single transaction."""
+    operations: List[NoteBatchOperation] = Field(..., max_length=MAX_BATCH_OPERATIONS)
+
+
+@router.post("/batch")
+async def batch_notes(request: NoteBatchRequest):
+    """
+    Apply mixed create/update/delete/categorize operations with one commit.
+    Vector index updates for the whole batch run as one background job.
+    """
+    try:
+        service = NoteService()
+        results = await service.apply_batch([op.dict() for op in request.operations])
+        return {"status": "success", "results": results}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/search")
 async def semantic_search(request: NoteSearchRequest):
     """
     Perform semantic search across all notes.
-    Uses the vector store for similarity matching.
+    Uses the vector store for similarity matching, or the full-text index with mode="keyword".
     """
     try:
         service = NoteService()
-        results = await service.semantic_search(
-            query=request.query,
-            top_k=request.top_k
-        )
+        if request.mode == "keyword":
+            results = await service.keyword_search(
+                request.query, limit=request.top_k, category_id=request.category_id
+            )
+        elif request.mode == "semantic":
+            results = await service.semantic_search(
+                query=request.query,
+                top_k=request.top_k,
+                rank_mode=request.rank_mode,
+                half_life_days=request.half_life_days,
+                category_id=request.category_id,
+            )
+        else:
+            raise HTTPException(status_code=400, detail="mode must be 'semantic' or 'keyword'")
+        if request.snippet_chars:
+            snippets = build_snippets(
+                request.query, [r.get("content") or "" for r in results], request.snippet_chars
+            )
+            for result, snippet in zip(results, snippets):
+                result["snippet"] = snippet["text"]
+                result["highlights"] = snippet["highlights"]
         return {"results": results}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -182,6 +347,7 @@ class VectorSyncRequest(BaseModel):
     note_id: str = Field(..., description="Note ID")
     title: str = Field(..., description="Note title")
     content: str = Field(default="", description="Note plain text content")
+    updated_at: Optional[int] = Field(None, description="Note updatedAt (ms) for recency ranking")
 
 
 @router.post("/vector/sync")
@@ -195,7 +361,8 @@ async def sync_note_vector(request: VectorSyncRequest):
         await service.rag_service.update_document(
             request.note_id,
             request.title,
-            request.content
+            request.content,
+            updated_at=request.updated_at,
         )
         safe_print(f"[API] Vector synced for note: {request.title}")
         return {"status": "success", "note_id": request.note_id}
@@ -208,6 +375,7 @@ class VectorSyncBatchItem(BaseModel):
     note_id: str = Field(..., description="Note ID")
     title: str = Field(..., description="Note title")
     content: str = Field(default="", description="Note plain text content")
+    updated_at: Optional[int] = Field(None, description="Note updatedAt (ms) for recency ranking")
 
 
 class VectorSyncBatchRequest(BaseModel):
@@ -226,7 +394,7 @@ async def sync_note_vectors_batch(request: VectorSyncBatchRequest):
 
         service = NoteService()
         docs = [
-            {"id": item.note_id, "title": item.title, "content": item.content}
+            {"id": item.note_id, "title": item.title, "content": item.content, "updatedAt": item.updated_at}
             for item in request.items
         ]
         count = await service.rag_service.upsert_documents_batch(docs)
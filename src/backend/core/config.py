@@ -108,7 +108,74 @@ class Settings(BaseSettings):
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
     TOP_K_RESULTS: int = 5
-    
+
+    # Recency-aware ranking: blended score = (1 - w) * cosine + w * 0.5 ** (age / half_life)
+    SEARCH_RANK_MODE: str = os.getenv("SEARCH_RANK_MODE", "similarity")  # "similarity" | "recency"
+    RECENCY_HALF_LIFE_DAYS: float = float(os.getenv("RECENCY_HALF_LIFE_DAYS", "14"))
+    RECENCY_WEIGHT: float = float(os.getenv("RECENCY_WEIGHT", "0.35"))
+    RECENCY_CANDIDATE_MULTIPLIER: int = 4
+
+    # Vector store sharding: one FAISS shard per category, uncategorized notes hashed into buckets
+    VECTOR_SHARDING: bool = os.getenv("VECTOR_SHARDING", "false").lower() in ("1", "true", "yes")
+    VECTOR_UNCATEGORIZED_BUCKETS: int = int(os.getenv("VECTOR_UNCATEGORIZED_BUCKETS", "4"))
+    VECTOR_SEARCH_WORKERS: int = int(os.getenv("VECTOR_SEARCH_WORKERS", "4"))
+    # Memory-map index files on load (Windows cannot replace a mapped file, so off there by default)
+    VECTOR_INDEX_MMAP: bool = os.getenv("VECTOR_INDEX_MMAP", "false" if os.name == "nt" else "true").lower() in ("1", "true", "yes")
+
+    # Search hits are hydrated from notes.db; recently returned snippets stay in an LRU cache
+    SNIPPET_CACHE_SIZE: int = int(os.getenv("SNIPPET_CACHE_SIZE", "256"))
+    # Total characters of query-matched passages returned by search_knowledge (shared by all hits)
+    SEARCH_SNIPPET_BUDGET_CHARS: int = int(os.getenv("SEARCH_SNIPPET_BUDGET_CHARS", "3000"))
+
+    # SQLite connection pools (core/database.py)
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "3"))
+    SQLITE_CACHE_KIB: int = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+    SQLITE_MMAP_BYTES: int = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+    # In-process read-through cache for full notes (NoteService.get_note), bounded by bytes
+    NOTE_CACHE_MAX_BYTES: int = int(os.getenv("NOTE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # Note change feed (GET /api/notes/changes): poll interval for writes made by other processes
+    CHANGE_FEED_POLL_SECONDS: float = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "1.0"))
+    CHANGE_FEED_RETENTION_HOURS: float = float(os.getenv("CHANGE_FEED_RETENTION_HOURS", "168"))
+
+    # Local CHAT/TASK classifier ahead of the LLM router: "off" | "shadow" (compare only) | "on"
+    INTENT_FAST_PATH_MODE: str = os.getenv("INTENT_FAST_PATH_MODE", "shadow")
+    INTENT_FAST_PATH_THRESHOLD: float = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.9"))
+    # Opt-in: append raw user queries + LLM router verdicts to intent_routing_log.jsonl (data dir) as training data
+    INTENT_ROUTING_LOG: bool = os.getenv("INTENT_ROUTING_LOG", "false").lower() in ("1", "true", "yes")
+    # Memoized router/write-policy classifier verdicts (agent/decision_cache.py)
+    DECISION_CACHE_SIZE: int = int(os.getenv("DECISION_CACHE_SIZE", "2048"))
+    DECISION_CACHE_TTL_SECONDS: float = float(os.getenv("DECISION_CACHE_TTL_SECONDS", "3600"))
+
+    # Prompt history budget (agent/history_budget.py): recent turns verbatim, older ones summarized.
+    # Sized for 32k-context models (minus the 4096-token completion, system prompt and tool schemas);
+    # CJK text counts ~1 token per character, so this is roughly 24k characters of Chinese notes.
+    HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "24000"))
+    HISTORY_RECENT_TURNS: int = int(os.getenv("HISTORY_RECENT_TURNS", "3"))
+    HISTORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "800"))
+
+    # Independent read-only tool calls from one agent step run concurrently (writes stay one at a time)
+    PARALLEL_READ_TOOLS: bool = os.getenv("PARALLEL_READ_TOOLS", "true").lower() in ("1", "true", "yes")
+    MAX_PARALLEL_TOOL_CALLS: int = int(os.getenv("MAX_PARALLEL_TOOL_CALLS", "4"))
+
+    # Speculative note/search prefetch started alongside the router (agent/prefetch.py)
+    SPECULATIVE_PREFETCH: bool = os.getenv("SPECULATIVE_PREFETCH", "true").lower() in ("1", "true", "yes")
+    PREFETCH_TTL_SECONDS: float = float(os.getenv("PREFETCH_TTL_SECONDS", "120"))
+
+    # Per-thread memo of read-only tool results (agent/tool_memo.py), invalidated by note/category changes
+    TOOL_MEMO_ENABLED: bool = os.getenv("TOOL_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+    TOOL_MEMO_MAX_ENTRIES: int = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "64"))
+    TOOL_MEMO_MAX_THREADS: int = int(os.getenv("TOOL_MEMO_MAX_THREADS", "256"))
+
+    # update_note on notes this long edits only the affected heading sections (agent/section_editor.py)
+    SECTION_EDIT_MIN_CHARS: int = int(os.getenv("SECTION_EDIT_MIN_CHARS", "4000"))
+    SECTION_EDIT_MAX_SHARE: float = float(os.getenv("SECTION_EDIT_MAX_SHARE", "0.6"))
+
+    # Note edits stream through an incremental structure check and abort once flattened (agent/structure_guard.py)
+    STRUCTURE_GUARD_STREAMING: bool = os.getenv("STRUCTURE_GUARD_STREAMING", "true").lower() in ("1", "true", "yes")
+    STRUCTURE_GUARD_MIN_CHARS: int = int(os.getenv("STRUCTURE_GUARD_MIN_CHARS", "300"))
+
     class Config:
         # Smart .env resolution for PyInstaller
         import sys
@@ -0,0 +1,185 @@
+"""
+Process-wide SQLite connection pools for notes.db and checkpoints.db.
+
+Opening an aiosqlite connection spawns a worker thread and a file handle, which
+used to happen several times per chat turn. Each database file now gets a small
+pool of read-only connections plus a single writer, all long-lived, in WAL mode
+with tuned pragmas. sqlite3 caches prepared statements per connection, so
+reusing connections also reuses compiled statements.
+
+Usage:
+    async with get_pool(path).read() as db:
+        cursor = await db.execute("SELECT ...", params)
+    async with get_pool(path).write() as db:   # commits on success, rolls back on error
+        await db.execute("UPDATE ...", params)
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import aiosqlite
+
+from core.config import settings
+
+
+# Safe print for Windows GBK encoding
+def safe_print(msg: str):
+    """Print message safely on Windows by handling encoding errors."""
+    try:
+        print(msg)
+    except UnicodeEncodeError:
+        try:
+            import sys
+            sys.stdout.buffer.write((msg + '\n').encode('utf-8', errors='replace'))
+            sys.stdout.buffer.flush()
+        except Exception:
+            print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+
+
+# Per-connection compiled statement cache (sqlite3 default is 128).
+STATEMENT_CACHE_SIZE = 256
+
+
+def _connection_pragmas() -> List[str]:
+    return [
+        # Readers never block the writer (and the Electron app) and vice versa.
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA busy_timeout = 5000",
+        "PRAGMA temp_store = MEMORY",
+        f"PRAGMA cache_size = -{int(settings.SQLITE_CACHE_KIB)}",
+        f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_BYTES)}",
+    ]
+
+
+class SQLitePool:
+    """A few read-only connections plus one serialized writer for one database file."""
+
+    def __init__(self, path: str, max_readers: int = 3):
+        self.path = str(path)
+        self.max_readers = max(1, int(max_readers))
+        self._loop = asyncio.get_running_loop()
+        self._idle_readers: List[aiosqlite.Connection] = []
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._reader_slots = asyncio.Semaphore(self.max_readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._closed = False
+        self.counters = {"reads": 0, "writes": 0, "connections_opened": 0, "write_rollbacks": 0}
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        pending = aiosqlite.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
+        worker = getattr(pending, "_thread", None)
+        if worker is not None:
+            # Long-lived pooled connections must not keep the interpreter alive on exit.
+            worker.daemon = True
+        conn = await pending
+        conn.row_factory = aiosqlite.Row
+        for pragma in _connection_pragmas():
+            try:
+                await conn.execute(pragma)
+            except Exception as e:
+                safe_print(f"[DB] {pragma} failed on {self.path}: {e}")
+        if read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        self.counters["connections_opened"] += 1
+        return conn
+
+    @asynccontextmanager
+    async def read(self):
+        """Borrow a read-only connection."""
+        async with self._reader_slots:
+            if self._idle_readers:
+                conn = self._idle_readers.pop()
+            else:
+                conn = await self._connect(read_only=True)
+                self._all_readers.append(conn)
+            self.counters["reads"] += 1
+            try:
+                yield conn
+            finally:
+                if self._closed:
+                    await conn.close()
+                else:
+                    self._idle_readers.append(conn)
+
+    @asynccontextmanager
+    async def write(self):
+        """Exclusive access to the writer; commits on success, rolls back on error."""
+        async with self._write_lock:
+            if self._writer is None:
+                self._writer = await self._connect(read_only=False)
+            self.counters["writes"] += 1
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                self.counters["write_rollbacks"] += 1
+                await self._writer.rollback()
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "readers_open": len(self._all_readers),
+            "readers_idle": len(self._idle_readers),
+            "max_readers": self.max_readers,
+            "writer_open": self._writer is not None,
+            **self.counters,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        conns = list(self._idle_readers)
+        if self._writer is not None:
+            conns.append(self._writer)
+        self._idle_readers = []
+        self._all_readers = []
+        self._writer = None
+        for conn in conns:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    def abandon(self) -> None:
+        """Stop connections without awaiting (pool belonged to another event loop)."""
+        self._closed = True
+        for conn in self._idle_readers + ([self._writer] if self._writer else []):
+            try:
+                conn.stop()
+            except Exception:
+                pass
+        self._idle_readers = []
+        self._all_readers = []
+        self._writer = None
+
+
+_pools: Dict[str, SQLitePool] = {}
+
+
+def get_pool(path: Optional[str] = None) -> SQLitePool:
+    """Shared pool for a database file (defaults to notes.db). Must be called inside a running loop."""
+    key = str(path or settings.NOTES_DB_PATH)
+    pool = _pools.get(key)
+    if pool is not None and pool._loop is not asyncio.get_running_loop():
+        pool.abandon()
+        pool = None
+    if pool is None:
+        pool = SQLitePool(key, max_readers=settings.SQLITE_READ_POOL_SIZE)
+        _pools[key] = pool
+    return pool
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [pool.stats() for pool in _pools.values()]
+
+
+async def close_all_pools() -> None:
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        if pool._loop is asyncio.get_running_loop():
+            await pool.close()
+        else:
+            pool.abandon()
@@ -0,0 +1,234 @@
+"""
+Startup warm-up: move one-time costs (index load, DB pool open, HTTP pool setup,
+graph compilation, first integrity sync, markdownSource staleness backfill) out
+of the first user request.
+
+Started as a background task from the FastAPI lifespan; `/health` reports the
+per-phase status and timings via `readiness.snapshot()`.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.config import settings
+
+
+# Safe print for Windows GBK encoding
+def safe_print(msg: str):
+    """Print message safely on Windows by handling encoding errors."""
+    try:
+        print(msg)
+    except UnicodeEncodeError:
+        try:
+            import sys
+            sys.stdout.buffer.write((msg + '\n').encode('utf-8', errors='replace'))
+            sys.stdout.buffer.flush()
+        except Exception:
+            print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+
+
+PHASE_PENDING = "pending"
+PHASE_RUNNING = "running"
+PHASE_OK = "ok"
+PHASE_SKIPPED = "skipped"
+PHASE_FAILED = "failed"
+
+
+class ReadinessTracker:
+    """Records warm-up phases in start order with status and wall time."""
+
+    def __init__(self):
+        self.started_at_ms: Optional[int] = None
+        self.finished_at_ms: Optional[int] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, names: List[str]) -> None:
+        for name in names:
+            self.phases.setdefault(name, {"status": PHASE_PENDING, "ms": None})
+
+    async def run_phase(self, name: str, fn: Callable[[], Awaitable[Optional[str]]]) -> None:
+        """Run one phase; a returned string marks it skipped with that reason."""
+        phase = self.phases.setdefault(name, {"status": PHASE_PENDING, "ms": None})
+        phase["status"] = PHASE_RUNNING
+        start = time.perf_counter()
+        try:
+            skip_reason = await fn()
+            phase["status"] = PHASE_SKIPPED if skip_reason else PHASE_OK
+            if skip_reason:
+                phase["detail"] = skip_reason
+        except Exception as e:
+            phase["status"] = PHASE_FAILED
+            phase["detail"] = str(e)
+            safe_print(f"[WARMUP] {name} failed: {e}")
+        finally:
+            phase["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.phases) and all(
+            p["status"] in (PHASE_OK, PHASE_SKIPPED, PHASE_FAILED) for p in self.phases.values()
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        total_ms = None
+        if self.started_at_ms is not None:
+            end = self.finished_at_ms or int(time.time() * 1000)
+            total_ms = end - self.started_at_ms
+        if not self.phases:
+            state = "not_started"
+        elif self.ready:
+            state = "degraded" if any(p["status"] == PHASE_FAILED for p in self.phases.values()) else "ready"
+        else:
+            state = "warming"
+        return {
+            "state": state,
+            "ready": self.ready,
+            "total_ms": total_ms,
+            "phases": {name: dict(phase) for name, phase in self.phases.items()},
+        }
+
+
+readiness = ReadinessTracker()
+
+
+async def _prime_http(client: Any, url: str) -> None:
+    """Open a pooled keep-alive connection (TCP + TLS); the response status is irrelevant."""
+    if isinstance(client, httpx.AsyncClient):
+        await client.get(url, timeout=5.0)
+    else:
+        await asyncio.to_thread(client.get, url, timeout=5.0)
+
+
+async def _warm_vector_index() -> Optional[str]:
+    from services.rag_service import RAGService
+
+    rag = RAGService()
+    await rag._ensure_loaded(allow_integrity_check=False)
+    return None
+
+
+async def _warm_notes_db() -> Optional[str]:
+    from core.database import get_pool
+
+    if not os.path.exists(settings.NOTES_DB_PATH):
+        return "notes.db not found"
+    # Open a pooled reader (pragmas applied once) and pull the notes pages into cache.
+    async with get_pool(settings.NOTES_DB_PATH).read() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM notes WHERE isDeleted = 0")
+        await cursor.fetchone()
+    return None
+
+
+async def _warm_schema_migrations() -> Optional[str]:
+    from services.schema_migrations import log_query_plans, run_migrations
+
+    if not os.path.exists(settings.NOTES_DB_PATH):
+        return "notes.db not found"
+    # Indexes, sidecar tables, changelog and FTS triggers; changelog logs app-side edits from startup.
+    outcome = await run_migrations(settings.NOTES_DB_PATH)
+    await log_query_plans(settings.NOTES_DB_PATH)
+    if outcome["skipped"]:
+        return f"skipped: {', '.join(outcome['skipped'])}"
+    return None
+
+
+async def _warm_checkpoints_db() -> Optional[str]:
+    from agent.graph import CHECKPOINT_DB_PATH
+    from core.database import get_pool
+
+    if not os.path.exists(CHECKPOINT_DB_PATH):
+        return "checkpoints.db not found"
+    async with get_pool(CHECKPOINT_DB_PATH).read() as db:
+        cursor = await db.execute("SELECT 1")
+        await cursor.fetchone()
+    return None
+
+
+async def _warm_embedding_client() -> Optional[str]:
+    from services.rag_service import RAGService
+
+    emb = RAGService()._get_embedding_fn()
+    if not settings.DASHSCOPE_API_KEY:
+        return "no embedding API key"
+    await _prime_http(emb.client, f"{emb.api_base}/models")
+    return None
+
+
+async def _warm_llm_client() -> Optional[str]:
+    from core.llm import get_llm
+
+    llm = get_llm()
+    api_key = llm.openai_api_key
+    if hasattr(api_key, "get_secret_value"):
+        api_key = api_key.get_secret_value()
+    if not api_key:
+        return "no LLM API key"
+    client = getattr(llm, "http_async_client", None)
+    if client is None:
+        return "no shared async client"
+    await _prime_http(client, f"{str(llm.openai_api_base).rstrip('/')}/models")
+    return None
+
+
+async def _warm_intent_classifier() -> Optional[str]:
+    from agent.intent_classifier import get_intent_classifier
+
+    classifier = get_intent_classifier()
+    if classifier.mode == "off":
+        return "fast path off"
+    # Fold newly logged router decisions into the local model, off the event loop.
+    summary = await asyncio.to_thread(classifier.retrain)
+    if summary is None and classifier.model is None:
+        return "not enough logged decisions to train"
+    return None
+
+
+async def _warm_agent_graph() -> Optional[str]:
+    from agent.supervisor import get_agent_graph
+
+    await get_agent_graph()
+    return None
+
+
+async def _warm_integrity_sync() -> Optional[str]:
+    from services.rag_service import RAGService
+
+    await RAGService()._maybe_incremental_sync_with_db()
+    return None
+
+
+async def _warm_markdown_staleness() -> Optional[str]:
+    from services.note_service import NoteService
+
+    if not os.path.exists(settings.NOTES_DB_PATH):
+        return "notes.db not found"
+    # One-time backfill for notes written before staleness was persisted.
+    await NoteService().backfill_markdown_staleness()
+    return None
+
+
+WARMUP_PHASES: List[Tuple[str, Callable[[], Awaitable[Optional[str]]]]] = [
+    ("vector_index", _warm_vector_index),
+    ("notes_db", _warm_notes_db),
+    ("schema_migrations", _warm_schema_migrations),
+    ("checkpoints_db", _warm_checkpoints_db),
+    ("embedding_client", _warm_embedding_client),
+    ("llm_client", _warm_llm_client),
+    ("agent_graph", _warm_agent_graph),
+    ("intent_classifier", _warm_intent_classifier),
+    ("integrity_sync", _warm_integrity_sync),
+    ("markdown_staleness", _warm_markdown_staleness),
+]
+
+
+async def run_warmup(tracker: ReadinessTracker = readiness) -> None:
+    """Run all phases in order; failures are recorded, never raised."""
+    tracker.started_at_ms = int(time.time() * 1000)
+    tracker.register([name for name, _ in WARMUP_PHASES])
+    for name, fn in WARMUP_PHASES:
+        await tracker.run_phase(name, fn)
+    tracker.finished_at_ms = int(time.time() * 1000)
+    safe_print(f"[WARMUP] {tracker.snapshot()['state']} in {tracker.finished_at_ms - tracker.started_at_ms} ms")
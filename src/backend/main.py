@@ -77,14 +77,27 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from core.config import settings
 from core.model_manager import model_manager
+from core.warmup import readiness, run_warmup
+from core.database import close_all_pools
+from services.change_feed import run_retention as run_change_feed_retention
 from api.routes import router as api_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Deeply simplified lifecycle."""
+    """Start serving immediately; warm up index, DB, HTTP pools and graph in background."""
+    import asyncio
+
     safe_print(f">> LmNotebook Origin Agent Backend Ready on port {settings.PORT}")
+    warmup_task = asyncio.create_task(run_warmup())
+    retention_task = asyncio.create_task(run_change_feed_retention())
     yield
+    for task in (warmup_task, retention_task):
+        if not task.done():
+            task.cancel()
+    # Let a phase that is mid-query unwind before its pool is closed.
+    await asyncio.gather(warmup_task, retention_task, return_exceptions=True)
+    await close_all_pools()
     safe_print(">> Shutdown complete.")
 
 
@@ -118,7 +131,9 @@ async def health_check():
         "provider": active["name"] if active else "Default",
         "llm_configured": bool(active.get("apiKey")) if active else False,
         "model": active.get("modelName") if active else settings.MODEL_NAME,
-        "base_url": active.get("baseUrl") if active else settings.OPENAI_BASE_URL
+        "base_url": active.get("baseUrl") if active else settings.OPENAI_BASE_URL,
+        "ready": readiness.ready,
+        "warmup": readiness.snapshot(),
     }
 
 
@@ -0,0 +1,195 @@
+"""
+In-memory category catalog shared by the agent tools and the graph.
+
+Categories are owned by the Electron app and change rarely, yet one categorize
+turn used to read the whole table several times (list, validate, resolve hint).
+The catalog keeps an immutable snapshot per database with id/name/normalized
+lookups, and is revalidated with a single-row probe of a version counter that
+triggers on `categories` bump (see schema migration 7). Databases where that
+migration has not run yet fall back to reloading on every access.
+"""
+import asyncio
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.database import get_pool
+
+CATEGORY_VERSION_TABLE = "category_catalog_version"
+
+_NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# The counter starts at the creation time, so a re-created table (e.g. after the
+# app restored a backup) never reports a version an old snapshot was built from.
+CATEGORY_VERSION_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CATEGORY_VERSION_TABLE} (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    f"INSERT OR IGNORE INTO {CATEGORY_VERSION_TABLE} (id, version) VALUES (1, {_NOW_MS_SQL})",
+    *[
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {CATEGORY_VERSION_TABLE}_after_{event.lower()} AFTER {event} ON categories
+        BEGIN
+            UPDATE {CATEGORY_VERSION_TABLE} SET version = version + 1 WHERE id = 1;
+        END
+        """
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ],
+]
+
+# Names longer than this are matched by a linear scan instead of the substring index.
+MAX_INDEXED_NAME_LENGTH = 64
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_category_key(value: Any) -> str:
+    """Case- and whitespace-insensitive form used for id/name matching."""
+    return _WHITESPACE_RE.sub("", str(value or "").strip().lower())
+
+
+class CategoryCatalog:
+    """Immutable snapshot of the categories table, ordered by "order"."""
+
+    def __init__(self, rows: List[Dict[str, Any]], version: Optional[int] = None):
+        self.version = version
+        self._rows = [dict(row) for row in rows]
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.id_by_name: Dict[str, str] = {}
+        self._by_norm_id: Dict[str, str] = {}
+        self._by_norm_name: Dict[str, str] = {}
+        # Every substring of every normalized name -> first category (in display
+        # order) containing it, so "contains" hint matching is one dict lookup.
+        self._by_fragment: Dict[str, str] = {}
+        self._long_names: List[Tuple[str, str]] = []
+
+        for row in self._rows:
+            cid = str(row.get("id", "") or "")
+            name = str(row.get("name", "") or "")
+            self.by_id.setdefault(cid, row)
+            self.id_by_name.setdefault(name, cid)
+            self._by_norm_id.setdefault(normalize_category_key(cid), cid)
+            norm_name = normalize_category_key(name)
+            self._by_norm_name.setdefault(norm_name, cid)
+            if len(norm_name) > MAX_INDEXED_NAME_LENGTH:
+                self._long_names.append((norm_name, cid))
+                continue
+            for start in range(len(norm_name)):
+                for end in range(start + 1, len(norm_name) + 1):
+                    self._by_fragment.setdefault(norm_name[start:end], cid)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._rows]
+
+    def name_of(self, category_id: Optional[str]) -> Optional[str]:
+        row = self.by_id.get(str(category_id or ""))
+        return str(row.get("name", "") or "") if row else None
+
+    def resolve_id_or_name(self, value: str) -> Optional[str]:
+        """Exact id, else exact name (what tools accept from the model)."""
+        if value in self.by_id:
+            return value
+        return self.id_by_name.get(value)
+
+    def resolve_hint(self, hint: str) -> Optional[str]:
+        """
+        Resolve a free-form hint to a category id: normalized id match, then
+        normalized name match, then the first category whose name contains it.
+        """
+        norm = normalize_category_key(hint)
+        if not norm:
+            return None
+        cid = self._by_norm_id.get(norm) or self._by_norm_name.get(norm) or self._by_fragment.get(norm)
+        if cid is not None:
+            return cid
+        for norm_name, long_cid in self._long_names:
+            if norm in norm_name:
+                return long_cid
+        return None
+
+
+class CategoryCatalogCache:
+    """Per-database catalog snapshots validated against the version counter."""
+
+    def __init__(self):
+        self._snapshots: Dict[str, CategoryCatalog] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+        self.counters = {"hits": 0, "reloads": 0, "invalidations": 0}
+
+    async def get(self, db_path: str) -> CategoryCatalog:
+        db_path = str(db_path)
+        version = await self._probe_version(db_path)
+        with self._lock:
+            snapshot = self._snapshots.get(db_path)
+        if snapshot is not None and version is not None and snapshot.version == version:
+            with self._lock:
+                self.counters["hits"] += 1
+            return snapshot
+
+        # Concurrent misses (tool + graph in the same turn) share one reload.
+        key = (db_path, id(asyncio.get_running_loop()))
+        lock = self._load_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            with self._lock:
+                snapshot = self._snapshots.get(db_path)
+            if snapshot is not None and version is not None and snapshot.version == version:
+                with self._lock:
+                    self.counters["hits"] += 1
+                return snapshot
+            snapshot = await self._load(db_path)
+            with self._lock:
+                self._snapshots[db_path] = snapshot
+                self.counters["reloads"] += 1
+            return snapshot
+
+    def invalidate(self, db_path: Optional[str] = None) -> None:
+        with self._lock:
+            if db_path is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(str(db_path), None)
+            self.counters["invalidations"] += 1
+
+    async def _probe_version(self, db_path: str) -> Optional[int]:
+        try:
+            async with get_pool(db_path).read() as db:
+                cursor = await db.execute(f"SELECT version FROM {CATEGORY_VERSION_TABLE} WHERE id = 1")
+                row = await cursor.fetchone()
+            return int(row[0]) if row else None
+        except Exception:
+            # Migration not applied yet: no version, so never serve from cache.
+            return None
+
+    async def _load(self, db_path: str) -> CategoryCatalog:
+        async with get_pool(db_path).read() as db:
+            # Version first: a change landing between the two reads can only make the
+            # snapshot look older than its rows (one extra reload), never newer.
+            version = None
+            try:
+                cursor = await db.execute(f"SELECT version FROM {CATEGORY_VERSION_TABLE} WHERE id = 1")
+                row = await cursor.fetchone()
+                version = int(row[0]) if row else None
+            except Exception:
+                pass
+            cursor = await db.execute("""
+                SELECT id, name, color, "order"
+                FROM categories
+                ORDER BY "order" ASC
+            """)
+            rows = [dict(row) for row in await cursor.fetchall()]
+        return CategoryCatalog(rows, version)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "databases": len(self._snapshots),
+                "categories": sum(len(s) for s in self._snapshots.values()),
+                **self.counters,
+            }
@@ -0,0 +1,198 @@
+"""
+Note change feed backed by a changelog table in notes.db.
+
+SQLite triggers on `notes` append one row per insert/update/delete to
+`note_changes`, so writes from the Electron app and from this backend land in
+the same ordered log. The autoincrement `seq` is the resumable event id.
+Backend writes also call `notify()` so in-process waiters wake immediately;
+writes from other processes are picked up by a cheap indexed poll.
+
+Events older than CHANGE_FEED_RETENTION_HOURS are pruned by `run_retention`
+(a background task started with the app), since the triggers log every
+Electron autosave whether or not anything reads the feed, and opportunistically
+by readers.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from core.database import get_pool
+
+CHANGES_TABLE = "note_changes"
+
+_NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+CHANGE_FEED_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        noteId TEXT NOT NULL,
+        op TEXT NOT NULL,
+        updatedAt INTEGER,
+        categoryId TEXT,
+        changedAt INTEGER NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS idx_{CHANGES_TABLE}_changedAt ON {CHANGES_TABLE}(changedAt)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGES_TABLE}_after_insert AFTER INSERT ON notes
+    BEGIN
+        INSERT INTO {CHANGES_TABLE} (noteId, op, updatedAt, categoryId, changedAt)
+        VALUES (NEW.id, CASE WHEN NEW.isDeleted = 1 THEN 'deleted' ELSE 'created' END,
+                NEW.updatedAt, NEW.categoryId, {_NOW_MS_SQL});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGES_TABLE}_after_update AFTER UPDATE ON notes
+    BEGIN
+        INSERT INTO {CHANGES_TABLE} (noteId, op, updatedAt, categoryId, changedAt)
+        VALUES (NEW.id,
+                CASE
+                    WHEN NEW.isDeleted = 1 AND OLD.isDeleted = 0 THEN 'deleted'
+                    WHEN NEW.isDeleted = 0 AND OLD.isDeleted = 1 THEN 'restored'
+                    ELSE 'updated'
+                END,
+                NEW.updatedAt, NEW.categoryId, {_NOW_MS_SQL});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGES_TABLE}_after_delete AFTER DELETE ON notes
+    BEGIN
+        INSERT INTO {CHANGES_TABLE} (noteId, op, updatedAt, categoryId, changedAt)
+        VALUES (OLD.id, 'purged', OLD.updatedAt, OLD.categoryId, {_NOW_MS_SQL});
+    END
+    """,
+]
+
+PRUNE_INTERVAL_MS = 60 * 60 * 1000
+
+
+def _event(row: Any) -> Dict[str, Any]:
+    return {
+        "id": row["seq"],
+        "noteId": row["noteId"],
+        "op": row["op"],
+        "updatedAt": row["updatedAt"],
+        "categoryId": row["categoryId"],
+        "changedAt": row["changedAt"],
+    }
+
+
+class ChangeFeed:
+    """Reader/notifier for one database's changelog."""
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        self._loop = asyncio.get_running_loop()
+        self._ready = False
+        self._wakeup = asyncio.Event()
+        self._last_prune_ms = 0
+
+    async def ensure_schema(self) -> None:
+        if self._ready:
+            return
+        async with get_pool(self.db_path).write() as db:
+            for statement in CHANGE_FEED_SCHEMA:
+                await db.execute(statement)
+        self._ready = True
+
+    def notify(self) -> None:
+        """Wake waiters after a backend write (the trigger already logged it)."""
+        self._wakeup.set()
+
+    async def latest_seq(self) -> int:
+        """Highest event id issued so far (0 for an empty log)."""
+        await self.ensure_schema()
+        async with get_pool(self.db_path).read() as db:
+            cursor = await db.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGES_TABLE,))
+            row = await cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    async def read_since(self, since: int, limit: int = 500) -> Dict[str, Any]:
+        """
+        Events with id > since, oldest first.
+
+        `reset` is true when events after `since` were already pruned, meaning the
+        subscriber missed changes and must resynchronize from a full listing.
+        """
+        await self.ensure_schema()
+        await self._maybe_prune()
+        async with get_pool(self.db_path).read() as db:
+            cursor = await db.execute(
+                f"SELECT * FROM {CHANGES_TABLE} WHERE seq > ? ORDER BY seq LIMIT ?",
+                (int(since), int(limit))
+            )
+            events = [_event(row) for row in await cursor.fetchall()]
+            cursor = await db.execute(f"SELECT MIN(seq) FROM {CHANGES_TABLE}")
+            oldest = (await cursor.fetchone())[0]
+            # sqlite_sequence keeps the highest id ever issued, even after pruning.
+            cursor = await db.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGES_TABLE,))
+            row = await cursor.fetchone()
+            issued = int(row[0]) if row else 0
+        first_available = int(oldest) if oldest is not None else issued + 1
+        return {
+            "events": events,
+            "last_id": events[-1]["id"] if events else max(int(since), issued),
+            "reset": bool(since) and int(since) < first_available - 1,
+        }
+
+    async def wait_for_changes(self, since: int, timeout: float, limit: int = 500) -> Dict[str, Any]:
+        """Long-poll: return as soon as events after `since` exist, or empty after `timeout`."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        poll = max(0.05, float(settings.CHANGE_FEED_POLL_SECONDS))
+        while True:
+            # Clear before reading so a notify() racing with the read is not lost.
+            self._wakeup.clear()
+            result = await self.read_since(since, limit)
+            remaining = deadline - time.monotonic()
+            if result["events"] or result["reset"] or remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(poll, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def prune(self) -> int:
+        """Delete events older than the retention window; returns the number removed."""
+        now_ms = int(time.time() * 1000)
+        self._last_prune_ms = now_ms
+        cutoff = now_ms - int(settings.CHANGE_FEED_RETENTION_HOURS * 3600 * 1000)
+        async with get_pool(self.db_path).write() as db:
+            cursor = await db.execute(f"DELETE FROM {CHANGES_TABLE} WHERE changedAt < ?", (cutoff,))
+            return max(0, cursor.rowcount or 0)
+
+    async def _maybe_prune(self) -> None:
+        if int(time.time() * 1000) - self._last_prune_ms < PRUNE_INTERVAL_MS:
+            return
+        await self.prune()
+
+
+_feeds: Dict[str, ChangeFeed] = {}
+
+
+def get_change_feed(db_path: Optional[str] = None) -> ChangeFeed:
+    """Shared feed for a database file (defaults to notes.db). Must be called inside a running loop."""
+    key = str(db_path or settings.NOTES_DB_PATH)
+    feed = _feeds.get(key)
+    if feed is None or feed._loop is not asyncio.get_running_loop():
+        feed = ChangeFeed(key)
+        _feeds[key] = feed
+    return feed
+
+
+async def run_retention(db_path: Optional[str] = None, interval_seconds: float = PRUNE_INTERVAL_MS / 1000) -> None:
+    """Prune the changelog now and then every `interval_seconds`, until cancelled."""
+    while True:
+        path = str(db_path or settings.NOTES_DB_PATH)
+        # Never create notes.db; the table itself comes from the schema migration.
+        if os.path.exists(path):
+            try:
+                removed = await get_change_feed(path).prune()
+                if removed:
+                    print(f"[CHANGES] Pruned {removed} change event(s) past retention")
+            except Exception as e:
+                if "no such table" not in str(e).lower():
+                    print(f"[CHANGES] Retention prune failed: {e}")
+        await asyncio.sleep(interval_seconds)
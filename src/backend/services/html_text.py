@@ -0,0 +1,84 @@
+"""
+HTML-to-text extraction shared by note writes, agent tools and the
+markdownSource staleness check.
+
+Tags are removed with compiled patterns, entities are decoded with
+`html.unescape` (the full HTML5 table, not a hand-picked few), and whitespace
+is normalized with `str.split`. Inputs without markup skip the regex passes.
+
+plainText matches what the Electron renderer stores (`element.textContent`):
+tags vanish without a separator, so adjacent blocks join ("<p>a</p><p>b</p>"
+-> "ab"), and only whitespace runs are folded, as the backend always did. Both
+writers thus produce the same FTS rows and staleness inputs for a note. The
+editable and similarity variants do break at block boundaries (closing block
+tags and <br>), since they need line/word separation and are never stored.
+
+An incremental tokenizer was benchmarked against this and rejected: on a
+720 KiB note, html.parser.HTMLParser was ~10x and a Python-level regex token
+loop ~3x slower than the compiled passes (tests/bench_html_text.py).
+"""
+import html
+import re
+
+# Closing block tags and <br> mark a text boundary; every other tag vanishes.
+_BLOCK_BOUNDARY_RE = re.compile(
+    r"<(?:br\s*/?|/(?:p|div|li|tr|td|th|h[1-6]|blockquote|pre|table|ul|ol|"
+    r"section|article|header|footer|figure|figcaption|details|summary|dd|dt)\s*)>",
+    re.IGNORECASE,
+)
+_TAG_RE = re.compile(r"<!--.*?-->|<[^>]+>", re.DOTALL)
+_INLINE_SPACE_RE = re.compile(r"[ \t\f\v\u00a0]+")
+_EXTRA_NEWLINES_RE = re.compile(r"\n{3,}")
+# Markdown/markup punctuation ignored when comparing markdownSource with plainText.
+# (A regex beats str.translate here, which is slow on non-ASCII text.)
+_SIMILARITY_PUNCTUATION_RE = re.compile(r"[`*_>#\-\[\]\(\)!|:~]+")
+
+
+def _decode_entities(text: str) -> str:
+    if "&" not in text:
+        return text
+    # The editor mostly emits these; plain replaces are much cheaper than unescape().
+    text = (
+        text.replace("&nbsp;", " ")
+        .replace("&lt;", "<")
+        .replace("&gt;", ">")
+        .replace("&quot;", '"')
+        .replace("&#39;", "'")
+    )
+    if text.count("&") == text.count("&amp;"):
+        return text.replace("&amp;", "&")
+    return html.unescape(text)
+
+
+def _strip_markup(text: str, block_breaks: bool = True) -> str:
+    if "<" in text:
+        if block_breaks:
+            text = _BLOCK_BOUNDARY_RE.sub("\n", text)
+        text = _TAG_RE.sub("", text)
+    return _decode_entities(text)
+
+
+def html_to_plain_text(html_content: str) -> str:
+    """Single-line plain text (the notes.plainText column), Electron's textContent with whitespace folded."""
+    if not html_content:
+        return ""
+    return " ".join(_strip_markup(html_content, block_breaks=False).split())
+
+
+def html_to_editable_text(html_content: str) -> str:
+    """Multiline text that keeps one line per block, for editing/matching fallbacks."""
+    if not html_content:
+        return ""
+    text = _strip_markup(html_content)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _INLINE_SPACE_RE.sub(" ", text)
+    text = _EXTRA_NEWLINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def normalize_for_similarity(text: str) -> str:
+    """Lower-cased words of HTML, Markdown or plain text with markup punctuation dropped."""
+    if not text:
+        return ""
+    return " ".join(_SIMILARITY_PUNCTUATION_RE.sub(" ", _strip_markup(text)).split()).lower()
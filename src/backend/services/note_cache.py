@@ -0,0 +1,95 @@
+"""
+Process-wide read-through cache for full note rows.
+
+One agent turn tends to load the same note several times (referenced-note
+context, read_note_content, the update baseline, title resolution in the stream
+adapter). Entries are validated against a cheap `updatedAt`/`isDeleted` probe
+before being served, so edits made by the Electron app are never masked; writes
+going through NoteService evict or refresh their entry directly.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def estimate_note_bytes(note: Dict[str, Any]) -> int:
+    """Rough in-memory footprint: string payloads dominate note rows."""
+    size = 64
+    for key, value in note.items():
+        size += len(key) + 16
+        if isinstance(value, str):
+            size += len(value.encode("utf-8", errors="ignore"))
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+    return size
+
+
+class NoteCache:
+    """LRU of note dicts bounded by total estimated bytes, with hit/miss counters."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, db_path: str, note_id: str, updated_at: Any, is_deleted: Any) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached note if it still matches the probed version."""
+        key = (db_path, note_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            note, _ = entry
+            if note.get("updatedAt") != updated_at or note.get("isDeleted") != is_deleted:
+                self._drop(key)
+                self.counters["stale"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return dict(note)
+
+    def put(self, db_path: str, note_id: str, note: Dict[str, Any]) -> None:
+        size = estimate_note_bytes(note)
+        key = (db_path, note_id)
+        with self._lock:
+            self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (dict(note), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.counters["evictions"] += 1
+
+    def invalidate(self, db_path: str, note_id: str) -> None:
+        with self._lock:
+            if self._drop((db_path, note_id)):
+                self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Tuple[str, str]) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                **self.counters,
+            }
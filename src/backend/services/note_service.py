@@ -2,17 +2,70 @@
 Note Service - Interface to the LmNotebook SQLite database.
 Provides CRUD operations and bridges with the RAG service.
 """
-import aiosqlite
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence, Tuple
 from datetime import datetime
 import uuid
 import asyncio
+import base64
+import json
 import difflib
-import re
+import sqlite3
 
 from core.config import settings
+from core.database import get_pool
+from .category_catalog import CategoryCatalog, CategoryCatalogCache
+from .change_feed import get_change_feed
+from .html_text import html_to_plain_text, normalize_for_similarity
+from .note_cache import NoteCache
 from .rag_service import RAGService
 
+# UPDATE ... RETURNING needs SQLite 3.35+ (bundled with current Python builds).
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Sidecar table holding the markdownSource staleness verdict per note version.
+# A row is only valid while its updatedAt equals the note's updatedAt, so edits
+# made by the Electron app (which does not know about this table) simply miss.
+STALENESS_TABLE = "note_markdown_staleness"
+STALENESS_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {STALENESS_TABLE} (
+        noteId TEXT PRIMARY KEY,
+        updatedAt INTEGER NOT NULL,
+        isStale INTEGER NOT NULL
+    )
+"""
+_staleness_schema_ready: set = set()
+
+# Shared by every NoteService instance (they are created per call site).
+note_cache = NoteCache(settings.NOTE_CACHE_MAX_BYTES)
+category_catalog = CategoryCatalogCache()
+
+
+# Columns a note listing may project (content/plainText/markdownSource are the heavy ones).
+LISTABLE_FIELDS = (
+    "id", "title", "content", "plainText", "markdownSource", "categoryId",
+    "isPinned", "createdAt", "updatedAt",
+)
+DEFAULT_LIST_FIELDS = ("id", "title", "content", "plainText", "categoryId", "isPinned", "createdAt", "updatedAt")
+MAX_LIST_PAGE_SIZE = 1000
+
+BATCH_OPERATIONS = ("create", "update", "delete", "categorize")
+MAX_BATCH_OPERATIONS = 500
+
+
+def encode_list_cursor(updated_at: int, note_id: str) -> str:
+    """Opaque keyset cursor for (updatedAt, id) DESC listings."""
+    raw = json.dumps([int(updated_at), str(note_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_list_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(updated_at), str(note_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
 
 def safe_print(msg: str):
     try:
@@ -48,8 +101,7 @@ class NoteService:
     
     async def get_all_notes(self) -> List[Dict[str, Any]]:
         """Get all non-deleted notes."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with get_pool(self.db_path).read() as db:
             cursor = await db.execute("""
                 SELECT id, title, content, plainText, categoryId, isPinned, createdAt, updatedAt
                 FROM notes
@@ -59,23 +111,171 @@ class NoteService:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
+    async def list_notes_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        One keyset page of live notes, newest first.
+
+        Pages are ordered by (updatedAt, id) DESC and `cursor` is the opaque value
+        returned as `next_cursor` by the previous page, so each page is an index
+        range scan regardless of depth. `fields` projects columns (id and
+        updatedAt are always included because the cursor needs them).
+        """
+        columns = self.resolve_list_fields(fields)
+        limit = max(1, min(int(limit), MAX_LIST_PAGE_SIZE))
+        where = "isDeleted = 0"
+        params: List[Any] = []
+        if cursor:
+            after_updated, after_id = decode_list_cursor(cursor)
+            # Row-value comparison lets SQLite range-scan the (isDeleted, updatedAt, id) index.
+            where += " AND (updatedAt, id) < (?, ?)"
+            params += [after_updated, after_id]
+
+        async with get_pool(self.db_path).read() as db:
+            result = await db.execute(
+                f"SELECT {', '.join(columns)} FROM notes WHERE {where} "
+                f"ORDER BY updatedAt DESC, id DESC LIMIT ?",
+                params + [limit + 1]
+            )
+            rows = [dict(row) for row in await result.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_list_cursor(rows[-1]["updatedAt"], rows[-1]["id"])
+        return {"notes": rows, "next_cursor": next_cursor}
+
+    async def iter_note_batches(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 200,
+        cursor: Optional[str] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream live notes (after `cursor`) page by page; a pooled reader is held only per page."""
+        while True:
+            page = await self.list_notes_page(limit=batch_size, cursor=cursor, fields=fields)
+            if page["notes"]:
+                yield page["notes"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return
+
+    def resolve_list_fields(self, fields: Optional[Sequence[str]]) -> List[str]:
+        """Validated column list for a listing projection; raises ValueError on unknown names."""
+        requested = list(fields) if fields else list(DEFAULT_LIST_FIELDS)
+        unknown = [f for f in requested if f not in LISTABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown note fields: {', '.join(unknown)}")
+        columns = ["id", "updatedAt"]
+        columns += [f for f in requested if f not in columns]
+        return columns
+
     async def get_note(self, note_id: str) -> Optional[Dict[str, Any]]:
-        """Get a specific note by ID."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        """Get a specific note by ID (served from the note cache when still current)."""
+        await self._ensure_staleness_table()
+        async with get_pool(self.db_path).read() as db:
             cursor = await db.execute(
-                "SELECT * FROM notes WHERE id = ?",
+                "SELECT updatedAt, isDeleted FROM notes WHERE id = ?",
                 (note_id,)
             )
-            row = await cursor.fetchone()
-            if not row:
+            probe = await cursor.fetchone()
+            if not probe:
+                note_cache.invalidate(self.db_path, note_id)
                 return None
-            note = dict(row)
-            # If markdownSource diverges heavily from current plainText, treat it as stale.
-            # This prevents the agent from reading obsolete content after rich-text edits.
-            if self._is_markdown_source_stale(note.get("markdownSource"), note.get("plainText")):
-                note["markdownSource"] = None
-            return note
+            cached = note_cache.get(self.db_path, note_id, probe["updatedAt"], probe["isDeleted"])
+            if cached is not None:
+                return cached
+            cursor = await db.execute(f"""
+                SELECT n.*, s.isStale AS _markdownStale
+                FROM notes n
+                LEFT JOIN {STALENESS_TABLE} s ON s.noteId = n.id AND s.updatedAt = n.updatedAt
+                WHERE n.id = ?
+            """, (note_id,))
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        note = dict(row)
+        stale = note.pop("_markdownStale")
+        if stale is None and note.get("markdownSource"):
+            # No verdict for this version yet (e.g. edited by the Electron app):
+            # compute it once and persist it for subsequent reads.
+            stale = self._is_markdown_source_stale(note.get("markdownSource"), note.get("plainText"))
+            try:
+                async with get_pool(self.db_path).write() as db:
+                    await self._record_staleness(db, note_id, note.get("updatedAt"), stale)
+            except Exception as e:
+                safe_print(f"[WARN] Failed to record markdownSource staleness for {note_id}: {e}")
+        note = self._apply_staleness(note, bool(stale))
+        note_cache.put(self.db_path, note_id, note)
+        return note
+
+    def _apply_staleness(self, note: Dict[str, Any], stale: bool) -> Dict[str, Any]:
+        # If markdownSource diverges heavily from current plainText, treat it as stale.
+        # This prevents the agent from reading obsolete content after rich-text edits.
+        if stale:
+            note["markdownSource"] = None
+        return note
+
+    async def _ensure_staleness_table(self) -> None:
+        if self.db_path in _staleness_schema_ready:
+            return
+        async with get_pool(self.db_path).write() as db:
+            await db.execute(STALENESS_SCHEMA)
+        _staleness_schema_ready.add(self.db_path)
+
+    async def _record_staleness(self, db, note_id: str, updated_at: Optional[int], stale: bool) -> int:
+        """Store the verdict for one note version (only if that version is still current)."""
+        cursor = await db.execute(f"""
+            INSERT OR REPLACE INTO {STALENESS_TABLE} (noteId, updatedAt, isStale)
+            SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM notes WHERE id = ? AND updatedAt = ?)
+        """, (note_id, updated_at, 1 if stale else 0, note_id, updated_at))
+        return cursor.rowcount
+
+    async def _carry_staleness(self, db, note_id: str, updated_at: int) -> None:
+        """
+        Re-key the verdict to a new updatedAt for metadata-only writes.
+        Must run before the notes UPDATE, inside the same transaction.
+        """
+        await db.execute(f"""
+            UPDATE {STALENESS_TABLE} SET updatedAt = ?
+            WHERE noteId = ? AND updatedAt = (SELECT updatedAt FROM notes WHERE id = ?)
+        """, (updated_at, note_id, note_id))
+
+    async def backfill_markdown_staleness(self, batch_size: int = 200) -> int:
+        """Compute missing staleness verdicts for existing notes. Returns rows written."""
+        await self._ensure_staleness_table()
+        written = 0
+        while True:
+            async with get_pool(self.db_path).read() as db:
+                cursor = await db.execute(f"""
+                    SELECT n.id, n.updatedAt, n.markdownSource, n.plainText
+                    FROM notes n
+                    LEFT JOIN {STALENESS_TABLE} s ON s.noteId = n.id AND s.updatedAt = n.updatedAt
+                    WHERE s.noteId IS NULL AND n.updatedAt IS NOT NULL
+                      AND n.markdownSource IS NOT NULL AND n.markdownSource != ''
+                    LIMIT ?
+                """, (batch_size,))
+                rows = [dict(r) for r in await cursor.fetchall()]
+            if not rows:
+                break
+            verdicts = await asyncio.to_thread(
+                lambda: [self._is_markdown_source_stale(r["markdownSource"], r["plainText"]) for r in rows]
+            )
+            batch_written = 0
+            async with get_pool(self.db_path).write() as db:
+                for row, stale in zip(rows, verdicts):
+                    batch_written += await self._record_staleness(db, row["id"], row["updatedAt"], stale)
+            written += batch_written
+            # Rows edited meanwhile are skipped; stop rather than spin on them.
+            if len(rows) < batch_size or batch_written == 0:
+                break
+        if written:
+            safe_print(f"[OK] Backfilled markdownSource staleness for {written} note(s)")
+        return written
     
     async def create_note(
         self,
@@ -85,43 +285,64 @@ class NoteService:
         markdown_source: Optional[str] = None
     ) -> Dict[str, Any]:
         """Create a new note."""
-        note_id = f"{int(datetime.now().timestamp() * 1000)}-{uuid.uuid4().hex[:9]}"
+        note_id = self._new_note_id()
         now = int(datetime.now().timestamp() * 1000)
         
-        # Extract plain text from content
-        plain_text = self._extract_plain_text(content)
+        await self._ensure_staleness_table()
+        async with get_pool(self.db_path).write() as db:
+            note = await self._insert_note_tx(db, note_id, title, content, category_id, markdown_source, now)
+        get_change_feed(self.db_path).notify()
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT INTO notes (
-                    id, title, content, plainText, markdownSource,
-                    categoryId, isPinned, isDeleted, deletedAt,
-                    createdAt, updatedAt
-                ) VALUES (?, ?, ?, ?, ?, ?, 0, 0, NULL, ?, ?)
-            """, (
-                note_id, title, content, plain_text, markdown_source,
-                category_id, now, now
-            ))
-            await db.commit()
+        # Add to vector store in background (non-blocking for UX)
+        self._run_vector_task(
+            self.rag_service.add_document(
+                note_id, title, note["plainText"], updated_at=now, category_id=category_id
+            ),
+            f"create:{note_id}"
+        )
         
-        note = {
+        return note
+
+    def _new_note_id(self) -> str:
+        return f"{int(datetime.now().timestamp() * 1000)}-{uuid.uuid4().hex[:9]}"
+
+    async def _insert_note_tx(
+        self,
+        db,
+        note_id: str,
+        title: str,
+        content: str,
+        category_id: Optional[str],
+        markdown_source: Optional[str],
+        now: int,
+    ) -> Dict[str, Any]:
+        # Extract plain text from content
+        plain_text = self._extract_plain_text(content)
+        stale = self._is_markdown_source_stale(markdown_source, plain_text)
+
+        await db.execute("""
+            INSERT INTO notes (
+                id, title, content, plainText, markdownSource,
+                categoryId, isPinned, isDeleted, deletedAt,
+                createdAt, updatedAt
+            ) VALUES (?, ?, ?, ?, ?, ?, 0, 0, NULL, ?, ?)
+        """, (
+            note_id, title, content, plain_text, markdown_source,
+            category_id, now, now
+        ))
+        if markdown_source:
+            await self._record_staleness(db, note_id, now, stale)
+
+        return {
             "id": note_id,
             "title": title,
             "content": content,
             "plainText": plain_text,
-            "markdownSource": markdown_source,
+            "markdownSource": None if stale else markdown_source,
             "categoryId": category_id,
             "createdAt": now,
             "updatedAt": now,
         }
-        
-        # Add to vector store in background (non-blocking for UX)
-        self._run_vector_task(
-            self.rag_service.add_document(note_id, title, plain_text),
-            f"create:{note_id}"
-        )
-        
-        return note
     
     async def update_note(
         self,
@@ -129,15 +350,56 @@ class NoteService:
         title: Optional[str] = None,
         content: Optional[str] = None,
         category_id: Optional[str] = None,
-        markdown_source: Optional[str] = None
+        markdown_source: Optional[str] = None,
+        current: Optional[Dict[str, Any]] = None,
     ) -> Optional[Dict[str, Any]]:
-        """Update an existing note."""
-        # Get current note
-        current = await self.get_note(note_id)
-        if not current:
+        """
+        Update an existing note and return its post-image.
+
+        Writes with a single `UPDATE ... RETURNING`, so no read is needed before or
+        after the write. `current` lets callers that already loaded the note skip
+        the lookup when there is nothing to change.
+        """
+        updates = self._build_updates(title, content, category_id, markdown_source)
+        if not updates:
+            return current if current is not None else await self.get_note(note_id)
+        
+        updates["updatedAt"] = int(datetime.now().timestamp() * 1000)
+        
+        await self._ensure_staleness_table()
+        async with get_pool(self.db_path).write() as db:
+            found, note = await self._update_note_tx(db, note_id, updates)
+        if not found:
             return None
+        get_change_feed(self.db_path).notify()
+        if note is None:
+            note = await self.get_note(note_id)
+            if note is None:
+                return None
+        else:
+            note_cache.put(self.db_path, note_id, note)
+        
+        # Update vector store in background (non-blocking for UX)
+        self._run_vector_task(
+            self.rag_service.update_document(
+                note_id,
+                note.get("title") or "",
+                note.get("plainText") or "",
+                updated_at=updates["updatedAt"],
+                category_id=note.get("categoryId"),
+            ),
+            f"update:{note_id}"
+        )
         
-        # Build update
+        return note
+
+    def _build_updates(
+        self,
+        title: Optional[str],
+        content: Optional[str],
+        category_id: Optional[str],
+        markdown_source: Optional[str],
+    ) -> Dict[str, Any]:
         updates = {}
         if title is not None:
             updates["title"] = title
@@ -154,108 +416,284 @@ class NoteService:
             updates["categoryId"] = category_id
         if markdown_source is not None:
             updates["markdownSource"] = markdown_source
-        
-        if not updates:
-            return current
-        
-        updates["updatedAt"] = int(datetime.now().timestamp() * 1000)
-        
-        # Build SQL
+        return updates
+
+    async def _update_note_tx(
+        self, db, note_id: str, updates: Dict[str, Any]
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Apply `updates` (incl. updatedAt) inside the caller's transaction.
+        Returns (found, post-image); the post-image is None when it must be
+        re-read after commit (SQLite without RETURNING).
+        """
         set_clause = ", ".join(f"{k} = ?" for k in updates.keys())
         values = list(updates.values()) + [note_id]
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+
+        # Staleness only needs re-evaluating when one of its inputs changes;
+        # otherwise the stored verdict is re-keyed to the new updatedAt.
+        source_changed = "plainText" in updates or "markdownSource" in updates
+        if not source_changed:
+            await self._carry_staleness(db, note_id, updates["updatedAt"])
+
+        if not _SUPPORTS_RETURNING:
+            cursor = await db.execute(
                 f"UPDATE notes SET {set_clause} WHERE id = ?",
                 values
             )
-            await db.commit()
-        
-        # Update vector store in background (non-blocking for UX)
-        final_title = updates.get("title", current["title"])
-        final_content = updates.get("plainText", current.get("plainText", ""))
-        self._run_vector_task(
-            self.rag_service.update_document(note_id, final_title, final_content),
-            f"update:{note_id}"
+            return cursor.rowcount > 0, None
+
+        cursor = await db.execute(
+            f"UPDATE notes SET {set_clause} WHERE id = ? RETURNING *",
+            values
         )
-        
-        return await self.get_note(note_id)
+        rows = await cursor.fetchall()
+        if not rows:
+            return False, None
+        note = dict(rows[0])
+        stale = False
+        if source_changed and note.get("markdownSource"):
+            stale = self._is_markdown_source_stale(note.get("markdownSource"), note.get("plainText"))
+            await self._record_staleness(db, note_id, note["updatedAt"], stale)
+        elif not source_changed:
+            cursor = await db.execute(
+                f"SELECT isStale FROM {STALENESS_TABLE} WHERE noteId = ? AND updatedAt = ?",
+                (note_id, note["updatedAt"])
+            )
+            verdict = await cursor.fetchone()
+            if verdict is not None:
+                stale = bool(verdict[0])
+            elif note.get("markdownSource"):
+                stale = self._is_markdown_source_stale(note.get("markdownSource"), note.get("plainText"))
+                await self._record_staleness(db, note_id, note["updatedAt"], stale)
+        return True, self._apply_staleness(note, stale)
     
     async def delete_note(self, note_id: str) -> bool:
         """Soft delete a note (move to trash)."""
         now = int(datetime.now().timestamp() * 1000)
-        async with aiosqlite.connect(self.db_path) as db:
-            result = await db.execute(
-                "UPDATE notes SET isDeleted = 1, deletedAt = ? WHERE id = ?",
-                (now, note_id)
+        async with get_pool(self.db_path).write() as db:
+            deleted = await self._delete_note_tx(db, note_id, now)
+        note_cache.invalidate(self.db_path, note_id)
+        if deleted:
+            get_change_feed(self.db_path).notify()
+            # Remove from vector store in background (non-blocking for UX)
+            self._run_vector_task(
+                self.rag_service.remove_document(note_id),
+                f"delete:{note_id}"
             )
-            await db.commit()
-            if result.rowcount > 0:
-                # Remove from vector store in background (non-blocking for UX)
-                self._run_vector_task(
-                    self.rag_service.remove_document(note_id),
-                    f"delete:{note_id}"
-                )
-                return True
+            return True
         return False
+
+    async def _delete_note_tx(self, db, note_id: str, now: int) -> bool:
+        result = await db.execute(
+            "UPDATE notes SET isDeleted = 1, deletedAt = ? WHERE id = ?",
+            (now, note_id)
+        )
+        return result.rowcount > 0
+
+    async def apply_batch(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply mixed create/update/delete/categorize operations in one transaction.
+
+        Each operation is {"op", "id"?, "title"?, "content"?, "category_id"?,
+        "markdown_source"?}. Missing notes are reported per operation as
+        "not_found"; any other error rolls back the whole batch. Vector work for
+        all operations is scheduled afterwards as a single batched job.
+        """
+        for i, op in enumerate(operations):
+            kind = op.get("op")
+            if kind not in BATCH_OPERATIONS:
+                raise ValueError(f"Operation {i}: unknown op {kind!r}")
+            if kind != "create" and not op.get("id"):
+                raise ValueError(f"Operation {i}: '{kind}' requires an id")
+            if kind == "create" and op.get("title") is None:
+                raise ValueError(f"Operation {i}: 'create' requires a title")
+
+        now = int(datetime.now().timestamp() * 1000)
+        results: List[Dict[str, Any]] = []
+        # Last vector action per note: ("upsert", doc) | ("remove", None) | ("move", categoryId)
+        vector_actions: Dict[str, Tuple[str, Any]] = {}
+        reread: List[int] = []
+
+        await self._ensure_staleness_table()
+        async with get_pool(self.db_path).write() as db:
+            for op in operations:
+                kind = op["op"]
+                if kind == "create":
+                    note_id = op.get("id") or self._new_note_id()
+                    note = await self._insert_note_tx(
+                        db, note_id, op["title"], op.get("content") or "",
+                        op.get("category_id"), op.get("markdown_source"), now
+                    )
+                    results.append({"op": kind, "id": note_id, "status": "created", "note": note})
+                    vector_actions[note_id] = ("upsert", note)
+                elif kind == "update":
+                    note_id = op["id"]
+                    updates = self._build_updates(
+                        op.get("title"), op.get("content"), op.get("category_id"), op.get("markdown_source")
+                    )
+                    if not updates:
+                        results.append({"op": kind, "id": note_id, "status": "unchanged"})
+                        continue
+                    updates["updatedAt"] = now
+                    found, note = await self._update_note_tx(db, note_id, updates)
+                    if not found:
+                        results.append({"op": kind, "id": note_id, "status": "not_found"})
+                        continue
+                    if note is None:
+                        reread.append(len(results))
+                    results.append({"op": kind, "id": note_id, "status": "updated", "note": note})
+                    vector_actions[note_id] = ("upsert", note)
+                elif kind == "delete":
+                    note_id = op["id"]
+                    deleted = await self._delete_note_tx(db, note_id, now)
+                    results.append({"op": kind, "id": note_id, "status": "deleted" if deleted else "not_found"})
+                    if deleted:
+                        vector_actions[note_id] = ("remove", None)
+                else:
+                    note_id = op["id"]
+                    category_id = op.get("category_id")
+                    moved = await self._set_category_tx(db, note_id, category_id, now)
+                    results.append({"op": kind, "id": note_id, "status": "categorized" if moved else "not_found"})
+                    if not moved:
+                        continue
+                    previous = vector_actions.get(note_id)
+                    if previous and previous[0] == "upsert":
+                        if previous[1] is not None:
+                            previous[1]["categoryId"] = category_id
+                    else:
+                        vector_actions[note_id] = ("move", category_id)
+
+        get_change_feed(self.db_path).notify()
+        for position in reread:
+            results[position]["note"] = await self.get_note(results[position]["id"])
+            vector_actions[results[position]["id"]] = ("upsert", results[position]["note"])
+        for result in results:
+            note = result.get("note")
+            if result["status"] == "updated" and note is not None:
+                note_cache.put(self.db_path, result["id"], note)
+            else:
+                note_cache.invalidate(self.db_path, result["id"])
+
+        upserts = [
+            {
+                "id": note_id,
+                "title": note.get("title") or "",
+                "content": note.get("plainText") or "",
+                "updatedAt": note.get("updatedAt"),
+                "categoryId": note.get("categoryId"),
+            }
+            for note_id, (action, note) in vector_actions.items()
+            if action == "upsert" and note is not None
+        ]
+        removals = [note_id for note_id, (action, _) in vector_actions.items() if action == "remove"]
+        moves = {note_id: value for note_id, (action, value) in vector_actions.items() if action == "move"}
+        if upserts or removals or moves:
+            self._run_vector_task(
+                self.rag_service.apply_note_batch(upserts, removals, moves),
+                f"batch:{len(operations)}"
+            )
+        return results
     
     async def semantic_search(
         self,
         query: str,
-        top_k: int = 5
+        top_k: int = 5,
+        rank_mode: Optional[str] = None,
+        half_life_days: Optional[float] = None,
+        category_id: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """Perform semantic search across notes."""
-        return await self.rag_service.search(query, top_k)
+        """Perform semantic search across notes (optionally within one category)."""
+        return await self.rag_service.search(
+            query,
+            top_k,
+            rank_mode=rank_mode,
+            half_life_days=half_life_days,
+            category_id=category_id,
+        )
+    
+    async def keyword_search(
+        self, query: str, limit: int = 20, category_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Substring search over title/plainText.
+
+        Uses the trigram FTS index (schema migration `notes_fts`) for queries of 3+
+        characters and falls back to LIKE for shorter queries or when the index is
+        not installed.
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        limit = max(1, min(int(limit), 200))
+        async with get_pool(self.db_path).read() as db:
+            if len(query) >= 3:
+                try:
+                    cursor = await db.execute("""
+                        SELECT n.id, n.title, n.plainText AS content, n.updatedAt, n.categoryId, f.rank AS rank
+                        FROM notes_fts f JOIN notes n ON n.rowid = f.rowid
+                        WHERE notes_fts MATCH ? AND n.isDeleted = 0 AND (? IS NULL OR n.categoryId = ?)
+                        ORDER BY f.rank
+                        LIMIT ?
+                    """, ('"' + query.replace('"', '""') + '"', category_id, category_id, limit))
+                    rows = await cursor.fetchall()
+                    return [{**dict(row), "score": -float(row["rank"])} for row in rows]
+                except sqlite3.OperationalError:
+                    pass  # FTS table missing; use the scan below
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            cursor = await db.execute("""
+                SELECT id, title, plainText AS content, updatedAt, categoryId
+                FROM notes
+                WHERE isDeleted = 0 AND (title LIKE ? ESCAPE '\\' OR plainText LIKE ? ESCAPE '\\')
+                  AND (? IS NULL OR categoryId = ?)
+                ORDER BY updatedAt DESC
+                LIMIT ?
+            """, (pattern, pattern, category_id, category_id, limit))
+            return [{**dict(row), "score": 0.0} for row in await cursor.fetchall()]
     
     async def get_all_categories(self) -> List[Dict[str, Any]]:
         """Get all categories."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute("""
-                SELECT id, name, color, "order"
-                FROM categories
-                ORDER BY "order" ASC
-            """)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        return (await self.get_category_catalog()).all()
+    
+    async def get_category_catalog(self) -> CategoryCatalog:
+        """Cached categories with id/name/hint lookups (revalidated on every call)."""
+        return await category_catalog.get(self.db_path)
     
     async def set_note_category(self, note_id: str, category_id: Optional[str]) -> bool:
         """Set or clear a note's category."""
-        async with aiosqlite.connect(self.db_path) as db:
-            result = await db.execute(
-                "UPDATE notes SET categoryId = ?, updatedAt = ? WHERE id = ? AND isDeleted = 0",
-                (category_id, int(datetime.now().timestamp() * 1000), note_id)
+        now = int(datetime.now().timestamp() * 1000)
+        await self._ensure_staleness_table()
+        async with get_pool(self.db_path).write() as db:
+            moved = await self._set_category_tx(db, note_id, category_id, now)
+        note_cache.invalidate(self.db_path, note_id)
+        if moved:
+            get_change_feed(self.db_path).notify()
+            # Sharded vector store keeps notes in per-category shards.
+            self._run_vector_task(
+                self.rag_service.move_document(note_id, category_id),
+                f"move:{note_id}"
             )
-            await db.commit()
-            return result.rowcount > 0
+            return True
+        return False
+    
+    async def _set_category_tx(self, db, note_id: str, category_id: Optional[str], now: int) -> bool:
+        await self._carry_staleness(db, note_id, now)
+        result = await db.execute(
+            "UPDATE notes SET categoryId = ?, updatedAt = ? WHERE id = ? AND isDeleted = 0",
+            (category_id, now, note_id)
+        )
+        return result.rowcount > 0
     
     async def reindex_all(self) -> int:
-        """Rebuild the vector index from all notes."""
-        notes = await self.get_all_notes()
-        return await self.rag_service.reindex_from_db(notes)
+        """Rebuild the vector index from all notes (streamed, without the HTML column)."""
+        batches = self.iter_note_batches(fields=("id", "title", "plainText", "categoryId", "updatedAt"))
+        return await self.rag_service.reindex_from_db(batches)
     
     def _extract_plain_text(self, html_content: str) -> str:
         """Extract plain text from HTML content."""
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', html_content)
-        # Decode common HTML entities
-        text = text.replace('&nbsp;', ' ')
-        text = text.replace('&lt;', '<')
-        text = text.replace('&gt;', '>')
-        text = text.replace('&amp;', '&')
-        text = text.replace('&quot;', '"')
-        # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        return html_to_plain_text(html_content)
 
     def _normalize_for_similarity(self, text: Optional[str]) -> str:
-        if not text:
-            return ""
-        normalized = re.sub(r'<[^>]+>', ' ', text)
-        normalized = re.sub(r'[`*_>#\-\[\]\(\)!|:~]+', ' ', normalized)
-        normalized = re.sub(r'\s+', ' ', normalized).strip().lower()
-        return normalized
+        return normalize_for_similarity(text or "")
 
     def _is_markdown_source_stale(self, markdown_source: Optional[str], plain_text: Optional[str]) -> bool:
         if not markdown_source or not plain_text:
@@ -7,12 +7,23 @@ import json
 import numpy as np
 import faiss
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Union
 import asyncio
 import httpx
-import aiosqlite
+import time
+import heapq
+import hashlib
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from core.config import settings
+from core.database import get_pool
+from .change_feed import get_change_feed
+from .vector_shard import VectorShard, DEFAULT_DIMENSION, slim_row, blend_recency_scores, recency_decay  # noqa: F401
+
+RANK_MODES = {"similarity", "recency"}
+PRIMARY_SHARD = "primary"
 
 
 # Safe print for Windows GBK encoding
@@ -29,36 +40,62 @@ def safe_print(msg: str):
             print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
 
 
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def _as_batches(notes: Any) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Normalize a note list or an async iterator of batches into batches."""
+    if isinstance(notes, list):
+        yield notes
+        return
+    async for batch in notes:
+        yield batch
+
+
+def _vector_row(doc_id: str, text: str, updated_at: int) -> Dict[str, Any]:
+    """Metadata row for one embedded document (no note text, see slim_row)."""
+    return {"id": doc_id, "updatedAt": int(updated_at), "span": [0, len(text)]}
+
+
 class RAGService:
     """
     RAG service using FAISS for high-performance, stable semantic vector search.
     Decoupled architecture: API-based embeddings + Local FAISS indexing.
+
+    Vectors live in VectorShard objects: a single primary shard by default, or one
+    shard per category (plus hash buckets for uncategorized notes) when
+    VECTOR_SHARDING is enabled. Searches fan out across shards on a thread pool.
     """
-    
+
     _instance: Optional["RAGService"] = None
-    
+
     def __new__(cls):
         """Singleton pattern for shared resources."""
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
+
         # Storage Paths
         self.save_path = Path(settings.VECTOR_STORE_PATH) / "faiss_v1_qwen"
         os.makedirs(self.save_path, exist_ok=True)
         self.index_file = self.save_path / "index.faiss"
         self.meta_file = self.save_path / "metadata.json"
-        
+
         # In-memory resources
-        self.index = None
-        self.metadata = [] # List of {id, title, content}
-        self.id_to_idx = {} # Map string ID to FAISS index
-        
+        self.sharded = bool(settings.VECTOR_SHARDING)
+        self.shards: Dict[str, VectorShard] = {}
+        self.doc_shard: Dict[str, str] = {}  # Map string ID to owning shard key
+        self._resources_ready = False
+        self._search_pool: Optional[ThreadPoolExecutor] = None
+        # LRU of {title, content, updatedAt, categoryId} for recently returned hits.
+        self._snippet_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
         self.emb_fn = None
         self._initialized = True
         self._loaded_initial = False
@@ -66,13 +103,55 @@ class RAGService:
         self._is_syncing = False
         self._last_integrity_check_ms = 0
         self._integrity_check_interval_ms = 30000
+        # Change-feed position covered by the last reconcile; an unchanged log skips the scan.
+        self._reconciled_change_seq: Optional[int] = None
         self._integrity_check_running = False
 
+    # ------------------------------------------------------------------
+    # Single-index views (kept for callers that predate sharding)
+    # ------------------------------------------------------------------
+
+    @property
+    def shard_dir(self) -> Path:
+        return self.save_path / "shards"
+
+    @property
+    def index(self):
+        """Primary FAISS index in single-index mode (None when sharded)."""
+        shard = self.shards.get(PRIMARY_SHARD)
+        return shard.index if shard is not None else None
+
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        """List of {id, updatedAt, span} across all shards."""
+        if not self.sharded and PRIMARY_SHARD in self.shards:
+            return self.shards[PRIMARY_SHARD].metadata
+        return [m for shard in self.shards.values() for m in shard.metadata]
+
+    @property
+    def id_to_idx(self) -> Dict[str, Any]:
+        """Map string ID to FAISS row (single-index) or to its shard key (sharded)."""
+        if not self.sharded and PRIMARY_SHARD in self.shards:
+            return self.shards[PRIMARY_SHARD].id_to_idx
+        return self.doc_shard
+
+    @property
+    def freshness(self) -> np.ndarray:
+        if not self.sharded and PRIMARY_SHARD in self.shards:
+            return self.shards[PRIMARY_SHARD].freshness
+        if not self.shards:
+            return np.zeros(0, dtype="float64")
+        return np.concatenate([shard.freshness for shard in self.shards.values()])
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards.values())
+
     def _get_embedding_fn(self):
         """Proxy-bypass Qwen Embedding Client."""
         if self.emb_fn is None:
             safe_print(f"[NET] Connecting to Cloud Embedding: {settings.EMBEDDING_MODEL}")
-            
+
             class ProxyBypassEmbedder:
                 def __init__(self, api_key, api_base, model_name):
                     self.api_key = api_key
@@ -102,36 +181,155 @@ class RAGService:
         return self.emb_fn
 
     async def _init_resources(self):
-        """Lazy load FAISS index from disk or create new one."""
+        """Lazy load FAISS shards from disk or create new ones."""
         async with self._sync_lock:
-            if self.index is not None:
+            if self._resources_ready:
                 return
 
-            if self.index_file.exists() and self.meta_file.exists():
-                safe_print("[IO] Loading FAISS index from disk...")
-                try:
-                    self.index = faiss.read_index(str(self.index_file))
-                    with open(self.meta_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        self.metadata = data.get("metadata", [])
-                        self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
-                    safe_print(f"[OK] FAISS Ready. {len(self.metadata)} items loaded.")
-                except Exception as e:
-                    safe_print(f"[WARN] FAISS Load failed: {e}. Starting fresh.")
+            try:
+                if self.sharded:
+                    await self._load_shards()
+                elif self.index_file.exists() and self.meta_file.exists():
+                    safe_print("[IO] Loading FAISS index from disk...")
+                    shard = VectorShard(PRIMARY_SHARD, self.index_file, self.meta_file)
+                    shard.load(mmap=settings.VECTOR_INDEX_MMAP)
+                    self.shards = {PRIMARY_SHARD: shard}
+                    self.doc_shard = {doc_id: PRIMARY_SHARD for doc_id in shard.id_to_idx}
+                    safe_print(f"[OK] FAISS Ready. {len(shard.metadata)} items loaded.")
+                else:
                     self._create_empty_index()
-            else:
+            except Exception as e:
+                safe_print(f"[WARN] FAISS Load failed: {e}. Starting fresh.")
                 self._create_empty_index()
+            self._resources_ready = True
+
+    async def _load_shards(self):
+        """Load every per-category shard; split the legacy single index on first run."""
+        self.shards = {}
+        self.doc_shard = {}
+        if self.shard_dir.exists():
+            for index_path in sorted(self.shard_dir.glob("*.faiss")):
+                key = index_path.stem
+                shard = VectorShard(key, index_path, self.shard_dir / f"{key}.json")
+                if shard.load(mmap=settings.VECTOR_INDEX_MMAP):
+                    self.shards[key] = shard
+                    for doc_id in shard.id_to_idx:
+                        self.doc_shard[doc_id] = key
+
+        if not self.shards and self.index_file.exists() and self.meta_file.exists():
+            legacy = VectorShard(PRIMARY_SHARD, self.index_file, self.meta_file)
+            legacy.load()
+            safe_print(f"[IO] Splitting legacy FAISS index ({legacy.ntotal} items) into shards...")
+            categories = await self._lookup_categories(list(legacy.id_to_idx.keys()))
+            rows, vectors = legacy.take(list(legacy.id_to_idx.keys()))
+            for row, vector in zip(rows, vectors):
+                category_id = categories.get(row["id"])
+                shard = self._get_shard(self._shard_key_for(row["id"], category_id), category_id)
+                shard.add([row], vector.reshape(1, -1))
+                self.doc_shard[row["id"]] = shard.key
+            await self._save_to_disk()
+
+        safe_print(f"[OK] FAISS Ready. {len(self.doc_shard)} items in {len(self.shards)} shards.")
 
     def _create_empty_index(self):
-        # Qwen text-embedding-v3 dimension is 1024
-        dimension = 1024
-        self.index = faiss.IndexFlatIP(dimension) # Inner Product is better for normalized embeddings
-        self.metadata = []
-        self.id_to_idx = {}
+        self.shards = {}
+        self.doc_shard = {}
+        if not self.sharded:
+            self._get_shard(PRIMARY_SHARD)
+        self._resources_ready = True
         safe_print("[OK] Created fresh FAISS index.")
 
+    # ------------------------------------------------------------------
+    # Shard routing
+    # ------------------------------------------------------------------
+
+    def _shard_key_for(self, doc_id: str, category_id: Optional[str]) -> str:
+        """Category notes share a shard; uncategorized notes spread over hash buckets."""
+        if not self.sharded:
+            return PRIMARY_SHARD
+        if category_id:
+            return "cat_" + hashlib.sha1(str(category_id).encode("utf-8")).hexdigest()[:12]
+        buckets = max(1, int(settings.VECTOR_UNCATEGORIZED_BUCKETS))
+        bucket = int(hashlib.sha1(str(doc_id).encode("utf-8")).hexdigest()[:8], 16) % buckets
+        return f"uncat_{bucket}"
+
+    def _get_shard(self, key: str, category_id: Optional[str] = None) -> VectorShard:
+        shard = self.shards.get(key)
+        if shard is None:
+            if key == PRIMARY_SHARD:
+                shard = VectorShard(key, self.index_file, self.meta_file)
+            else:
+                os.makedirs(self.shard_dir, exist_ok=True)
+                shard = VectorShard(
+                    key,
+                    self.shard_dir / f"{key}.faiss",
+                    self.shard_dir / f"{key}.json",
+                    category_id=category_id,
+                )
+            shard.create_empty(DEFAULT_DIMENSION)
+            self.shards[key] = shard
+        return shard
+
+    async def _lookup_categories(self, doc_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Resolve categoryId for notes whose caller did not pass one (sharded mode only)."""
+        if not self.sharded or not doc_ids:
+            return {}
+        db_path = settings.NOTES_DB_PATH
+        if not os.path.exists(db_path):
+            return {}
+        categories: Dict[str, Optional[str]] = {}
+        try:
+            async with get_pool(db_path).read() as db:
+                # Stay below SQLite's default host-parameter limit.
+                for i in range(0, len(doc_ids), 500):
+                    chunk = doc_ids[i:i + 500]
+                    placeholders = ",".join("?" for _ in chunk)
+                    cursor = await db.execute(
+                        f"SELECT id, categoryId FROM notes WHERE id IN ({placeholders})", chunk
+                    )
+                    for row in await cursor.fetchall():
+                        categories[str(row[0])] = row[1]
+        except Exception as e:
+            safe_print(f"[WARN] Could not resolve note categories: {e}")
+        return categories
+
+    async def _resolve_categories(self, category_by_id: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+        unknown = [doc_id for doc_id, category_id in category_by_id.items() if not category_id]
+        if self.sharded and unknown:
+            looked_up = await self._lookup_categories(unknown)
+            category_by_id = {
+                doc_id: category_id or looked_up.get(doc_id)
+                for doc_id, category_id in category_by_id.items()
+            }
+        return category_by_id
+
+    def _move_documents_internal(self, targets: Dict[str, Optional[str]]) -> int:
+        """Move documents to the shard of their new category by moving vectors (no re-embed)."""
+        moved = 0
+        for doc_id, category_id in targets.items():
+            source_key = self.doc_shard.get(doc_id)
+            target_key = self._shard_key_for(doc_id, category_id)
+            if source_key is None or source_key == target_key:
+                continue
+            rows, vectors = self.shards[source_key].take([doc_id])
+            if not rows:
+                continue
+            self._get_shard(target_key, category_id).add(rows, vectors)
+            self.doc_shard[doc_id] = target_key
+            moved += 1
+        return moved
+
+    async def move_document(self, doc_id: str, category_id: Optional[str]) -> None:
+        """Re-home a note after its category changed. No-op in single-index mode."""
+        if not self.sharded:
+            return
+        await self._ensure_loaded(allow_integrity_check=False)
+        async with self._sync_lock:
+            if self._move_documents_internal({doc_id: category_id}):
+                await self._save_to_disk()
+
     async def _ensure_loaded(self, allow_integrity_check: bool = True):
-        if self.index is None:
+        if not self._resources_ready:
             await self._init_resources()
 
         if allow_integrity_check:
@@ -143,7 +341,9 @@ class RAGService:
         """
         Lightweight integrity sync:
         - Only reconcile missing/deleted IDs incrementally.
+        - Move notes whose category changed to their new shard (sharded mode).
         - Avoid full re-index on normal request paths.
+        - Skip the notes scan entirely when the change feed has no new events.
         """
         import time
 
@@ -160,38 +360,71 @@ class RAGService:
             if not os.path.exists(db_path):
                 return
 
+            try:
+                change_seq = await get_change_feed(db_path).latest_seq()
+            except Exception as e:
+                safe_print(f"[WARN] Change feed unavailable, scanning notes: {e}")
+                change_seq = None
+            if change_seq is not None and change_seq == self._reconciled_change_seq:
+                return
+
             async with self._sync_lock:
-                async with aiosqlite.connect(db_path) as db:
-                    db.row_factory = aiosqlite.Row
+                async with get_pool(db_path).read() as db:
                     cursor = await db.execute(
-                        "SELECT id, title, plainText FROM notes WHERE isDeleted = 0"
+                        "SELECT id, title, plainText, updatedAt, categoryId FROM notes WHERE isDeleted = 0"
                     )
                     rows = await cursor.fetchall()
 
                 db_notes = {str(r["id"]): dict(r) for r in rows}
                 db_ids = set(db_notes.keys())
-                local_ids = set(self.id_to_idx.keys())
+                local_ids = set(self.doc_shard.keys())
 
                 missing_ids = db_ids - local_ids
                 stale_ids = local_ids - db_ids
-
-                if not missing_ids and not stale_ids:
+                moved_ids = {
+                    doc_id for doc_id in local_ids & db_ids
+                    if self._shard_key_for(doc_id, db_notes[doc_id].get("categoryId")) != self.doc_shard[doc_id]
+                }
+
+                updated_at_by_id = {doc_id: note.get("updatedAt") for doc_id, note in db_notes.items()}
+                for shard in self.shards.values():
+                    shard.refresh_freshness(updated_at_by_id)
+                self._evict_snippets([
+                    doc_id for doc_id, entry in self._snippet_cache.items()
+                    if updated_at_by_id.get(doc_id) != entry.get("updatedAt")
+                ])
+
+                if not missing_ids and not stale_ids and not moved_ids:
+                    self._reconciled_change_seq = change_seq
                     return
 
                 safe_print(
-                    f"[SYNC] Incremental reconcile: +{len(missing_ids)} / -{len(stale_ids)}"
+                    f"[SYNC] Incremental reconcile: +{len(missing_ids)} / -{len(stale_ids)} / ~{len(moved_ids)}"
                 )
 
-                for stale_id in stale_ids:
-                    await self._remove_document_internal(stale_id, persist=False)
+                if stale_ids:
+                    self._remove_documents_internal(list(stale_ids))
+
+                if moved_ids:
+                    self._move_documents_internal(
+                        {doc_id: db_notes[doc_id].get("categoryId") for doc_id in moved_ids}
+                    )
 
                 for doc_id in missing_ids:
                     note = db_notes[doc_id]
                     title = note.get("title") or "Untitled"
                     text = (note.get("plainText") or "").strip() or f"Title: {title}"
-                    await self._upsert_document_internal(doc_id, title, text, persist=False)
+                    await self._upsert_document_internal(
+                        doc_id,
+                        title,
+                        text,
+                        persist=False,
+                        updated_at=note.get("updatedAt"),
+                        category_id=note.get("categoryId"),
+                    )
 
                 await self._save_to_disk()
+                self._reconciled_change_seq = change_seq
                 safe_print("[OK] Incremental reconcile complete.")
         except Exception as e:
             safe_print(f"[ERR] Incremental integrity sync failed: {e}")
@@ -201,93 +434,215 @@ class RAGService:
     async def _vectorize(self, texts: Any) -> np.ndarray:
         """Convert text to normalized numpy embeddings with batch size limiting."""
         emb_fn = self._get_embedding_fn()
-        
+
         # Ensure texts is a list
         if not isinstance(texts, list):
             texts = [texts]
-        
+
         if not texts:
             return np.array([]).astype('float32')
-        
+
         # Batch size limit for Aliyun Embedding API (max 10)
         BATCH_SIZE = 10
         all_embeddings = []
-        
+
         for i in range(0, len(texts), BATCH_SIZE):
             batch = texts[i:i + BATCH_SIZE]
             batch_embs = await asyncio.to_thread(emb_fn.embed_documents, batch)
             all_embeddings.extend(batch_embs)
-        
+
         arr = np.array(all_embeddings).astype('float32')
         # Normalize for Cosine Similarity via Inner Product
         faiss.normalize_L2(arr)
         return arr
 
-    async def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Semantic search using FAISS with keyword fallback."""
+    def _get_search_pool(self) -> ThreadPoolExecutor:
+        if self._search_pool is None:
+            self._search_pool = ThreadPoolExecutor(
+                max_workers=max(1, int(settings.VECTOR_SEARCH_WORKERS)),
+                thread_name_prefix="faiss-search",
+            )
+        return self._search_pool
+
+    async def _search_shards(
+        self,
+        query_vec: np.ndarray,
+        k: int,
+        recency: Optional[tuple] = None,
+        category_id: Optional[str] = None,
+    ) -> List[tuple]:
+        """
+        Fan out over shards and k-way merge their sorted candidate lists.
+        FAISS releases the GIL, so shard scans run in parallel on the pool.
+        """
+        shards = [shard for shard in self.shards.values() if shard.ntotal > 0]
+        if category_id and self.sharded:
+            shards = [shard for shard in shards if shard.category_id == category_id]
+        if not shards:
+            return []
+
+        if len(shards) == 1:
+            per_shard = [shards[0].search(query_vec, k, recency)]
+        else:
+            loop = asyncio.get_running_loop()
+            pool = self._get_search_pool()
+            per_shard = await asyncio.gather(
+                *(loop.run_in_executor(pool, shard.search, query_vec, k, recency) for shard in shards)
+            )
+        merged = heapq.merge(*per_shard, key=lambda candidate: -candidate[0])
+        return list(itertools.islice(merged, k))
+
+    async def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        rank_mode: Optional[str] = None,
+        half_life_days: Optional[float] = None,
+        category_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Semantic search using FAISS with keyword fallback.
+
+        rank_mode:
+        - "similarity": pure cosine similarity (default)
+        - "recency": cosine blended with an exponential decay of updatedAt,
+          computed over an enlarged candidate pool
+
+        category_id restricts results to one category; with sharding enabled
+        only that category's shard is scanned.
+        """
         await self._ensure_loaded()
         if not query.strip():
             return []
-        
+
+        mode = (rank_mode or settings.SEARCH_RANK_MODE or "similarity").strip().lower()
+        if mode not in RANK_MODES:
+            mode = "similarity"
+
         # If index is empty, try keyword search as fallback
-        if self.index.ntotal == 0:
+        if self.ntotal == 0:
             safe_print(f"[SEARCH] FAISS empty, trying keyword fallback for: \"{query}\"")
             return await self._keyword_search(query, top_k)
-            
+
         safe_print(f"[SEARCH] FAISS Search: \"{query}\"")
         try:
             query_vec = await self._vectorize(query)
-            # D = distances (scores), I = indices
-            # Request more results to account for deleted notes
-            D, I = self.index.search(query_vec, min(top_k * 2, self.index.ntotal))
-            
-            # Get valid (non-deleted) note IDs from database
-            from core.config import settings
-            valid_ids = set()
-            try:
-                async with aiosqlite.connect(settings.NOTES_DB_PATH) as db:
-                    cursor = await db.execute("SELECT id FROM notes WHERE isDeleted = 0")
-                    rows = await cursor.fetchall()
-                    valid_ids = {str(row[0]) for row in rows}
-            except Exception as e:
-                safe_print(f"[WARN] Could not fetch valid IDs: {e}")
-            
+            # Request more results to account for deleted notes; recency mode widens
+            # the pool so fresh-but-slightly-less-similar notes can be promoted.
+            pool = top_k * 2
+            recency = None
+            if mode == "recency":
+                pool = max(pool, top_k * settings.RECENCY_CANDIDATE_MULTIPLIER)
+                recency = (
+                    _now_ms(),
+                    half_life_days if half_life_days is not None else settings.RECENCY_HALF_LIFE_DAYS,
+                    settings.RECENCY_WEIGHT,
+                )
+            candidates = await self._search_shards(query_vec, pool, recency, category_id)
+
+            # Hydrate titles/snippets only for the final top-k; deleted notes are
+            # dropped by the lookup and the next candidates take their place.
             output = []
-            for i, idx in enumerate(I[0]):
-                if idx == -1: continue
-                meta = self.metadata[idx]
-                # Filter out deleted notes
-                if valid_ids and meta['id'] not in valid_ids:
-                    safe_print(f"[SEARCH] Skipping deleted note: {meta['id']}")
-                    continue
-                output.append({
-                    "id": meta['id'],
-                    "content": meta['content'],
-                    "title": meta['title'],
-                    "score": round(float(D[0][i]), 4),
-                })
-                if len(output) >= top_k:
-                    break
-            
+            cursor = 0
+            while len(output) < top_k and cursor < len(candidates):
+                batch = candidates[cursor:cursor + (top_k - len(output))]
+                cursor += len(batch)
+                notes = await self._load_snippets([meta['id'] for _, _, meta in batch], category_id)
+                for score, similarity, meta in batch:
+                    note = notes.get(meta['id'])
+                    # Filter out deleted notes
+                    if note is None:
+                        safe_print(f"[SEARCH] Skipping deleted note: {meta['id']}")
+                        continue
+                    item = {
+                        "id": meta['id'],
+                        "content": note['content'],
+                        "title": note['title'],
+                        "score": round(score, 4),
+                    }
+                    if mode == "recency":
+                        item["similarity"] = round(similarity, 4)
+                        item["updatedAt"] = meta.get("updatedAt")
+                    output.append(item)
+
             results = sorted(output, key=lambda x: x["score"], reverse=True)
-            
+
             # If semantic search found nothing, try keyword fallback
             if not results:
                 safe_print(f"[SEARCH] Semantic search empty, trying keyword fallback")
                 results = await self._keyword_search(query, top_k)
-            
+
             return results
         except Exception as e:
             safe_print(f"[ERR] FAISS Search Error: {e}")
             # Fallback to keyword search on error
             return await self._keyword_search(query, top_k)
-    
+
+    async def _fetch_notes(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Batched `SELECT ... WHERE id IN (...)` for live notes."""
+        notes: Dict[str, Dict[str, Any]] = {}
+        if not doc_ids:
+            return notes
+        async with get_pool(settings.NOTES_DB_PATH).read() as db:
+            # Stay below SQLite's default host-parameter limit.
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i:i + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                cursor = await db.execute(
+                    f"""
+                    SELECT id, title, plainText, updatedAt, categoryId
+                    FROM notes
+                    WHERE isDeleted = 0 AND id IN ({placeholders})
+                    """,
+                    chunk,
+                )
+                for r in await cursor.fetchall():
+                    title = r['title'] or "Untitled"
+                    notes[str(r['id'])] = {
+                        "title": title,
+                        "content": (r['plainText'] or "").strip() or f"Title: {title}",
+                        "updatedAt": r['updatedAt'],
+                        "categoryId": r['categoryId'],
+                    }
+        return notes
+
+    async def _load_snippets(self, doc_ids: List[str], category_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Title + text for search hits, served from the LRU cache or one batched DB read."""
+        found: Dict[str, Dict[str, Any]] = {}
+        misses = []
+        for doc_id in doc_ids:
+            entry = self._snippet_cache.get(doc_id)
+            if entry is None:
+                misses.append(doc_id)
+                continue
+            self._snippet_cache.move_to_end(doc_id)
+            found[doc_id] = entry
+
+        if misses:
+            try:
+                fetched = await self._fetch_notes(misses)
+            except Exception as e:
+                safe_print(f"[WARN] Could not fetch note snippets: {e}")
+                fetched = {}
+            for doc_id, entry in fetched.items():
+                found[doc_id] = entry
+                self._snippet_cache[doc_id] = entry
+            while len(self._snippet_cache) > max(0, int(settings.SNIPPET_CACHE_SIZE)):
+                self._snippet_cache.popitem(last=False)
+
+        if category_id:
+            found = {doc_id: entry for doc_id, entry in found.items() if entry.get("categoryId") == category_id}
+        return found
+
+    def _evict_snippets(self, doc_ids: List[str]) -> None:
+        for doc_id in doc_ids:
+            self._snippet_cache.pop(doc_id, None)
+
     async def _keyword_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Fallback keyword search directly on database."""
         try:
             db_path = settings.NOTES_DB_PATH
-            async with aiosqlite.connect(db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with get_pool(db_path).read() as db:
                 # Search in title and plainText using LIKE
                 search_term = f"%{query}%"
                 cursor = await db.execute("""
@@ -324,8 +679,7 @@ class RAGService:
         # Always read from DB (respects isDeleted = 0 filter)
         try:
             db_path = settings.NOTES_DB_PATH
-            async with aiosqlite.connect(db_path) as db:
-                 db.row_factory = aiosqlite.Row
+            async with get_pool(db_path).read() as db:
                  cursor = await db.execute("SELECT id, title FROM notes WHERE isDeleted = 0 ORDER BY updatedAt DESC LIMIT ?", (limit,))
                  rows = await cursor.fetchall()
                  return [{"id": str(r['id']), "title": r['title'], "content": ""} for r in rows]
@@ -334,46 +688,55 @@ class RAGService:
             # Fallback to FAISS metadata only if DB fails
             items = self.metadata[-limit:]
             if items:
-                return [{"id": m['id'], "title": m['title'], "content": ""} for m in reversed(items)]
+                return [{"id": m['id'], "title": "", "content": ""} for m in reversed(items)]
             return []
 
-    async def add_document(self, doc_id: str, title: str, content: str) -> None:
+    async def add_document(
+        self,
+        doc_id: str,
+        title: str,
+        content: str,
+        updated_at: Optional[int] = None,
+        category_id: Optional[str] = None,
+    ) -> None:
         """Add document with re-indexing support."""
         await self._ensure_loaded(allow_integrity_check=False)
         text = content if (content and content.strip()) else f"Title: {title}"
-        
+
         try:
             async with self._sync_lock:
-                await self._upsert_document_internal(doc_id, title, text, persist=True)
+                await self._upsert_document_internal(
+                    doc_id, title, text, persist=True, updated_at=updated_at, category_id=category_id
+                )
             safe_print(f"[OK] Added to FAISS: {title}")
         except Exception as e:
             import traceback
             safe_print(f"[ERR] FAISS Add Error: {e}")
             traceback.print_exc()
 
-    async def _upsert_document_internal(self, doc_id: str, title: str, text: str, persist: bool = False) -> None:
+    async def _upsert_document_internal(
+        self,
+        doc_id: str,
+        title: str,
+        text: str,
+        persist: bool = False,
+        updated_at: Optional[int] = None,
+        category_id: Optional[str] = None,
+    ) -> None:
         """Upsert a single document embedding without triggering expensive full rebuilds."""
-        if doc_id in self.id_to_idx:
+        category_id = (await self._resolve_categories({doc_id: category_id})).get(doc_id)
+        if doc_id in self.doc_shard:
             self._remove_documents_internal([doc_id])
 
         embedding = await self._vectorize(text)
         if embedding.size == 0:
             return
 
-        # Dynamic Dimension Check
-        if self.index.d != embedding.shape[1]:
-            safe_print(f"[WARN] Dimension Mismatch (Index: {self.index.d}, New: {embedding.shape[1]}). Rebuilding index...")
-            if self.index.ntotal == 0:
-                self.index = faiss.IndexFlatIP(embedding.shape[1])
-            else:
-                raise ValueError(
-                    f"Embedding dimension mismatch: {self.index.d} vs {embedding.shape[1]}. "
-                    "Please run reindex_all."
-                )
-
-        self.index.add(embedding)
-        self.metadata.append({"id": doc_id, "title": title, "content": text})
-        self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
+        shard = self._get_shard(self._shard_key_for(doc_id, category_id), category_id)
+        stamp = int(updated_at) if updated_at else _now_ms()
+        shard.add([_vector_row(doc_id, text, stamp)], embedding)
+        self.doc_shard[doc_id] = shard.key
+        self._evict_snippets([doc_id])
 
         if persist:
             await self._save_to_disk()
@@ -381,7 +744,7 @@ class RAGService:
     async def remove_document(self, doc_id: str) -> None:
         """
         FAISS IndexFlat doesn't support easy deletion by ID without rebuilding.
-        For small collections, we rebuild or just filter.
+        Only the shard holding the document is compacted.
         """
         await self._ensure_loaded(allow_integrity_check=False)
         async with self._sync_lock:
@@ -389,188 +752,235 @@ class RAGService:
 
     async def _remove_document_internal(self, doc_id: str, persist: bool = False) -> None:
         """Remove a document without re-calling remote embedding API."""
-        if doc_id not in self.id_to_idx:
+        key = self.doc_shard.get(doc_id)
+        if key is None:
             return
 
         safe_print(f"[DEL] Removing from FAISS: {doc_id}")
         try:
             self._remove_documents_internal([doc_id])
         except Exception as e:
-            # Last-resort fallback: re-vectorize remaining docs if reconstruction is unavailable.
+            # Last-resort fallback: re-vectorize the shard's remaining docs if reconstruction is unavailable.
             safe_print(f"[WARN] Vector reconstruction failed, fallback to re-embed: {e}")
-            self.metadata = [m for m in self.metadata if m['id'] != doc_id]
-            texts = [m['content'] for m in self.metadata]
-            new_embs = await self._vectorize(texts)
-            dimension = new_embs.shape[1] if new_embs.shape[0] > 0 else 1024
-            self.index = faiss.IndexFlatIP(dimension)
-            if new_embs.size > 0:
-                self.index.add(new_embs)
-            self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
+            shard = self.shards[key]
+            notes = await self._fetch_notes([m['id'] for m in shard.metadata if m['id'] != doc_id])
+            rows = [m for m in shard.metadata if m['id'] in notes]
+            new_embs = await self._vectorize([notes[m['id']]['content'] for m in rows])
+            for m in shard.metadata:
+                if m['id'] not in notes:
+                    self.doc_shard.pop(m['id'], None)
+            shard.rebuild(rows, new_embs)
 
         if persist:
             await self._save_to_disk()
 
     def _remove_documents_internal(self, doc_ids: List[str]) -> None:
-        """Batch-remove documents from index using vector reconstruction (no embedding API calls)."""
+        """Batch-remove documents from their shards using vector reconstruction (no embedding API calls)."""
         if not doc_ids:
             return
 
-        remove_set = {doc_id for doc_id in doc_ids if doc_id in self.id_to_idx}
-        if not remove_set:
-            return
-
-        total = self.index.ntotal
-        if total == 0:
-            self.metadata = [m for m in self.metadata if m['id'] not in remove_set]
-            self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
-            return
-
-        remove_indices = {self.id_to_idx[doc_id] for doc_id in remove_set}
-        vectors = self.index.reconstruct_n(0, total)
-        keep_mask = np.ones(total, dtype=bool)
-        for idx in remove_indices:
-            if 0 <= idx < total:
-                keep_mask[idx] = False
-        kept_vectors = vectors[keep_mask]
-
-        self.metadata = [m for m in self.metadata if m['id'] not in remove_set]
-        self.index = faiss.IndexFlatIP(self.index.d)
-        if kept_vectors.size > 0:
-            self.index.add(kept_vectors.astype('float32'))
-        self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
-
-    async def update_document(self, doc_id: str, title: str, content: str) -> None:
+        by_shard: Dict[str, List[str]] = {}
+        for doc_id in doc_ids:
+            key = self.doc_shard.get(doc_id)
+            if key is not None:
+                by_shard.setdefault(key, []).append(doc_id)
+
+        for key, ids in by_shard.items():
+            self.shards[key].remove(ids)
+            for doc_id in ids:
+                self.doc_shard.pop(doc_id, None)
+        self._evict_snippets(doc_ids)
+
+    async def update_document(
+        self,
+        doc_id: str,
+        title: str,
+        content: str,
+        updated_at: Optional[int] = None,
+        category_id: Optional[str] = None,
+    ) -> None:
         await self._ensure_loaded(allow_integrity_check=False)
         text = content if (content and content.strip()) else f"Title: {title}"
         async with self._sync_lock:
-            await self._upsert_document_internal(doc_id, title, text, persist=True)
+            await self._upsert_document_internal(
+                doc_id, title, text, persist=True, updated_at=updated_at, category_id=category_id
+            )
 
     async def upsert_documents_batch(self, docs: List[Dict[str, str]]) -> int:
         """
         Batch upsert for frontend edit bursts.
-        Expected item format: {"id": str, "title": str, "content": str}
+        Expected item format: {"id": str, "title": str, "content": str, "updatedAt"?: int, "categoryId"?: str}
         """
         if not docs:
             return 0
 
         await self._ensure_loaded(allow_integrity_check=False)
         async with self._sync_lock:
-            # Keep last write per note in this batch.
-            latest_by_id: Dict[str, Dict[str, str]] = {}
-            for item in docs:
-                doc_id = str(item.get("id", "")).strip()
-                if not doc_id:
-                    continue
-                latest_by_id[doc_id] = item
-
-            if not latest_by_id:
-                return 0
+            count = await self._upsert_documents_batch_internal(docs)
+            if count:
+                await self._save_to_disk()
+            return count
+
+    async def apply_note_batch(
+        self,
+        upserts: List[Dict[str, Any]],
+        removals: List[str],
+        moves: Dict[str, Optional[str]],
+    ) -> int:
+        """
+        Vector side of a bulk note mutation as one job: removals, category moves
+        and one batched embedding call for all upserts, then a single save.
+        """
+        if not (upserts or removals or moves):
+            return 0
 
-            ordered_items = list(latest_by_id.values())
-            remove_ids = [str(item["id"]) for item in ordered_items if str(item["id"]) in self.id_to_idx]
-            if remove_ids:
-                self._remove_documents_internal(remove_ids)
-
-            texts = []
-            titles = []
-            ids = []
-            for item in ordered_items:
-                doc_id = str(item["id"])
-                title = str(item.get("title") or "Untitled")
-                content = str(item.get("content") or "")
-                text = content.strip() if content.strip() else f"Title: {title}"
-                ids.append(doc_id)
-                titles.append(title)
-                texts.append(text)
-
-            embs = await self._vectorize(texts)
-            if embs.size == 0:
-                return 0
+        await self._ensure_loaded(allow_integrity_check=False)
+        async with self._sync_lock:
+            self._remove_documents_internal([doc_id for doc_id in removals if doc_id in self.doc_shard])
+            if moves and self.sharded:
+                self._move_documents_internal(moves)
+            count = await self._upsert_documents_batch_internal(upserts) if upserts else 0
+            await self._save_to_disk()
+            return count
+
+    async def _upsert_documents_batch_internal(self, docs: List[Dict[str, Any]]) -> int:
+        """Embed and (re)insert documents; caller holds the sync lock and persists."""
+        # Keep last write per note in this batch.
+        latest_by_id: Dict[str, Dict[str, Any]] = {}
+        for item in docs:
+            doc_id = str(item.get("id", "")).strip()
+            if not doc_id:
+                continue
+            latest_by_id[doc_id] = item
+
+        if not latest_by_id:
+            return 0
 
-            if self.index.d != embs.shape[1]:
-                if self.index.ntotal == 0:
-                    self.index = faiss.IndexFlatIP(embs.shape[1])
-                else:
-                    raise ValueError(
-                        f"Embedding dimension mismatch: {self.index.d} vs {embs.shape[1]}. "
-                        "Please run reindex_all."
-                    )
+        ordered_items = list(latest_by_id.values())
+        categories = await self._resolve_categories(
+            {str(item["id"]): item.get("categoryId") for item in ordered_items}
+        )
+        remove_ids = [str(item["id"]) for item in ordered_items if str(item["id"]) in self.doc_shard]
+        if remove_ids:
+            self._remove_documents_internal(remove_ids)
+
+        texts = []
+        rows = []
+        now_ms = _now_ms()
+        for item in ordered_items:
+            doc_id = str(item["id"])
+            title = str(item.get("title") or "Untitled")
+            content = str(item.get("content") or "")
+            text = content.strip() if content.strip() else f"Title: {title}"
+            texts.append(text)
+            rows.append(_vector_row(doc_id, text, int(item.get("updatedAt") or now_ms)))
+
+        embs = await self._vectorize(texts)
+        if embs.size == 0:
+            return 0
 
-            self.index.add(embs)
-            for doc_id, title, text in zip(ids, titles, texts):
-                self.metadata.append({"id": doc_id, "title": title, "content": text})
-            self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
-            await self._save_to_disk()
-            return len(ids)
+        # Group rows per target shard so each shard gets one contiguous add.
+        grouped: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            grouped.setdefault(self._shard_key_for(row["id"], categories.get(row["id"])), []).append(i)
+        for key, positions in grouped.items():
+            shard = self._get_shard(key, categories.get(rows[positions[0]]["id"]))
+            shard.add([rows[i] for i in positions], embs[positions])
+            for i in positions:
+                self.doc_shard[rows[i]["id"]] = key
+        return len(rows)
 
     async def _save_to_disk(self):
-        """Persist FAISS index and metadata with sync timestamp."""
-        try:
-            import time
-            faiss.write_index(self.index, str(self.index_file))
-            with open(self.meta_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "metadata": self.metadata,
-                    "last_sync_time": int(time.time() * 1000)  # Unix timestamp in ms (same as DB)
-                }, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            safe_print(f"[ERR] FAISS Save failed: {e}")
+        """Persist dirty shards only; other shards' files are left untouched."""
+        for key, shard in list(self.shards.items()):
+            if not shard.dirty:
+                continue
+            try:
+                if self.sharded and shard.ntotal == 0:
+                    shard.delete_files()
+                    del self.shards[key]
+                else:
+                    shard.save()
+            except Exception as e:
+                safe_print(f"[ERR] FAISS Save failed ({key}): {e}")
 
     async def reload(self) -> int:
         await self._init_resources()
-        return len(self.metadata)
+        return len(self.doc_shard)
+
+    async def reindex_from_db(self, notes: Union[List[Dict[str, Any]], AsyncIterator[List[Dict[str, Any]]]]) -> int:
+        """
+        Full re-sync with FAISS.
 
-    async def reindex_from_db(self, notes: List[Dict[str, Any]]) -> int:
-        """Full re-sync with FAISS."""
+        `notes` is either a list of notes or an async iterator of note batches
+        (NoteService.iter_note_batches); batches are embedded as they arrive so
+        note text is never held for the whole notebook at once.
+        """
         if self._is_syncing: return 0
         await self._init_resources()
 
         async with self._sync_lock:
             self._is_syncing = True
             try:
-                valid_notes = [n for n in notes if n.get('title') or n.get('plainText') or n.get('content')]
-                if not valid_notes: return 0
-                
-                safe_print(f"[SYNC] Re-indexing {len(valid_notes)} notes into FAISS...")
-                
-                documents = []
                 new_metadata = []
-                for n in valid_notes:
-                    text = n.get('plainText') or n.get('content') or ""
-                    if not text.strip(): text = f"Title: {n.get('title', 'Untitled')}"
-                    documents.append(text)
-                    new_metadata.append({
-                        "id": n['id'],
-                        "title": n.get('title', 'Untitled'),
-                        "content": text
-                    })
-                
-                # Vectorize everything via API
-                embeddings = await self._vectorize(documents)
-                
+                note_categories: List[Optional[str]] = []
+                embedding_parts = []
+                async for batch in _as_batches(notes):
+                    valid_notes = [n for n in batch if n.get('title') or n.get('plainText') or n.get('content')]
+                    if not valid_notes:
+                        continue
+
+                    documents = []
+                    for n in valid_notes:
+                        text = n.get('plainText') or n.get('content') or ""
+                        if not text.strip(): text = f"Title: {n.get('title', 'Untitled')}"
+                        documents.append(text)
+                        new_metadata.append(_vector_row(n['id'], text, int(n.get('updatedAt') or 0)))
+                        note_categories.append(n.get('categoryId'))
+
+                    # Vectorize this batch via API
+                    embedding_parts.append(await self._vectorize(documents))
+                    safe_print(f"[SYNC] Embedded {len(new_metadata)} notes...")
+
+                if not new_metadata: return 0
+                safe_print(f"[SYNC] Re-indexing {len(new_metadata)} notes into FAISS...")
+                embeddings = embedding_parts[0] if len(embedding_parts) == 1 else np.vstack(embedding_parts)
+
                 # Dynamic Dimension Detection: Don't guess, observe.
                 if embeddings.shape[0] > 0:
                     dimension = embeddings.shape[1]
                 else:
                     dimension = 1536 # Default fallback
-                
+
                 safe_print(f"[INFO] Detected Embedding Dimension: {dimension}")
-                
-                # Update memory state
-                self.index = faiss.IndexFlatIP(dimension)
-                
+
                 # Ensure embeddings are correct shape/type for FAISS
                 if embeddings.ndim != 2 or embeddings.shape[1] != dimension:
                     safe_print(f"[ERR] Embedding Shape Error: Expected (N, {dimension}), got {embeddings.shape}")
                     return 0
-                
-                self.index.add(embeddings)
-                self.metadata = new_metadata
-                self.id_to_idx = {m['id']: i for i, m in enumerate(self.metadata)}
-                
+
+                # Rebuild each shard from its own rows; shards with no notes left are dropped.
+                grouped: Dict[str, List[int]] = {}
+                categories: Dict[str, Optional[str]] = {}
+                for i, row in enumerate(new_metadata):
+                    key = self._shard_key_for(row['id'], note_categories[i])
+                    grouped.setdefault(key, []).append(i)
+                    categories[key] = note_categories[i] if key.startswith("cat_") else None
+
+                for key, shard in list(self.shards.items()):
+                    if key not in grouped:
+                        shard.rebuild([], np.zeros((0, dimension), dtype="float32"))
+                self.doc_shard = {}
+                self._snippet_cache.clear()
+                for key, positions in grouped.items():
+                    shard = self._get_shard(key, categories[key])
+                    shard.rebuild([new_metadata[i] for i in positions], embeddings[positions])
+                    for i in positions:
+                        self.doc_shard[new_metadata[i]["id"]] = key
+
                 await self._save_to_disk()
-                safe_print(f"[OK] FAISS Re-sync Complete. Count: {self.index.ntotal}")
-                return len(self.metadata)
+                safe_print(f"[OK] FAISS Re-sync Complete. Count: {self.ntotal} in {len(self.shards)} shard(s)")
+                return len(self.doc_shard)
             except Exception as e:
                 import traceback
                 safe_print(f"[ERR] FAISS Re-sync Error: {e}")
@@ -0,0 +1,236 @@
+"""
+Backend-managed schema additions on notes.db.
+
+The Electron app owns the `notes`/`categories` tables; the backend only adds
+what its own hot paths need (indexes, sidecar tables, changelog and FTS
+triggers). Every migration is idempotent: applied versions are recorded in
+`backend_schema_migrations`, and on each startup the objects of recorded
+migrations are verified and re-created if they went missing (e.g. after the
+app restored a backup). Migrations whose base tables do not exist yet are
+skipped and retried on the next start.
+"""
+import time
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+from core.database import get_pool
+from .category_catalog import CATEGORY_VERSION_SCHEMA, CATEGORY_VERSION_TABLE
+from .change_feed import CHANGES_TABLE, CHANGE_FEED_SCHEMA
+from .note_service import STALENESS_SCHEMA, STALENESS_TABLE
+
+
+# Safe print for Windows GBK encoding
+def safe_print(msg: str):
+    """Print message safely on Windows by handling encoding errors."""
+    try:
+        print(msg)
+    except UnicodeEncodeError:
+        try:
+            import sys
+            sys.stdout.buffer.write((msg + '\n').encode('utf-8', errors='replace'))
+            sys.stdout.buffer.flush()
+        except Exception:
+            print(msg.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+
+
+MIGRATIONS_TABLE = "backend_schema_migrations"
+FTS_TABLE = "notes_fts"
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    requires: Tuple[str, ...]   # tables that must already exist
+    objects: Tuple[str, ...]    # schema objects whose presence proves it is applied
+    statements: Sequence[str]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1, "notes_live_updated_index", ("notes",), ("idx_notes_isDeleted_updatedAt_id",),
+        # Serves `WHERE isDeleted = 0 ORDER BY updatedAt DESC, id DESC` and keyset pages as a covering range scan.
+        ["CREATE INDEX IF NOT EXISTS idx_notes_isDeleted_updatedAt_id ON notes(isDeleted, updatedAt, id)"],
+    ),
+    Migration(
+        2, "notes_category_live_index", ("notes",), ("idx_notes_categoryId_isDeleted",),
+        ["CREATE INDEX IF NOT EXISTS idx_notes_categoryId_isDeleted ON notes(categoryId, isDeleted)"],
+    ),
+    Migration(
+        3, "categories_order_index", ("categories",), ("idx_categories_order",),
+        ['CREATE INDEX IF NOT EXISTS idx_categories_order ON categories("order")'],
+    ),
+    Migration(
+        4, "markdown_staleness_sidecar", ("notes",), (STALENESS_TABLE,),
+        [STALENESS_SCHEMA],
+    ),
+    Migration(
+        5, "note_change_feed", ("notes",),
+        (CHANGES_TABLE, f"{CHANGES_TABLE}_after_insert", f"{CHANGES_TABLE}_after_update", f"{CHANGES_TABLE}_after_delete"),
+        CHANGE_FEED_SCHEMA,
+    ),
+    Migration(
+        6, "notes_fts", ("notes",), (FTS_TABLE, f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"),
+        [
+            # External-content FTS5 over title/plainText. The trigram tokenizer matches
+            # substrings in any script (notes are often Chinese), like the app's LIKE search.
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                title, plainText, content='notes', content_rowid='rowid', tokenize='trigram'
+            )
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON notes BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, title, plainText) VALUES (NEW.rowid, NEW.title, NEW.plainText);
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON notes BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, plainText)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.plainText);
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, plainText ON notes BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, plainText)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.plainText);
+                INSERT INTO {FTS_TABLE}(rowid, title, plainText) VALUES (NEW.rowid, NEW.title, NEW.plainText);
+            END
+            """,
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ],
+    ),
+    Migration(
+        7, "category_catalog_version", ("categories",),
+        (CATEGORY_VERSION_TABLE,) + tuple(f"{CATEGORY_VERSION_TABLE}_after_{e}" for e in ("insert", "update", "delete")),
+        CATEGORY_VERSION_SCHEMA,
+    ),
+]
+
+
+# Queries on the request path; `/api/diagnostics/query-plans` shows how SQLite runs them.
+HOT_QUERIES: Dict[str, Tuple[str, Tuple[Any, ...]]] = {
+    "list_notes_page": (
+        "SELECT id, updatedAt, title FROM notes WHERE isDeleted = 0 "
+        "ORDER BY updatedAt DESC, id DESC LIMIT ?",
+        (100,),
+    ),
+    "list_notes_keyset": (
+        "SELECT id, updatedAt, title FROM notes WHERE isDeleted = 0 AND (updatedAt, id) < (?, ?) "
+        "ORDER BY updatedAt DESC, id DESC LIMIT ?",
+        (0, "", 100),
+    ),
+    "get_note": (
+        f"SELECT n.*, s.isStale FROM notes n LEFT JOIN {STALENESS_TABLE} s "
+        "ON s.noteId = n.id AND s.updatedAt = n.updatedAt WHERE n.id = ?",
+        ("",),
+    ),
+    "integrity_scan": (
+        "SELECT id, title, plainText, updatedAt, categoryId FROM notes WHERE isDeleted = 0",
+        (),
+    ),
+    "hydrate_search_hits": (
+        "SELECT id, title, plainText, updatedAt, categoryId FROM notes WHERE isDeleted = 0 AND id IN (?, ?)",
+        ("", ""),
+    ),
+    "notes_in_category": (
+        "SELECT id FROM notes WHERE categoryId = ? AND isDeleted = 0",
+        ("",),
+    ),
+    "list_categories": (
+        'SELECT id, name, color, "order" FROM categories ORDER BY "order" ASC',
+        (),
+    ),
+    "change_feed": (
+        f"SELECT * FROM {CHANGES_TABLE} WHERE seq > ? ORDER BY seq LIMIT ?",
+        (0, 500),
+    ),
+    "keyword_search": (
+        f"SELECT n.id FROM {FTS_TABLE} f JOIN notes n ON n.rowid = f.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? AND n.isDeleted = 0 ORDER BY f.rank LIMIT ?",
+        ('"note"', 20),
+    ),
+}
+
+
+async def _existing_objects(db) -> set:
+    cursor = await db.execute("SELECT name FROM sqlite_master")
+    return {row[0] for row in await cursor.fetchall()}
+
+
+async def run_migrations(db_path: str) -> Dict[str, List[str]]:
+    """Apply or repair backend migrations. Returns names by outcome."""
+    outcome: Dict[str, List[str]] = {"applied": [], "repaired": [], "ok": [], "skipped": []}
+    async with get_pool(db_path).write() as db:
+        await db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                appliedAt INTEGER NOT NULL
+            )
+        """)
+        cursor = await db.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+        recorded = {row[0] for row in await cursor.fetchall()}
+        existing = await _existing_objects(db)
+
+    for migration in MIGRATIONS:
+        if any(table not in existing for table in migration.requires):
+            outcome["skipped"].append(migration.name)
+            continue
+        if migration.version in recorded and all(obj in existing for obj in migration.objects):
+            outcome["ok"].append(migration.name)
+            continue
+        try:
+            # One transaction per migration so a failure leaves no half-applied step.
+            async with get_pool(db_path).write() as db:
+                for statement in migration.statements:
+                    await db.execute(statement)
+                await db.execute(
+                    f"INSERT OR REPLACE INTO {MIGRATIONS_TABLE} (version, name, appliedAt) VALUES (?, ?, ?)",
+                    (migration.version, migration.name, int(time.time() * 1000))
+                )
+                existing = await _existing_objects(db)
+        except Exception as e:
+            safe_print(f"[DB] Migration {migration.version} ({migration.name}) failed: {e}")
+            outcome["skipped"].append(migration.name)
+            continue
+        outcome["repaired" if migration.version in recorded else "applied"].append(migration.name)
+
+    if outcome["applied"] or outcome["repaired"]:
+        safe_print(f"[DB] Schema migrations applied={outcome['applied']} repaired={outcome['repaired']}")
+    return outcome
+
+
+async def applied_migrations(db_path: str) -> List[Dict[str, Any]]:
+    async with get_pool(db_path).read() as db:
+        existing = await _existing_objects(db)
+        if MIGRATIONS_TABLE not in existing:
+            return []
+        cursor = await db.execute(f"SELECT version, name, appliedAt FROM {MIGRATIONS_TABLE} ORDER BY version")
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def explain_hot_queries(db_path: str) -> Dict[str, Dict[str, Any]]:
+    """EXPLAIN QUERY PLAN for each hot query; `full_scan` flags plans that read a whole table."""
+    plans: Dict[str, Dict[str, Any]] = {}
+    async with get_pool(db_path).read() as db:
+        for name, (sql, params) in HOT_QUERIES.items():
+            try:
+                cursor = await db.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                steps = [row[3] for row in await cursor.fetchall()]
+            except Exception as e:
+                plans[name] = {"sql": sql, "error": str(e)}
+                continue
+            plans[name] = {
+                "sql": sql,
+                "plan": steps,
+                # "SCAN x USING [COVERING] INDEX" walks an index in order; a bare "SCAN x" reads the table.
+                "full_scan": any(step.startswith("SCAN ") and "INDEX" not in step for step in steps),
+                "temp_sort": any("TEMP B-TREE" in step for step in steps),
+            }
+    return plans
+
+
+async def log_query_plans(db_path: str) -> None:
+    for name, info in (await explain_hot_queries(db_path)).items():
+        if info.get("error") or info.get("full_scan") or info.get("temp_sort"):
+            detail = info.get("error") or "; ".join(info.get("plan", []))
+            safe_print(f"[DB] Query plan warning ({name}): {detail}")
@@ -0,0 +1,183 @@
+"""
+Snippet extraction for search hits.
+
+Instead of the first N characters of every hit, pick the passages that best match
+the query (BM25 over sentence windows), keep them in document order and report
+highlight spans for the matched terms. A single character budget is shared by all
+hits of one call so the agent context stays bounded.
+"""
+import math
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Latin/digit words, or single CJK ideographs (notes are frequently Chinese and
+# have no whitespace between words).
+_TOKEN_RE = re.compile(r"[a-z0-9_]+|[\u3400-\u4dbf\u4e00-\u9fff]", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"[.!?;。！？；]+[\"')\]」』]*\s*|\n+")
+
+ELLIPSIS = " … "
+DEFAULT_WINDOW_CHARS = 320
+# Bounds for a caller-chosen total budget (search_knowledge's max_chars).
+MIN_BUDGET_CHARS = 500
+MAX_BUDGET_CHARS = 12000
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text or "")]
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Sentence spans (start, end) over the original text, whitespace-trimmed."""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        end = match.end()
+        if text[start:end].strip():
+            spans.append(_trim_span(text, start, end))
+        start = end
+    if start < len(text) and text[start:].strip():
+        spans.append(_trim_span(text, start, len(text)))
+    return spans
+
+
+def _trim_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def sentence_windows(text: str, window_chars: int = DEFAULT_WINDOW_CHARS) -> List[Tuple[int, int]]:
+    """Group consecutive sentences into windows of roughly window_chars."""
+    windows = []
+    current = None
+    for start, end in split_sentences(text):
+        # Over-long sentences are hard-split so one paragraph cannot eat the budget.
+        while end - start > window_chars:
+            if current is not None:
+                windows.append(current)
+                current = None
+            windows.append((start, start + window_chars))
+            start += window_chars
+        if current is None:
+            current = (start, end)
+        elif end - current[0] <= window_chars:
+            current = (current[0], end)
+        else:
+            windows.append(current)
+            current = (start, end)
+    if current is not None:
+        windows.append(current)
+    return windows
+
+
+def bm25_scores(query_terms: Sequence[str], documents: Sequence[Sequence[str]]) -> List[float]:
+    """Okapi BM25 of each tokenized document against the query terms."""
+    if not documents:
+        return []
+    n_docs = len(documents)
+    avg_len = sum(len(d) for d in documents) / n_docs or 1.0
+    unique_terms = set(query_terms)
+    doc_freq = {term: sum(1 for d in documents if term in d) for term in unique_terms}
+
+    scores = []
+    for doc in documents:
+        counts: Dict[str, int] = {}
+        for token in doc:
+            if token in unique_terms:
+                counts[token] = counts.get(token, 0) + 1
+        score = 0.0
+        for term in unique_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1.0 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * len(doc) / avg_len)
+            score += idf * tf * (BM25_K1 + 1.0) / norm
+        scores.append(score)
+    return scores
+
+
+def _highlight_spans(snippet: str, query_terms: set) -> List[List[int]]:
+    spans = []
+    for match in _TOKEN_RE.finditer(snippet):
+        if match.group(0).lower() in query_terms:
+            if spans and spans[-1][1] == match.start():
+                spans[-1][1] = match.end()  # merge adjacent CJK characters into one span
+            else:
+                spans.append([match.start(), match.end()])
+    return spans
+
+
+def extract_snippet(
+    query: str,
+    text: str,
+    budget_chars: int,
+    window_chars: int = DEFAULT_WINDOW_CHARS,
+) -> Dict[str, Any]:
+    """
+    Best-matching passages of `text` within `budget_chars`.
+
+    Returns {"text", "highlights": [[start, end], ...], "truncated": bool}; highlight
+    offsets are relative to the returned text.
+    """
+    text = text or ""
+    if budget_chars <= 0 or not text.strip():
+        return {"text": "", "highlights": [], "truncated": bool(text.strip())}
+    if len(text) <= budget_chars:
+        query_terms = set(tokenize(query))
+        return {"text": text, "highlights": _highlight_spans(text, query_terms), "truncated": False}
+
+    query_terms = set(tokenize(query))
+    budget_chars = max(1, budget_chars - 2)  # room for leading/trailing "…"
+    windows = sentence_windows(text, min(window_chars, budget_chars))
+    scores = bm25_scores(list(query_terms), [tokenize(text[s:e]) for s, e in windows])
+
+    # Highest score first; ties (including "no lexical match") keep document order.
+    ranked = sorted(range(len(windows)), key=lambda i: (-scores[i], i))
+    chosen = []
+    used = 0
+    for i in ranked:
+        start, end = windows[i]
+        cost = (end - start) + (len(ELLIPSIS) if chosen else 0)
+        if used + cost > budget_chars:
+            if chosen:
+                continue
+            end = start + budget_chars  # a single window larger than the budget
+            cost = budget_chars
+        chosen.append((start, end))
+        used += cost
+        if used >= budget_chars:
+            break
+
+    chosen.sort()
+    parts = []
+    for j, (start, end) in enumerate(chosen):
+        passage = text[start:end]
+        if j == 0 and start > 0:
+            passage = "…" + passage
+        parts.append(passage)
+    snippet = ELLIPSIS.join(parts)
+    if chosen and chosen[-1][1] < len(text.rstrip()):
+        snippet += "…"
+    return {"text": snippet, "highlights": _highlight_spans(snippet, query_terms), "truncated": True}
+
+
+def build_snippets(query: str, texts: Sequence[str], total_budget_chars: int) -> List[Dict[str, Any]]:
+    """
+    Share one character budget across ranked hits.
+
+    Each hit gets an equal share; budget left unused by short notes rolls over to
+    the hits after it.
+    """
+    results: List[Dict[str, Any]] = []
+    remaining = max(0, int(total_budget_chars))
+    for position, text in enumerate(texts):
+        share = remaining // max(1, len(texts) - position)
+        snippet = extract_snippet(query, text, share)
+        remaining -= len(snippet["text"])
+        results.append(snippet)
+    return results
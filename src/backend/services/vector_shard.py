@@ -0,0 +1,282 @@
+"""
+Vector Shard - one FAISS index plus its row-aligned metadata.
+
+RAGService keeps one shard (legacy single-index layout) or one shard per
+category when sharding is enabled. Each shard is rebuilt, compacted and
+persisted on its own, so an edit in one category never rewrites the others.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# Qwen text-embedding-v3 dimension is 1024
+DEFAULT_DIMENSION = 1024
+
+# (now_ms, half_life_days, weight) for recency-aware ranking
+RecencyParams = Tuple[float, float, float]
+# (score, similarity, metadata row)
+Candidate = Tuple[float, float, Dict[str, Any]]
+
+
+def recency_decay(updated_at_ms: np.ndarray, now_ms: float, half_life_days: float) -> np.ndarray:
+    """Exponential freshness in [0, 1]: 1.0 for just-edited notes, 0.5 after one half-life."""
+    half_life_ms = max(float(half_life_days), 1e-6) * 86_400_000.0
+    age_ms = np.maximum(now_ms - updated_at_ms.astype("float64"), 0.0)
+    return np.exp2(-age_ms / half_life_ms)
+
+
+def blend_recency_scores(
+    similarities: np.ndarray,
+    updated_at_ms: np.ndarray,
+    now_ms: float,
+    half_life_days: float,
+    weight: float,
+) -> np.ndarray:
+    """Vectorized blend of cosine similarity and time decay over a candidate pool."""
+    weight = min(max(float(weight), 0.0), 1.0)
+    decay = recency_decay(updated_at_ms, now_ms, half_life_days)
+    return (1.0 - weight) * similarities.astype("float64") + weight * decay
+
+
+def slim_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Vector rows only carry what ranking needs: id, updatedAt and the span of
+    plainText that was embedded. Titles/snippets are read from notes.db on demand.
+    """
+    span = row.get("span")
+    if span is None:
+        span = [0, len(row.get("content") or "")]
+    return {"id": row["id"], "updatedAt": int(row.get("updatedAt") or 0), "span": list(span)}
+
+
+class VectorShard:
+    """
+    A self-contained FAISS IndexFlatIP with metadata rows and a freshness array.
+
+    All index mutations and searches go through `_lock` so searches can run on
+    worker threads (FAISS releases the GIL) while the event loop upserts.
+    """
+
+    def __init__(self, key: str, index_file: Path, meta_file: Path, category_id: Optional[str] = None):
+        self.key = key
+        self.index_file = Path(index_file)
+        self.meta_file = Path(meta_file)
+        self.category_id = category_id
+
+        self.index = None
+        self.metadata: List[Dict[str, Any]] = []
+        self.id_to_idx: Dict[str, int] = {}
+        # updatedAt (ms) per FAISS row, kept row-aligned with metadata for vectorized recency ranking.
+        self.freshness = np.zeros(0, dtype="float64")
+        self.dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.index.ntotal) if self.index is not None else 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle / persistence
+    # ------------------------------------------------------------------
+
+    def create_empty(self, dimension: int = DEFAULT_DIMENSION) -> None:
+        with self._lock:
+            self.index = faiss.IndexFlatIP(dimension)  # Inner Product is better for normalized embeddings
+            self.metadata = []
+            self.id_to_idx = {}
+            self.freshness = np.zeros(0, dtype="float64")
+
+    def load(self, mmap: bool = False) -> bool:
+        """
+        Load index + metadata from disk. Returns False when files are missing.
+        With mmap the vectors are paged in lazily by the OS instead of read up front.
+        """
+        if not (self.index_file.exists() and self.meta_file.exists()):
+            return False
+        if mmap:
+            try:
+                index = faiss.read_index(str(self.index_file), faiss.IO_FLAG_MMAP)
+            except Exception:
+                index = faiss.read_index(str(self.index_file))
+        else:
+            index = faiss.read_index(str(self.index_file))
+        with open(self.meta_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.index = index
+            self.metadata = [slim_row(m) for m in data.get("metadata", [])]
+            if self.category_id is None:
+                self.category_id = data.get("category_id")
+            self._reindex_rows()
+            # Rewrite older files that still duplicated note text.
+            self.dirty = any("content" in m or "title" in m for m in data.get("metadata", []))
+        return True
+
+    def save(self) -> None:
+        """Persist index + metadata with sync timestamp."""
+        with self._lock:
+            # Write-then-rename so a memory-mapped reader never sees a truncated file.
+            tmp_index = self.index_file.with_name(self.index_file.name + ".tmp")
+            faiss.write_index(self.index, str(tmp_index))
+            os.replace(tmp_index, self.index_file)
+            payload = {
+                "shard": self.key,
+                "category_id": self.category_id,
+                "metadata": self.metadata,
+                "last_sync_time": int(time.time() * 1000),  # Unix timestamp in ms (same as DB)
+            }
+            with open(self.meta_file, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            self.dirty = False
+
+    def delete_files(self) -> None:
+        for path in (self.index_file, self.meta_file):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.dirty = False
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def _reindex_rows(self) -> None:
+        self.id_to_idx = {m["id"]: i for i, m in enumerate(self.metadata)}
+        self.freshness = np.array(
+            [float(m.get("updatedAt") or 0) for m in self.metadata],
+            dtype="float64",
+        )
+
+    def ensure_dimension(self, dimension: int) -> None:
+        """Adopt the embedding dimension on an empty index; refuse mixing dimensions."""
+        if self.index is None:
+            self.create_empty(dimension)
+            return
+        if self.index.d == dimension:
+            return
+        if self.index.ntotal == 0:
+            with self._lock:
+                self.index = faiss.IndexFlatIP(dimension)
+            return
+        raise ValueError(
+            f"Embedding dimension mismatch: {self.index.d} vs {dimension}. "
+            "Please run reindex_all."
+        )
+
+    def add(self, rows: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """Append rows (metadata dicts incl. updatedAt) with their embeddings."""
+        if not rows:
+            return
+        self.ensure_dimension(embeddings.shape[1])
+        with self._lock:
+            self.index.add(embeddings.astype("float32"))
+            base = len(self.metadata)
+            self.metadata.extend(rows)
+            for offset, row in enumerate(rows):
+                self.id_to_idx[row["id"]] = base + offset
+            self.freshness = np.append(
+                self.freshness,
+                np.array([float(r.get("updatedAt") or 0) for r in rows], dtype="float64"),
+            )
+            self.dirty = True
+
+    def take(self, doc_ids: List[str]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Remove documents and return their rows + vectors (for moving between shards)."""
+        with self._lock:
+            indices = [self.id_to_idx[d] for d in doc_ids if d in self.id_to_idx]
+            if not indices or self.index is None or self.index.ntotal == 0:
+                return [], np.zeros((0, self.index.d if self.index is not None else DEFAULT_DIMENSION), dtype="float32")
+            vectors = np.vstack([self.index.reconstruct(int(i)) for i in indices]).astype("float32")
+            rows = [self.metadata[i] for i in indices]
+            self.remove([r["id"] for r in rows])
+            return rows, vectors
+
+    def remove(self, doc_ids: List[str]) -> None:
+        """Batch-remove documents using vector reconstruction (no embedding API calls)."""
+        with self._lock:
+            remove_set = {doc_id for doc_id in doc_ids if doc_id in self.id_to_idx}
+            if not remove_set:
+                return
+
+            total = self.index.ntotal
+            keep_rows = [i for i, m in enumerate(self.metadata) if m["id"] not in remove_set]
+            if total == 0:
+                self.metadata = [self.metadata[i] for i in keep_rows]
+                self._reindex_rows()
+                self.dirty = True
+                return
+
+            keep_mask = np.zeros(total, dtype=bool)
+            keep_mask[keep_rows] = True
+            vectors = self.index.reconstruct_n(0, total)
+            kept_vectors = vectors[keep_mask]
+
+            self.metadata = [self.metadata[i] for i in keep_rows]
+            self.index = faiss.IndexFlatIP(self.index.d)
+            if kept_vectors.size > 0:
+                self.index.add(kept_vectors.astype("float32"))
+            self._reindex_rows()
+            self.dirty = True
+
+    def rebuild(self, rows: List[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """Replace the whole shard content (full re-index of this shard only)."""
+        dimension = embeddings.shape[1] if embeddings.ndim == 2 and embeddings.shape[0] > 0 else DEFAULT_DIMENSION
+        with self._lock:
+            self.index = faiss.IndexFlatIP(dimension)
+            if rows:
+                self.index.add(embeddings.astype("float32"))
+            self.metadata = list(rows)
+            self._reindex_rows()
+            self.dirty = True
+
+    def refresh_freshness(self, updated_at_by_id: Dict[str, Any]) -> None:
+        """Pick up updatedAt changes made outside the backend (e.g. editor saves)."""
+        with self._lock:
+            changed = False
+            for doc_id, idx in self.id_to_idx.items():
+                updated_at = updated_at_by_id.get(doc_id)
+                if updated_at is None or self.metadata[idx].get("updatedAt") == int(updated_at):
+                    continue
+                self.metadata[idx]["updatedAt"] = int(updated_at)
+                self.freshness[idx] = float(updated_at)
+                changed = True
+            if changed:
+                self.dirty = True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query_vec: np.ndarray, k: int, recency: Optional[RecencyParams] = None) -> List[Candidate]:
+        """
+        Return up to k candidates sorted by score (descending).
+        Safe to call from worker threads.
+        """
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0 or k <= 0:
+                return []
+            D, I = self.index.search(query_vec, min(k, self.index.ntotal))
+            rows = I[0]
+            valid = rows >= 0
+            rows = rows[valid]
+            similarities = D[0][valid]
+            if rows.size == 0:
+                return []
+            if recency is not None:
+                now_ms, half_life_days, weight = recency
+                scores = blend_recency_scores(similarities, self.freshness[rows], now_ms, half_life_days, weight)
+                order = np.argsort(-scores, kind="stable")
+            else:
+                scores = similarities
+                order = np.arange(rows.size)
+            return [
+                (float(scores[i]), float(similarities[i]), self.metadata[int(rows[i])])
+                for i in order
+            ]
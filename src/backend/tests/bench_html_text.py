@@ -0,0 +1,81 @@
+"""
+Benchmark: plainText extraction vs. the previous regex chain and incremental tokenizers.
+
+Run manually (not collected by pytest): python tests/bench_html_text.py
+"""
+import html
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.html_text import html_to_plain_text  # noqa: E402
+
+
+def old_chain(h):
+    """NoteService._extract_plain_text before services/html_text.py."""
+    t = re.sub(r'<[^>]+>', '', h)
+    for a, b in (('&nbsp;', ' '), ('&lt;', '<'), ('&gt;', '>'), ('&amp;', '&'), ('&quot;', '"')):
+        t = t.replace(a, b)
+    return re.sub(r'\s+', ' ', t).strip()
+
+
+class _TextCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def htmlparser_tokenizer(h):
+    parser = _TextCollector()
+    parser.feed(h)
+    parser.close()
+    return " ".join("".join(parser.parts).split())
+
+
+_TOKEN = re.compile(r"<[^>]*>|[^<]+")
+
+
+def regex_tokenizer(h):
+    out = []
+    for m in _TOKEN.finditer(h):
+        s = m.group(0)
+        if s[0] != "<":
+            out.append(s)
+    return " ".join(html.unescape("".join(out)).split())
+
+
+def _best_ms(fn, doc, rounds=20):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(doc)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    para = (
+        "<p>网络协议 TCP/IP &amp; UDP &nbsp;笔记 <strong>重点</strong> &lt;握手&gt; "
+        "<a href='x'>link</a> more text &quot;quoted&quot; 中文内容。</p>\n<ul><li>one</li><li>two</li></ul>\n"
+    )
+    doc = para * (720 * 1024 // len(para.encode()))
+    print(f"input: {len(doc.encode()) / 1024:.0f} KiB, best of 20")
+    for name, fn in (
+        ("old regex chain", old_chain),
+        ("html_to_plain_text", html_to_plain_text),
+        ("HTMLParser tokenizer", htmlparser_tokenizer),
+        ("regex tokenizer", regex_tokenizer),
+    ):
+        print(f"{name:22s} {_best_ms(fn, doc):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import unittest
 from pathlib import Path
@@ -17,20 +18,20 @@ class _FakeModel:
     def __init__(self, response: AIMessage):
         self._response = response
 
-    def invoke(self, _messages):
+    async def ainvoke(self, _messages, config=None):
         return self._response
 
 
-class GraphToolCallIntegrityTests(unittest.TestCase):
+class GraphToolCallIntegrityTests(unittest.IsolatedAsyncioTestCase):
     def _build_graph(self, response: AIMessage) -> NoteAgentGraph:
         graph = NoteAgentGraph.__new__(NoteAgentGraph)
         fake_model = _FakeModel(response)
         graph.model_with_tools = fake_model
         graph.model_with_read_tools = fake_model
-        graph._classify_write_authorization = lambda _history: True
+        graph._classify_write_authorization = AsyncMock(return_value=True)
         return graph
 
-    def test_agent_node_keeps_only_first_tool_call(self):
+    async def test_agent_node_keeps_only_first_tool_call(self):
         response = AIMessage(
             content="",
             tool_calls=[
@@ -40,7 +41,7 @@ class GraphToolCallIntegrityTests(unittest.TestCase):
         )
         graph = self._build_graph(response)
 
-        result = graph._agent_node(
+        result = await graph._agent_node(
             {
                 "messages": [HumanMessage(content="帮我写一篇笔记并分类到工作")],
                 "agent_mode": "agent",
@@ -54,7 +55,129 @@ class GraphToolCallIntegrityTests(unittest.TestCase):
         self.assertEqual(ai_msg.tool_calls[0]["id"], "call_1")
         self.assertEqual(ai_msg.tool_calls[0]["name"], "list_categories")
 
-    def test_agent_node_assigns_tool_call_id_when_missing(self):
+    async def test_agent_node_keeps_leading_read_only_batch(self):
+        response = AIMessage(
+            content="",
+            tool_calls=[
+                {"id": "call_1", "name": "read_note_content", "args": {"note_id": "1700000000000-aaaaaaaaa"}},
+                {"id": "call_2", "name": "read_note_content", "args": {"note_id": "1700000000000-bbbbbbbbb"}},
+                {"id": "call_3", "name": "update_note", "args": {"note_id": "1700000000000-aaaaaaaaa", "instruction": "x"}},
+            ],
+        )
+        graph = self._build_graph(response)
+
+        result = await graph._agent_node(
+            {
+                "messages": [HumanMessage(content="对比这两篇笔记")],
+                "agent_mode": "agent",
+                "intent": "TASK",
+                "tool_call_count": 0,
+            }
+        )
+
+        ai_msg = result["messages"][0]
+        self.assertEqual([tc["id"] for tc in ai_msg.tool_calls], ["call_1", "call_2"])
+        picked = graph._pick_one_tool_node({"messages": [ai_msg]})
+        self.assertIsNone(picked["next_tool_call"])
+        self.assertEqual(len(picked["next_tool_batch"]), 2)
+        self.assertEqual(graph._route_picked_tools(picked), "batch")
+
+    async def test_agent_node_keeps_single_call_when_parallel_reads_disabled(self):
+        response = AIMessage(
+            content="",
+            tool_calls=[
+                {"id": "call_1", "name": "search_knowledge", "args": {"query": "a"}},
+                {"id": "call_2", "name": "search_knowledge", "args": {"query": "b"}},
+            ],
+        )
+        graph = self._build_graph(response)
+
+        with patch.object(graph_module.settings, "PARALLEL_READ_TOOLS", False):
+            result = await graph._agent_node(
+                {
+                    "messages": [HumanMessage(content="搜索 a 和 b")],
+                    "agent_mode": "agent",
+                    "intent": "TASK",
+                    "tool_call_count": 0,
+                }
+            )
+
+        self.assertEqual([tc["id"] for tc in result["messages"][0].tool_calls], ["call_1"])
+
+    async def test_run_read_tools_node_runs_concurrently_and_pairs_results(self):
+        graph = self._build_graph(AIMessage(content="ok"))
+        running = {"now": 0, "max": 0, "calls": 0}
+
+        class _FakeToolNode:
+            async def ainvoke(self, state):
+                call = state["messages"][0].tool_calls[0]
+                running["calls"] += 1
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+                await asyncio.sleep(0.02)
+                running["now"] -= 1
+                return {"messages": [ToolMessage(content=f"body of {call['args']['note_id']}", tool_call_id=call["id"])]}
+
+        graph.tool_node = _FakeToolNode()
+        note_a, note_b = "1700000000000-aaaaaaaaa", "1700000000000-bbbbbbbbb"
+        batch = [
+            {"id": "call_1", "name": "read_note_content", "args": {"note_id": note_a}},
+            {"id": "call_2", "name": "read_note_content", "args": {"note_id": note_b}},
+            {"id": "call_3", "name": "read_note_content", "args": {"note_id": note_a}},
+        ]
+
+        result = await graph._run_read_tools_node(
+            {
+                "messages": [HumanMessage(content="对比这两篇笔记")],
+                "next_tool_batch": batch,
+                "tool_call_count": 0,
+            }
+        )
+
+        self.assertEqual(running["max"], 2)
+        self.assertEqual(running["calls"], 2)  # the duplicate read ran once
+        self.assertEqual([m.tool_call_id for m in result["messages"]], ["call_1", "call_2", "call_3"])
+        self.assertEqual(result["messages"][1].content, f"body of {note_b}")
+        self.assertEqual(result["messages"][2].content, f"body of {note_a}")
+        self.assertEqual(result["tool_call_count"], 3)
+        self.assertTrue(result["last_tool_success"])
+        self.assertIsNone(result["next_tool_batch"])
+
+    async def test_repeated_read_batch_counts_as_one_doom_loop_step(self):
+        graph = self._build_graph(AIMessage(content="ok"))
+        executed = []
+
+        class _FakeToolNode:
+            async def ainvoke(self, state):
+                call = state["messages"][0].tool_calls[0]
+                executed.append(call["id"])
+                return {"messages": [ToolMessage(content="body", tool_call_id=call["id"])]}
+
+        graph.tool_node = _FakeToolNode()
+        batch = [
+            {"id": "call_1", "name": "read_note_content", "args": {"note_id": "1700000000000-aaaaaaaaa"}},
+            {"id": "call_2", "name": "read_note_content", "args": {"note_id": "1700000000000-bbbbbbbbb"}},
+        ]
+        state = {"messages": [HumanMessage(content="对比这两篇笔记")], "next_tool_batch": batch, "tool_call_count": 0}
+        first = await graph._run_read_tools_node(state)
+        repeat_state = {
+            **state,
+            "next_tool_batch": [{**c, "id": f"{c['id']}_again"} for c in batch],
+            "tool_call_count": 1,
+            "last_tool_name": first["last_tool_name"],
+            "last_tool_input_hash": first["last_tool_input_hash"],
+        }
+
+        # First repeat after one earlier step: 1 + 1 < threshold, so the batch still runs.
+        repeated = await graph._run_read_tools_node(repeat_state)
+        self.assertNotIn("DOOM LOOP", repeated["messages"][0].content)
+        self.assertEqual(len(executed), 4)
+
+        stopped = await graph._run_read_tools_node({**repeat_state, "tool_call_count": 2})
+        self.assertIn("DOOM LOOP", stopped["messages"][0].content)
+        self.assertEqual(len(executed), 4)
+
+    async def test_agent_node_assigns_tool_call_id_when_missing(self):
         response = AIMessage(
             content="",
             tool_calls=[
@@ -64,7 +187,7 @@ class GraphToolCallIntegrityTests(unittest.TestCase):
         )
         graph = self._build_graph(response)
 
-        result = graph._agent_node(
+        result = await graph._agent_node(
             {
                 "messages": [HumanMessage(content="帮我写一篇笔记并分类到工作")],
                 "agent_mode": "agent",
@@ -77,12 +200,30 @@ class GraphToolCallIntegrityTests(unittest.TestCase):
         self.assertEqual(len(ai_msg.tool_calls), 1)
         self.assertTrue(str(ai_msg.tool_calls[0]["id"]).startswith("call_"))
 
+    async def test_agent_node_reuses_router_write_authorization(self):
+        graph = self._build_graph(AIMessage(content="ok"))
+        graph.model_with_tools = _FakeModel(AIMessage(content="write model"))
+
+        result = await graph._agent_node(
+            {
+                "messages": [HumanMessage(content="把标题改成周报")],
+                "agent_mode": "agent",
+                "intent": "TASK",
+                "tool_call_count": 1,
+                "write_authorized": False,
+            }
+        )
+
+        graph._classify_write_authorization.assert_not_awaited()
+        self.assertFalse(result["write_authorized"])
+        self.assertEqual(result["messages"][0].content, "ok")
+
     def test_extract_requested_category_hint_from_chinese_prompt(self):
         graph = self._build_graph(AIMessage(content="ok"))
         hint = graph._extract_requested_category_hint("帮我写一篇笔记，主题是宇树科技的发展史，归类到工作")
         self.assertEqual(hint, "工作")
 
-    def test_agent_node_recovers_tool_call_from_invalid_tool_calls(self):
+    async def test_agent_node_recovers_tool_call_from_invalid_tool_calls(self):
         response = AIMessage(
             content="I will create it.",
             tool_calls=[],
@@ -98,7 +239,7 @@ class GraphToolCallIntegrityTests(unittest.TestCase):
         )
         graph = self._build_graph(response)
 
-        result = graph._agent_node(
+        result = await graph._agent_node(
             {
                 "messages": [HumanMessage(content="帮我写一篇笔记，主题是宇树科技的发展史")],
                 "agent_mode": "agent",
@@ -271,12 +412,19 @@ class SupervisorPendingInterruptTests(unittest.IsolatedAsyncioTestCase):
                     return _FakeCursor(fetchone_result=(self._pending_count,))
                 raise AssertionError(f"Unexpected SQL in test: {sql} / params={params}")
 
+        class _FakePool:
+            def __init__(self, conn):
+                self._conn = conn
+
+            def read(self):
+                return self._conn
+
         original_path = graph_module.CHECKPOINT_DB_PATH
         graph_module.CHECKPOINT_DB_PATH = "mock-checkpoints.db"
         try:
-            with patch("aiosqlite.connect", return_value=_FakeConnection(1)):
+            with patch("agent.supervisor.get_pool", return_value=_FakePool(_FakeConnection(1))):
                 self.assertTrue(await supervisor._has_pending_interrupt("session-1"))
-            with patch("aiosqlite.connect", return_value=_FakeConnection(0)):
+            with patch("agent.supervisor.get_pool", return_value=_FakePool(_FakeConnection(0))):
                 self.assertFalse(await supervisor._has_pending_interrupt("session-2"))
         finally:
             graph_module.CHECKPOINT_DB_PATH = original_path
@@ -0,0 +1,91 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools  # noqa: E402
+from services.category_catalog import CategoryCatalog, CategoryCatalogCache  # noqa: E402
+from services.schema_migrations import run_migrations  # noqa: E402
+
+CATEGORIES = [
+    {"id": "cat-work", "name": "Work Projects", "color": "#f00", "order": 0},
+    {"id": "cat-net", "name": "计算机网络", "color": "#0f0", "order": 1},
+    {"id": "cat-home", "name": "Home", "color": "#00f", "order": 2},
+]
+
+
+def test_resolve_hint_matches_id_then_name_then_contains():
+    catalog = CategoryCatalog(CATEGORIES)
+    assert catalog.resolve_hint(" CAT-HOME ") == "cat-home"
+    assert catalog.resolve_hint("work projects") == "cat-work"
+    assert catalog.resolve_hint("workproj") == "cat-work"
+    assert catalog.resolve_hint("网络") == "cat-net"
+    assert catalog.resolve_hint("o") == "cat-work"  # first category in display order
+    assert catalog.resolve_hint("garden") is None
+    assert catalog.resolve_hint("  ") is None
+
+
+def test_resolve_id_or_name_and_long_names():
+    long_name = "Reading list " * 10
+    catalog = CategoryCatalog(CATEGORIES + [{"id": "cat-long", "name": long_name, "color": "", "order": 3}])
+    assert catalog.resolve_id_or_name("cat-net") == "cat-net"
+    assert catalog.resolve_id_or_name("Home") == "cat-home"
+    assert catalog.resolve_id_or_name("home") is None
+    assert catalog.name_of("cat-work") == "Work Projects"
+    assert catalog.name_of("missing") is None
+    assert catalog.resolve_hint("listreading") == "cat-long"
+
+
+class CategoryCatalogCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "notes.db")
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute('CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT, color TEXT, "order" INTEGER)')
+            await db.executemany(
+                'INSERT INTO categories (id, name, color, "order") VALUES (?, ?, ?, ?)',
+                [(c["id"], c["name"], c["color"], c["order"]) for c in CATEGORIES],
+            )
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def _app_write(self, sql, params=()):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(sql, params)
+            await db.commit()
+
+    async def test_cached_until_app_changes_categories(self):
+        await run_migrations(self.db_path)
+        cache = CategoryCatalogCache()
+
+        first = await cache.get(self.db_path)
+        self.assertIs(await cache.get(self.db_path), first)
+        self.assertEqual(cache.counters["reloads"], 1)
+
+        await self._app_write("UPDATE categories SET name = 'Garden' WHERE id = 'cat-home'")
+        renamed = await cache.get(self.db_path)
+        self.assertIsNot(renamed, first)
+        self.assertEqual(renamed.resolve_hint("garden"), "cat-home")
+
+        await self._app_write("DELETE FROM categories WHERE id = 'cat-net'")
+        self.assertIsNone((await cache.get(self.db_path)).resolve_hint("网络"))
+        self.assertEqual(cache.counters["reloads"], 3)
+
+    async def test_reloads_every_time_without_version_table(self):
+        cache = CategoryCatalogCache()
+        await cache.get(self.db_path)
+        await self._app_write("INSERT INTO categories (id, name, color, \"order\") VALUES ('cat-x', 'Extra', '', 9)")
+        self.assertEqual((await cache.get(self.db_path)).resolve_hint("extra"), "cat-x")
+        self.assertEqual(cache.counters["reloads"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
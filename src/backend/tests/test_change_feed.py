@@ -0,0 +1,114 @@
+import asyncio
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.config import settings  # noqa: E402
+from core.database import close_all_pools  # noqa: E402
+from services.change_feed import get_change_feed, run_retention  # noqa: E402
+from services.note_service import NoteService  # noqa: E402
+
+
+class ChangeFeedTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "notes.db")
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                CREATE TABLE notes (
+                    id TEXT PRIMARY KEY, title TEXT, content TEXT, plainText TEXT,
+                    markdownSource TEXT, categoryId TEXT, isPinned INTEGER,
+                    isDeleted INTEGER, deletedAt INTEGER, createdAt INTEGER, updatedAt INTEGER
+                )
+                """
+            )
+            await db.execute("INSERT INTO notes VALUES ('n1', 'A', '<p>a</p>', 'a', NULL, NULL, 0, 0, NULL, 1, 1)")
+            await db.commit()
+        self.feed = get_change_feed(self.db_path)
+        await self.feed.ensure_schema()
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def _external(self, sql):
+        # Simulates the Electron app writing through its own connection.
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(sql)
+            await db.commit()
+
+    async def test_triggers_log_external_writes_in_order(self):
+        start = await self.feed.latest_seq()
+        await self._external("INSERT INTO notes VALUES ('n2', 'B', '', '', NULL, 'c1', 0, 0, NULL, 2, 2)")
+        await self._external("UPDATE notes SET isDeleted = 1, deletedAt = 3 WHERE id = 'n1'")
+        await self._external("UPDATE notes SET isDeleted = 0, deletedAt = NULL, updatedAt = 4 WHERE id = 'n1'")
+        await self._external("DELETE FROM notes WHERE id = 'n2'")
+
+        result = await self.feed.read_since(start)
+        self.assertEqual(
+            [(e["noteId"], e["op"]) for e in result["events"]],
+            [("n2", "created"), ("n1", "deleted"), ("n1", "restored"), ("n2", "purged")],
+        )
+        self.assertEqual(result["events"][0]["categoryId"], "c1")
+        self.assertEqual(result["last_id"], result["events"][-1]["id"])
+
+        # Resuming from the last id returns nothing new.
+        self.assertEqual((await self.feed.read_since(result["last_id"]))["events"], [])
+
+    async def test_backend_write_wakes_long_poll_without_waiting_for_poll_interval(self):
+        service = NoteService()
+        service.db_path = self.db_path
+        service._run_vector_task = lambda coro, _label: coro.close()
+        since = await self.feed.latest_seq()
+
+        with patch.object(settings, "CHANGE_FEED_POLL_SECONDS", 30.0):
+            waiter = asyncio.create_task(self.feed.wait_for_changes(since, timeout=10))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            await service.update_note(note_id="n1", title="Renamed")
+            result = await waiter
+
+        self.assertLess(time.monotonic() - started, 2.0)
+        self.assertEqual([(e["noteId"], e["op"]) for e in result["events"]], [("n1", "updated")])
+
+    async def test_pruned_history_requests_a_reset(self):
+        await self._external("UPDATE notes SET title = 'x', updatedAt = 5 WHERE id = 'n1'")
+        await self._external("UPDATE notes SET title = 'y', updatedAt = 6 WHERE id = 'n1'")
+        await self._external("UPDATE notes SET title = 'z', updatedAt = 7 WHERE id = 'n1'")
+        latest = await self.feed.latest_seq()
+        await self._external(f"DELETE FROM note_changes WHERE seq < {latest}")
+
+        self.assertTrue((await self.feed.read_since(latest - 2))["reset"])
+        self.assertFalse((await self.feed.read_since(latest - 1))["reset"])
+        self.assertEqual((await self.feed.wait_for_changes(latest, timeout=0))["events"], [])
+
+    async def test_retention_task_prunes_without_any_reader(self):
+        await self._external("UPDATE notes SET title = 'x', updatedAt = 5 WHERE id = 'n1'")
+        await self._external("UPDATE notes SET title = 'y', updatedAt = 6 WHERE id = 'n1'")
+        await self._external("UPDATE note_changes SET changedAt = 0 WHERE seq = (SELECT MIN(seq) FROM note_changes)")
+
+        task = asyncio.create_task(run_retention(self.db_path, interval_seconds=60))
+        try:
+            for _ in range(100):
+                async with aiosqlite.connect(self.db_path) as db:
+                    count = (await (await db.execute("SELECT COUNT(*) FROM note_changes")).fetchone())[0]
+                if count == 1:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
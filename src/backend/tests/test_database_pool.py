@@ -0,0 +1,58 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools, get_pool  # noqa: E402
+
+
+class SQLitePoolTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "notes.db")
+        async with get_pool(self.db_path).write() as db:
+            await db.execute("CREATE TABLE notes (id TEXT PRIMARY KEY, title TEXT)")
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def test_connections_are_reused_across_operations(self):
+        pool = get_pool(self.db_path)
+        for i in range(5):
+            async with pool.write() as db:
+                await db.execute("INSERT INTO notes (id, title) VALUES (?, ?)", (f"n{i}", "t"))
+            async with pool.read() as db:
+                cursor = await db.execute("SELECT COUNT(*) FROM notes")
+                self.assertEqual((await cursor.fetchone())[0], i + 1)
+
+        self.assertIs(get_pool(self.db_path), pool)
+        stats = pool.stats()
+        self.assertEqual(stats["connections_opened"], 2)  # one writer + one reader
+        self.assertEqual(stats["reads"], 5)
+
+    async def test_wal_and_pragmas_applied_and_readers_are_read_only(self):
+        async with get_pool(self.db_path).read() as db:
+            cursor = await db.execute("PRAGMA journal_mode")
+            self.assertEqual((await cursor.fetchone())[0].lower(), "wal")
+            cursor = await db.execute("PRAGMA synchronous")
+            self.assertEqual((await cursor.fetchone())[0], 1)  # NORMAL
+            with self.assertRaises(Exception):
+                await db.execute("INSERT INTO notes (id, title) VALUES ('x', 'y')")
+
+    async def test_failed_write_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            async with get_pool(self.db_path).write() as db:
+                await db.execute("INSERT INTO notes (id, title) VALUES ('n1', 't')")
+                raise RuntimeError("boom")
+
+        async with get_pool(self.db_path).read() as db:
+            cursor = await db.execute("SELECT COUNT(*) FROM notes")
+            self.assertEqual((await cursor.fetchone())[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
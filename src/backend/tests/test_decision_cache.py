@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.decision_cache import DecisionCache, decision_cache  # noqa: E402
+from agent.graph import NoteAgentGraph  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def test_keys_normalize_text_and_separate_context():
+    cache = DecisionCache(max_entries=8, ttl_seconds=60)
+    key = cache.key("intent", "  Keep   Going! ", "Shall I continue?", "agent", "m")
+    assert key == cache.key("intent", "keep going", "shall i  continue?", "agent", "m")
+    assert key != cache.key("intent", "keep going", "Done.", "agent", "m")
+    assert key != cache.key("intent", "keep going", "Shall I continue?", "ask", "m")
+    assert cache.key("intent", "", "", "agent", "m") is None
+    assert cache.key("intent", "x" * 1000, "", "agent", "m") is None
+
+
+def test_questions_never_share_a_key_with_the_imperative():
+    cache = DecisionCache(max_entries=8, ttl_seconds=60)
+    for kind in ("write_auth", "intent"):
+        assert cache.key(kind, "删除这条笔记？") != cache.key(kind, "删除这条笔记")
+        assert cache.key(kind, "delete it?") != cache.key(kind, "delete it!")
+        # Repeated or mixed trailing marks still fold together.
+        assert cache.key(kind, "删除这条笔记？？") == cache.key(kind, "删除这条笔记?")
+        assert cache.key(kind, "delete it?!") == cache.key(kind, "delete it ?")
+        assert cache.key(kind, "删除这条笔记。") == cache.key(kind, "删除这条笔记")
+
+
+def test_lru_bound_ttl_and_hit_rates():
+    cache = DecisionCache(max_entries=2, ttl_seconds=60)
+    a, b, c = (cache.key("write_auth", t) for t in ("a", "b", "c"))
+    cache.put(a, True)
+    cache.put(b, False)
+    assert cache.get(a) is True
+    cache.put(c, True)  # evicts b (least recently used)
+    assert cache.get(b) is None
+    assert cache.get(c) is True
+
+    cache.ttl_seconds = -1
+    assert cache.get(a) is None
+    stats = cache.stats()["kinds"]["write_auth"]
+    assert stats == {"hits": 2, "misses": 2, "expired": 1, "hit_rate": 0.5}
+
+
+class _CountingLLM:
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, config=None):
+        self.calls += 1
+        prompt = messages[-1].content
+        return AIMessage(content="ALLOW_WRITE" if "write-authorization" in prompt else "TASK")
+
+
+def test_repeated_follow_up_skips_both_classifier_calls(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", "off")
+    decision_cache.clear()
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    graph.llm = _CountingLLM()
+
+    def turn(prev_ai: str):
+        state = {"messages": [AIMessage(content=prev_ai), HumanMessage(content="继续")], "agent_mode": "agent"}
+        return asyncio.run(graph._router_node(state))
+
+    first = turn("要我继续整理下一节吗？")
+    assert graph.llm.calls == 2
+    second = turn("要我继续整理下一节吗？")
+    assert graph.llm.calls == 2
+    assert (second["intent"], second["write_authorized"]) == (first["intent"], first["write_authorized"])
+
+    # Different preceding AI message: intent is re-classified, write verdict is shared.
+    turn("已完成。")
+    assert graph.llm.calls == 3
@@ -1,13 +1,17 @@
-﻿from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+﻿import asyncio
 
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agent.decision_cache import decision_cache
 from agent.graph import NoteAgentGraph
+from core.config import settings
 
 
 class _FakeLLM:
     def __init__(self):
         self.last_messages = None
 
-    def invoke(self, messages):
+    async def ainvoke(self, messages, config=None):
         self.last_messages = messages
         return AIMessage(content="ok")
 
@@ -29,7 +33,7 @@ def test_fast_chat_injects_ask_mode_guardrails():
         "agent_mode": "ask",
     }
 
-    result = graph._fast_chat_node(state)
+    result = asyncio.run(graph._fast_chat_node(state))
 
     assert result["messages"][0].content == "ok"
     sys_msgs = _system_contents(graph.llm.last_messages)
@@ -45,7 +49,7 @@ def test_fast_chat_injects_agent_mode_capability_context():
         "agent_mode": "agent",
     }
 
-    result = graph._fast_chat_node(state)
+    result = asyncio.run(graph._fast_chat_node(state))
 
     assert result["messages"][0].content == "ok"
     sys_msgs = _system_contents(graph.llm.last_messages)
@@ -65,6 +69,55 @@ def test_router_prefers_chat_for_image_input_without_write_intent():
         "use_knowledge": False,
     }
 
-    result = graph._router_node(state)
+    result = asyncio.run(graph._router_node(state))
 
     assert result["intent"] == "CHAT"
+
+
+class _SlowLabelLLM:
+    """Answers the router with TASK and the write classifier with ALLOW_WRITE after a delay."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, messages, config=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        prompt = messages[-1].content
+        return AIMessage(content="ALLOW_WRITE" if "write-authorization" in prompt else "TASK")
+
+
+def test_router_prepass_classifies_intent_and_write_authorization_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", "off")
+    decision_cache.clear()
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    graph.llm = _SlowLabelLLM()
+    state = {"messages": [HumanMessage(content="把这篇笔记改名为周报")], "agent_mode": "agent"}
+
+    result = asyncio.run(graph._router_node(state))
+
+    assert result["intent"] == "TASK"
+    assert result["write_authorized"] is True
+    assert result["prepass_ms"] is not None
+    assert graph.llm.calls == 2
+    assert graph.llm.max_in_flight == 2
+
+
+def test_router_prepass_skips_write_classifier_in_ask_mode(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", "off")
+    decision_cache.clear()
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    graph.llm = _SlowLabelLLM(delay=0)
+    state = {"messages": [HumanMessage(content="把这篇笔记改名为周报")], "agent_mode": "ask"}
+
+    result = asyncio.run(graph._router_node(state))
+
+    assert result["intent"] == "TASK"
+    assert result["write_authorized"] is False
+    assert graph.llm.calls == 1
@@ -1,10 +1,16 @@
+import asyncio
+
 from agent.graph import NoteAgentGraph
 
 
+async def _deny_write(history):
+    return False
+
+
 def _graph_stub() -> NoteAgentGraph:
     graph = NoteAgentGraph.__new__(NoteAgentGraph)
     graph._get_last_user_text = lambda history: "整理当前笔记格式"
-    graph._classify_write_authorization = lambda history: False
+    graph._classify_write_authorization = _deny_write
     return graph
 
 
@@ -17,12 +23,12 @@ def test_manual_review_mode_does_not_preemptively_deny_write():
         "messages": [],
     }
 
-    decision = graph._evaluate_tool_policy(
+    decision = asyncio.run(graph._evaluate_tool_policy(
         state=state,
         tool_name="update_note",
         tool_args={"note_id": "1", "instruction": "整理"},
         history=[],
-    )
+    ))
 
     assert decision["action"] == "allow"
     assert decision["code"] == "manual_review_required"
@@ -37,12 +43,12 @@ def test_auto_accept_mode_still_denies_without_explicit_write_auth():
         "messages": [],
     }
 
-    decision = graph._evaluate_tool_policy(
+    decision = asyncio.run(graph._evaluate_tool_policy(
         state=state,
         tool_name="update_note",
         tool_args={"note_id": "1", "instruction": "整理"},
         history=[],
-    )
+    ))
 
     assert decision["action"] == "deny"
     assert decision["code"] == "semantic_deny_write"
@@ -68,12 +74,12 @@ def test_create_note_denied_for_category_feedback_without_explicit_create():
         "messages": [],
     }
 
-    decision = graph._evaluate_tool_policy(
+    decision = asyncio.run(graph._evaluate_tool_policy(
         state=state,
         tool_name="create_note",
         tool_args={"title": "宇树科技的发展史", "content": "x"},
         history=[],
-    )
+    ))
 
     assert decision["action"] == "deny"
     assert decision["code"] == "duplicate_create_blocked_for_category_feedback"
@@ -89,12 +95,12 @@ def test_create_note_allowed_when_user_explicitly_requests_new_creation():
         "messages": [],
     }
 
-    decision = graph._evaluate_tool_policy(
+    decision = asyncio.run(graph._evaluate_tool_policy(
         state=state,
         tool_name="create_note",
         tool_args={"title": "宇树科技的发展史", "content": "x"},
         history=[],
-    )
+    ))
 
     assert decision["action"] == "allow"
     assert decision["code"] == "semantic_allow_write"
@@ -0,0 +1,125 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.history_budget import compact_history, estimate_tokens, message_tokens  # noqa: E402
+
+
+def _session(turns: int, note_chars: int = 4000):
+    history = []
+    for t in range(turns):
+        call_id = f"call_{t}"
+        history += [
+            HumanMessage(content=f"读取第{t}篇笔记并总结", id=f"h{t}"),
+            AIMessage(content="", tool_calls=[{"id": call_id, "name": "read_note_content", "args": {"note_id": f"n{t}"}}], id=f"a{t}"),
+            ToolMessage(content="笔记正文" * (note_chars // 4), tool_call_id=call_id, name="read_note_content", id=f"t{t}"),
+            AIMessage(content=f"第{t}篇笔记讲的是网络协议。", id=f"r{t}"),
+        ]
+    return history
+
+
+class _Summarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, previous, messages):
+        self.calls.append((previous, [m.id for m in messages]))
+        return (previous or "") + f"\n- summarized {len(messages)} messages"
+
+
+def _compact(history, summary=None, until=None, summarizer=None, budget=3000):
+    return asyncio.run(compact_history(
+        history, summary, until,
+        budget_tokens=budget, recent_turns=2, summary_max_tokens=300,
+        summarize=summarizer or _Summarizer(),
+    ))
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("笔记" * 10) == 20
+
+
+def test_short_sessions_are_sent_unchanged():
+    history = _session(2, note_chars=400)
+    result = _compact(history)
+    assert result.messages == history
+    assert result.updates == {}
+
+
+def test_old_tool_outputs_are_stubbed_before_summarizing():
+    history = _session(3, note_chars=1200)
+    result = _compact(history, budget=4000)
+
+    assert result.updates == {}
+    old_tool = result.messages[2]
+    assert old_tool.content.startswith("[read_note_content output elided")
+    # The last two turns stay verbatim.
+    assert result.messages[-8:] == history[-8:]
+
+
+def test_long_sessions_roll_into_summary_and_stay_bounded():
+    summarizer = _Summarizer()
+    history = _session(30, note_chars=1000)
+    result = _compact(history, summarizer=summarizer)
+
+    assert result.tokens <= 3000
+    assert isinstance(result.messages[0], SystemMessage)
+    assert "summarized" in result.messages[0].content
+    anchor = result.updates["history_summary_until_id"]
+    assert anchor.startswith("h")
+    # Tool calls are never separated from their results.
+    kept_ids = [m.id for m in result.messages[1:]]
+    assert kept_ids[0] == anchor
+    assert len(summarizer.calls) == 1
+
+    # Next turn: the stored summary is reused and nothing is re-summarized.
+    history += [HumanMessage(content="谢谢", id="h_next")]
+    follow_up = _compact(history, result.updates["history_summary"], anchor, summarizer)
+    assert follow_up.updates == {}
+    assert len(summarizer.calls) == 1
+    assert follow_up.tokens <= 3000
+
+
+def test_missing_anchor_resets_summary():
+    history = _session(2, note_chars=400)
+    result = _compact(history, summary="old", until="gone")
+    assert result.updates == {"history_summary": None, "history_summary_until_id": None}
+    assert result.messages == history
+
+
+def test_failed_summarizer_falls_back_to_extractive_summary():
+    async def broken(previous, messages):
+        raise RuntimeError("provider down")
+
+    result = _compact(_session(30), summarizer=broken)
+    # Newest rolled turns survive the clamp.
+    assert "- User: 读取第28篇笔记并总结" in result.updates["history_summary"]
+    assert result.tokens <= 3000
+
+
+def test_single_huge_turn_is_trimmed_to_budget():
+    history = _session(1, note_chars=2000) + [
+        HumanMessage(content="比较笔记 A 和笔记 B", id="h0"),
+        AIMessage(content="", tool_calls=[{"id": "c1", "name": "read_note_content", "args": {"note_id": "a"}}], id="a1"),
+        ToolMessage(content="A" * 40000, tool_call_id="c1", name="read_note_content", id="t1"),
+        AIMessage(content="", tool_calls=[{"id": "c2", "name": "read_note_content", "args": {"note_id": "b"}}], id="a2"),
+        ToolMessage(content="B" * 20000, tool_call_id="c2", name="read_note_content", id="t2"),
+    ]
+    result = _compact(history)
+
+    assert result.tokens <= 3000
+    # The earlier turn is rolled up ...
+    assert result.updates["history_summary_until_id"] == "h0"
+    # ... but both results of the turn in progress keep a proportional share of their content.
+    note_a, note_b = result.messages[-3].content, result.messages[-1].content
+    assert "truncated" in note_a and "truncated" in note_b
+    assert note_a.count("A") > 1000 and note_b.count("B") > 1000
+    assert note_a.count("A") > note_b.count("B")
+    assert sum(message_tokens(m) for m in result.messages) == result.tokens
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.html_text import (  # noqa: E402
+    html_to_editable_text,
+    html_to_plain_text,
+    normalize_for_similarity,
+)
+
+
+def test_plain_text_decodes_all_entities_once():
+    html = "<p>Caf&eacute; &mdash; 5 &lt; 6 &amp;&amp; x&nbsp;y &#8212; &#x4e2d; &amp;lt;b&amp;gt;</p>"
+    assert html_to_plain_text(html) == "Café — 5 < 6 && x y — 中 &lt;b&gt;"
+
+
+def test_plain_text_matches_electron_text_content():
+    # Electron stores element.textContent: blocks join without a separator.
+    html = "<h1>Title</h1><p>First</p>\n<ul><li>one</li><li>two</li></ul>line<br/>break"
+    assert html_to_plain_text(html) == "TitleFirst onetwolinebreak"
+    assert html_to_plain_text("<p>in<strong>line</strong>   markup</p>") == "inline markup"
+
+
+def test_editable_text_keeps_one_line_per_block():
+    html = "<h2>Plan</h2><p>Ship   it</p><p></p><p></p><ul><li>a</li><li>b</li></ul><!-- note -->"
+    assert html_to_editable_text(html) == "Plan\nShip it\n\na\nb"
+
+
+def test_inputs_without_markup_pass_through():
+    assert html_to_plain_text("  plain\ttext \n here ") == "plain text here"
+    assert html_to_editable_text("") == ""
+
+
+def test_similarity_normalization_matches_markdown_and_html():
+    markdown = "# Network Notes\n\n- **NAT** mapping\n- [IPv6](x) routing"
+    html = "<h1>Network Notes</h1><ul><li><b>NAT</b> mapping</li><li><a href='x'>IPv6</a> routing</li></ul>"
+    assert normalize_for_similarity(markdown) == "network notes nat mapping ipv6 x routing"
+    assert normalize_for_similarity(html) == "network notes nat mapping ipv6 routing"
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import agent.graph as graph_module  # noqa: E402
+from agent.decision_cache import decision_cache  # noqa: E402
+from agent.graph import NoteAgentGraph  # noqa: E402
+from agent.intent_classifier import (  # noqa: E402
+    IntentClassifier,
+    LinearIntentModel,
+    rule_intent,
+)
+from core.config import settings  # noqa: E402
+
+CHAT_QUERIES = ["讲个笑话", "今天天气怎么样", "tell me a joke", "how are you today", "你喜欢什么颜色"]
+TASK_QUERIES = ["帮我找一下关于网络的笔记", "我的笔记里有哪些关于NAT的内容", "show my notes about python",
+                "把工作分类里的内容列一下", "notes about meeting last week"]
+
+
+def test_rules_cover_greetings_and_explicit_note_commands():
+    assert rule_intent("Hello!") == "CHAT"
+    assert rule_intent("谢谢你！") == "CHAT"
+    assert rule_intent("delete this note") == "TASK"
+    assert rule_intent("总结这篇笔记") == "TASK"
+    # Context-dependent replies are left to the LLM.
+    assert rule_intent("好的") is None
+    assert rule_intent("no, that's wrong") is None
+
+
+def test_linear_model_learns_logged_decisions_and_answers_fast():
+    examples = [(q, "CHAT") for q in CHAT_QUERIES] * 10 + [(q, "TASK") for q in TASK_QUERIES] * 10
+    model = LinearIntentModel.train(examples)
+
+    assert model.decide("讲个笑话吧").intent == "CHAT"
+    assert model.decide("关于python的笔记").intent == "TASK"
+    roundtrip = LinearIntentModel.from_json(json.loads(json.dumps(model.to_json())))
+    assert roundtrip.task_probability("show my notes") == model.task_probability("show my notes")
+
+    start = time.perf_counter()
+    for _ in range(200):
+        model.decide("我的笔记里有哪些关于NAT的内容")
+    assert (time.perf_counter() - start) / 200 < 0.001
+
+
+def test_shadow_mode_logs_llm_decisions_and_tracks_agreement(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", "shadow")
+    monkeypatch.setattr(settings, "INTENT_ROUTING_LOG", True)
+    with tempfile.TemporaryDirectory() as tmp:
+        classifier = IntentClassifier(data_dir=Path(tmp))
+        classifier.record_llm_decision("hello", "CHAT", classifier.classify("hello"))
+        classifier.record_llm_decision("delete this note", "CHAT", classifier.classify("delete this note"))
+        classifier.record_llm_decision("讲个笑话", "CHAT", classifier.classify("讲个笑话"))
+
+        stats = classifier.stats()
+        assert stats["shadow_compared"] == 2
+        assert stats["agreement_rate"] == 0.5
+        assert stats["rule_agreement_rate"] == 0.5
+        assert classifier.load_training_examples() == [
+            ("hello", "CHAT"), ("delete this note", "CHAT"), ("讲个笑话", "CHAT"),
+        ]
+
+        # Too few logged decisions: nothing is trained yet.
+        assert classifier.retrain() is None
+        for q in CHAT_QUERIES * 6:
+            classifier.record_llm_decision(q, "CHAT", None)
+        for q in TASK_QUERIES * 6:
+            classifier.record_llm_decision(q, "TASK", None)
+        summary = classifier.retrain()
+        assert summary["examples"] == 63
+        assert (Path(tmp) / "intent_model.json").exists()
+        assert classifier.retrain() is None
+
+
+class _CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, config=None):
+        self.calls += 1
+        prompt = messages[-1].content
+        return AIMessage(content="ALLOW_WRITE" if "write-authorization" in prompt else "TASK")
+
+
+def _router_graph(monkeypatch, mode, tmp):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", mode)
+    monkeypatch.setattr(graph_module, "get_intent_classifier", lambda: classifier)
+    classifier = IntentClassifier(data_dir=Path(tmp))
+    decision_cache.clear()
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    graph.llm = _CountingLLM()
+    return graph, classifier
+
+
+def test_router_fast_path_on_skips_llm_for_confident_chat(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        graph, classifier = _router_graph(monkeypatch, "on", tmp)
+        result = asyncio.run(graph._router_node({"messages": [HumanMessage(content="谢谢！")]}))
+
+        assert result["intent"] == "CHAT"
+        assert graph.llm.calls == 0
+        assert classifier.stats()["fast_path_used"] == 1
+
+
+def test_router_fast_path_on_still_classifies_write_authorization_for_task(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        graph, _ = _router_graph(monkeypatch, "on", tmp)
+        result = asyncio.run(graph._router_node({"messages": [HumanMessage(content="delete this note")]}))
+
+        assert result["intent"] == "TASK"
+        assert result["write_authorized"] is True
+        assert graph.llm.calls == 1
+
+
+def test_router_shadow_mode_keeps_llm_routing(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        graph, classifier = _router_graph(monkeypatch, "shadow", tmp)
+        result = asyncio.run(graph._router_node({"messages": [HumanMessage(content="谢谢！")]}))
+
+        # LLM says TASK here; shadow mode must not override it.
+        assert result["intent"] == "TASK"
+        assert graph.llm.calls == 2
+        assert classifier.stats()["agreement_rate"] == 0.0
+
+
+def test_queries_are_only_logged_when_opted_in(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_FAST_PATH_MODE", "shadow")
+    monkeypatch.setattr(settings, "INTENT_ROUTING_LOG", False)
+    with tempfile.TemporaryDirectory() as tmp:
+        classifier = IntentClassifier(data_dir=Path(tmp))
+        classifier.record_llm_decision("hello", "CHAT", classifier.classify("hello"))
+
+        assert classifier.stats()["shadow_compared"] == 1
+        assert not classifier.log_path.exists()
+
+
+class _FailingRouterLLM(_CountingLLM):
+    async def ainvoke(self, messages, config=None):
+        if "Intent Router" in messages[-1].content:
+            self.calls += 1
+            raise RuntimeError("provider unavailable")
+        return await super().ainvoke(messages, config)
+
+
+def test_router_failure_defaults_to_task_without_recording_a_label(monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_ROUTING_LOG", True)
+    with tempfile.TemporaryDirectory() as tmp:
+        graph, classifier = _router_graph(monkeypatch, "shadow", tmp)
+        graph.llm = _FailingRouterLLM()
+        result = asyncio.run(graph._router_node({"messages": [HumanMessage(content="谢谢！")]}))
+
+        assert result["intent"] == "TASK"
+        assert classifier.stats()["shadow_compared"] == 0
+        assert classifier.load_training_examples() == []
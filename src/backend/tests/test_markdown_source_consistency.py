@@ -8,6 +8,7 @@ import aiosqlite
 # Ensure src/backend is importable when running from repo root
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from core.database import close_all_pools  # noqa: E402
 from services.note_service import NoteService  # noqa: E402
 
 
@@ -63,6 +64,7 @@ class MarkdownSourceConsistencyTests(unittest.IsolatedAsyncioTestCase):
             await db.commit()
 
     async def asyncTearDown(self):
+        await close_all_pools()
         self.tmpdir.cleanup()
 
     async def test_content_update_without_markdown_source_clears_stale_source(self):
@@ -82,6 +84,84 @@ class MarkdownSourceConsistencyTests(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(updated)
         self.assertEqual(updated["markdownSource"], "# Title\n\nBody")
 
+    async def test_update_returns_post_image_without_rereading(self):
+        async def _no_reads(_note_id):
+            raise AssertionError("update_note must not re-read the note")
+
+        self.service.get_note = _no_reads
+        updated = await self.service.update_note(note_id="n1", title="Renamed")
+
+        self.assertEqual(updated["title"], "Renamed")
+        self.assertEqual(updated["content"], "<h1>Old</h1><p>Legacy markdown content</p>")
+        self.assertGreater(updated["updatedAt"], 1)
+        self.assertIsNone(await self.service.update_note(note_id="missing", title="x"))
+
+    async def _insert_diverged_note(self, note_id: str, updated_at: int):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                INSERT INTO notes (
+                    id, title, content, plainText, markdownSource, categoryId,
+                    isPinned, isDeleted, deletedAt, createdAt, updatedAt
+                ) VALUES (?, ?, ?, ?, ?, NULL, 0, 0, NULL, ?, ?)
+                """,
+                (
+                    note_id,
+                    "Plan",
+                    "<p>Release planning roadmap with sprint budget and risk tracking details.</p>",
+                    "Release planning roadmap with sprint budget and risk tracking details.",
+                    "# Shopping List\n\n- apple\n- banana\n- orange",
+                    updated_at,
+                    updated_at,
+                ),
+            )
+            await db.commit()
+
+    async def test_staleness_is_computed_once_per_version(self):
+        await self._insert_diverged_note("n2", 5)
+        calls = []
+        original = self.service._is_markdown_source_stale
+
+        def _counting(markdown_source, plain_text):
+            calls.append(1)
+            return original(markdown_source, plain_text)
+
+        self.service._is_markdown_source_stale = _counting
+
+        first = await self.service.get_note("n2")
+        second = await self.service.get_note("n2")
+        self.assertIsNone(first["markdownSource"])
+        self.assertIsNone(second["markdownSource"])
+        self.assertEqual(len(calls), 1)
+
+        # Metadata-only writes carry the verdict over to the new version.
+        renamed = await self.service.update_note(note_id="n2", title="Renamed")
+        self.assertIsNone(renamed["markdownSource"])
+        await self.service.get_note("n2")
+        self.assertEqual(len(calls), 1)
+
+        # A content change re-evaluates exactly once, at write time.
+        await self.service.update_note(
+            note_id="n2",
+            content="<h1>Shopping List</h1><ul><li>apple</li><li>banana</li><li>orange</li></ul>",
+            markdown_source="# Shopping List\n\n- apple\n- banana\n- orange",
+        )
+        refreshed = await self.service.get_note("n2")
+        self.assertEqual(refreshed["markdownSource"], "# Shopping List\n\n- apple\n- banana\n- orange")
+        self.assertEqual(len(calls), 2)
+
+    async def test_backfill_persists_verdicts_for_existing_notes(self):
+        await self._insert_diverged_note("n2", 5)
+        self.assertEqual(await self.service.backfill_markdown_staleness(batch_size=1), 2)
+        self.assertEqual(await self.service.backfill_markdown_staleness(), 0)
+
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "SELECT noteId, updatedAt, isStale FROM note_markdown_staleness ORDER BY noteId"
+            )
+            rows = await cursor.fetchall()
+        self.assertEqual(rows, [("n1", 1, 0), ("n2", 5, 1)])
+
     async def test_stale_detection_rejects_diverged_markdown_source(self):
         stale = self.service._is_markdown_source_stale(
             markdown_source="# Shopping List\n\n- apple\n- banana\n- orange",
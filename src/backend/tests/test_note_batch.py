@@ -0,0 +1,106 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools, get_pool  # noqa: E402
+from services.note_service import NoteService  # noqa: E402
+
+
+class _RecordingRag:
+    def __init__(self):
+        self.jobs = []
+
+    async def apply_note_batch(self, upserts, removals, moves):
+        self.jobs.append((upserts, removals, moves))
+        return len(upserts)
+
+
+class NoteBatchTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "notes.db"
+        self.service = NoteService()
+        self.service.db_path = str(self.db_path)
+        self.rag = _RecordingRag()
+        self.service.rag_service = self.rag
+        self.tasks = []
+        self.service._run_vector_task = lambda coro, label: self.tasks.append((coro, label))
+
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                CREATE TABLE notes (
+                    id TEXT PRIMARY KEY, title TEXT, content TEXT, plainText TEXT,
+                    markdownSource TEXT, categoryId TEXT, isPinned INTEGER,
+                    isDeleted INTEGER, deletedAt INTEGER, createdAt INTEGER, updatedAt INTEGER
+                )
+                """
+            )
+            await db.executemany(
+                "INSERT INTO notes VALUES (?, ?, ?, ?, NULL, NULL, 0, 0, NULL, 1, 1)",
+                [("a", "A", "<p>a</p>", "a"), ("b", "B", "<p>b</p>", "b"), ("c", "C", "<p>c</p>", "c")],
+            )
+            await db.commit()
+
+    async def asyncTearDown(self):
+        for coro, _ in self.tasks:
+            coro.close()
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def test_mixed_operations_commit_once_and_schedule_one_vector_job(self):
+        await self.service._ensure_staleness_table()
+        pool = get_pool(str(self.db_path))
+        writes_before = pool.counters["writes"]
+
+        results = await self.service.apply_batch([
+            {"op": "create", "title": "New", "content": "<p>fresh</p>"},
+            {"op": "update", "id": "a", "content": "<p>edited</p>"},
+            {"op": "delete", "id": "b"},
+            {"op": "categorize", "id": "c", "category_id": "cat1"},
+            {"op": "update", "id": "missing", "title": "x"},
+        ])
+
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["created", "updated", "deleted", "categorized", "not_found"],
+        )
+        self.assertEqual(results[1]["note"]["plainText"], "edited")
+        self.assertEqual(pool.counters["writes"] - writes_before, 1)
+
+        self.assertEqual(len(self.tasks), 1)
+        await self.tasks.pop()[0]
+        upserts, removals, moves = self.rag.jobs[0]
+        self.assertEqual(sorted(u["id"] for u in upserts), sorted([results[0]["id"], "a"]))
+        self.assertEqual(removals, ["b"])
+        self.assertEqual(moves, {"c": "cat1"})
+
+        self.assertEqual((await self.service.get_note("a"))["plainText"], "edited")
+        self.assertEqual((await self.service.get_note("b"))["isDeleted"], 1)
+        self.assertEqual((await self.service.get_note("c"))["categoryId"], "cat1")
+
+    async def test_failure_rolls_back_the_whole_batch(self):
+        with self.assertRaises(Exception):
+            await self.service.apply_batch([
+                {"op": "update", "id": "a", "title": "Renamed"},
+                {"op": "create", "id": "b", "title": "Duplicate id"},
+            ])
+
+        self.assertEqual((await self.service.get_note("a"))["title"], "A")
+        self.assertEqual(self.tasks, [])
+
+    async def test_invalid_operations_are_rejected_before_writing(self):
+        with self.assertRaises(ValueError):
+            await self.service.apply_batch([{"op": "update", "title": "no id"}])
+        with self.assertRaises(ValueError):
+            await self.service.apply_batch([{"op": "merge", "id": "a"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
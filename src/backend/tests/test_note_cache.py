@@ -0,0 +1,109 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools  # noqa: E402
+from services.note_cache import NoteCache, estimate_note_bytes  # noqa: E402
+from services.note_service import NoteService, note_cache  # noqa: E402
+
+
+def _note(note_id, updated_at=1, body="x"):
+    return {"id": note_id, "title": note_id, "content": body, "updatedAt": updated_at, "isDeleted": 0}
+
+
+def test_cache_is_bounded_by_bytes_and_evicts_lru():
+    size = estimate_note_bytes(_note("a", body="x" * 100))
+    cache = NoteCache(max_bytes=size * 2)
+    cache.put("db", "a", _note("a", body="x" * 100))
+    cache.put("db", "b", _note("b", body="x" * 100))
+    assert cache.get("db", "a", 1, 0) is not None  # "a" becomes most recent
+    cache.put("db", "c", _note("c", body="x" * 100))
+
+    assert cache.get("db", "b", 1, 0) is None
+    assert cache.get("db", "a", 1, 0) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+
+def test_cache_rejects_outdated_versions_and_returns_copies():
+    cache = NoteCache(max_bytes=1 << 20)
+    cache.put("db", "a", _note("a", updated_at=5))
+
+    hit = cache.get("db", "a", 5, 0)
+    hit["title"] = "mutated"
+    assert cache.get("db", "a", 5, 0)["title"] == "a"
+
+    assert cache.get("db", "a", 6, 0) is None
+    assert cache.get("db", "a", 5, 0) is None  # stale entry was dropped
+    assert cache.stats()["stale"] == 1
+
+
+class NoteServiceCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "notes.db"
+        self.service = NoteService()
+        self.service.db_path = str(self.db_path)
+        self.service._run_vector_task = lambda coro, _label: coro.close()
+        note_cache.clear()
+
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                CREATE TABLE notes (
+                    id TEXT PRIMARY KEY, title TEXT, content TEXT, plainText TEXT,
+                    markdownSource TEXT, categoryId TEXT, isPinned INTEGER,
+                    isDeleted INTEGER, deletedAt INTEGER, createdAt INTEGER, updatedAt INTEGER
+                )
+                """
+            )
+            await db.execute(
+                "INSERT INTO notes VALUES ('n1', 'Title', '<p>Body</p>', 'Body', NULL, NULL, 0, 0, NULL, 1, 1)"
+            )
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        note_cache.clear()
+        self.tmpdir.cleanup()
+
+    async def test_repeated_reads_hit_the_cache(self):
+        before = note_cache.stats()
+        first = await self.service.get_note("n1")
+        second = await self.service.get_note("n1")
+        after = note_cache.stats()
+
+        self.assertEqual(first, second)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    async def test_external_write_is_detected_by_updated_at_probe(self):
+        await self.service.get_note("n1")
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("UPDATE notes SET title = 'Edited in app', updatedAt = 2 WHERE id = 'n1'")
+            await db.commit()
+
+        note = await self.service.get_note("n1")
+        self.assertEqual(note["title"], "Edited in app")
+
+    async def test_backend_writes_refresh_or_invalidate_entries(self):
+        await self.service.get_note("n1")
+        updated = await self.service.update_note(note_id="n1", title="Renamed")
+        hits = note_cache.stats()["hits"]
+        self.assertEqual((await self.service.get_note("n1"))["title"], "Renamed")
+        self.assertEqual(note_cache.stats()["hits"], hits + 1)
+        self.assertEqual(updated["title"], "Renamed")
+
+        self.assertTrue(await self.service.delete_note("n1"))
+        self.assertEqual((await self.service.get_note("n1"))["isDeleted"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
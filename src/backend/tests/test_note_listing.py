@@ -0,0 +1,101 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools  # noqa: E402
+from services.note_service import NoteService, decode_list_cursor, encode_list_cursor  # noqa: E402
+
+
+class _RecordingRag:
+    def __init__(self):
+        self.batches = []
+
+    async def reindex_from_db(self, notes):
+        async for batch in notes:
+            self.batches.append(batch)
+        return sum(len(b) for b in self.batches)
+
+
+class NoteListingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "notes.db"
+        self.service = NoteService()
+        self.service.db_path = str(self.db_path)
+
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                CREATE TABLE notes (
+                    id TEXT PRIMARY KEY, title TEXT, content TEXT, plainText TEXT,
+                    markdownSource TEXT, categoryId TEXT, isPinned INTEGER,
+                    isDeleted INTEGER, deletedAt INTEGER, createdAt INTEGER, updatedAt INTEGER
+                )
+                """
+            )
+            # Several notes share an updatedAt so the id tie-breaker matters.
+            rows = [(f"n{i}", f"Note {i}", f"<p>body {i}</p>", f"body {i}", 100 + i // 3) for i in range(10)]
+            rows.append(("gone", "Deleted", "<p>x</p>", "x", 500))
+            await db.executemany(
+                "INSERT INTO notes VALUES (?, ?, ?, ?, NULL, NULL, 0, 0, NULL, 1, ?)",
+                rows,
+            )
+            await db.execute("UPDATE notes SET isDeleted = 1 WHERE id = 'gone'")
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def test_keyset_pages_cover_every_live_note_once_in_order(self):
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            page = await self.service.list_notes_page(limit=4, cursor=cursor)
+            seen.extend(n["id"] for n in page["notes"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        self.assertNotIn("gone", seen)
+        all_notes = await self.service.get_all_notes()
+        expected = sorted(all_notes, key=lambda n: (n["updatedAt"], n["id"]), reverse=True)
+        self.assertEqual(seen, [n["id"] for n in expected])
+
+    async def test_projection_returns_only_requested_columns(self):
+        page = await self.service.list_notes_page(limit=2, fields=["title"])
+        self.assertEqual(set(page["notes"][0].keys()), {"id", "updatedAt", "title"})
+
+        with self.assertRaises(ValueError):
+            await self.service.list_notes_page(fields=["title", "isDeleted; DROP TABLE notes"])
+        with self.assertRaises(ValueError):
+            await self.service.list_notes_page(cursor="not-a-cursor")
+
+    async def test_reindex_streams_batches_without_html(self):
+        rag = _RecordingRag()
+        self.service.rag_service = rag
+
+        count = await self.service.reindex_all()
+
+        self.assertEqual(count, 10)
+        self.assertTrue(all("content" not in note for batch in rag.batches for note in batch))
+        self.assertTrue(all("plainText" in note for batch in rag.batches for note in batch))
+
+
+def test_cursor_round_trip():
+    assert decode_list_cursor(encode_list_cursor(1700000000000, "a-b")) == (1700000000000, "a-b")
+
+
+if __name__ == "__main__":
+    unittest.main()
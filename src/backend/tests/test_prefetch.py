@@ -0,0 +1,133 @@
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.messages import HumanMessage
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.graph import NoteAgentGraph  # noqa: E402
+from agent.prefetch import TurnPrefetcher, note_key, search_key, tool_session, turn_prefetch  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def test_take_awaits_in_flight_prefetch_and_consumes_it_once():
+    async def scenario():
+        prefetcher = TurnPrefetcher(ttl_seconds=60)
+        gate = asyncio.Event()
+
+        async def load():
+            await gate.wait()
+            return {"id": "n1"}
+
+        assert prefetcher.start("s1", note_key("n1"), load)
+        assert not prefetcher.start("s1", note_key("n1"), load)  # already pending
+        waiter = asyncio.create_task(prefetcher.take("s1", note_key("n1")))
+        await asyncio.sleep(0)
+        gate.set()
+        assert await waiter == {"id": "n1"}
+        assert await prefetcher.take("s1", note_key("n1")) is None
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["kinds"]["note"] == {"started": 1, "hits": 1, "wasted": 0, "errors": 0, "hit_rate": 1.0}
+    assert stats["pending"] == 0
+
+
+def test_unused_prefetches_are_counted_as_wasted_on_next_turn():
+    async def scenario():
+        prefetcher = TurnPrefetcher(ttl_seconds=60)
+        prefetcher.start("s1", search_key("网络协议"), AsyncMock(return_value=[]))
+        prefetcher.start("s2", note_key("n2"), AsyncMock(return_value={"id": "n2"}))
+        await asyncio.sleep(0)
+        prefetcher.begin_turn("s1")
+        assert await prefetcher.take("s1", search_key("网络协议")) is None
+        # Other sessions keep their entries.
+        assert await prefetcher.take("s2", note_key("n2")) == {"id": "n2"}
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["kinds"]["search"]["wasted"] == 1
+    assert stats["kinds"]["note"]["hits"] == 1
+
+
+def test_failed_and_expired_prefetches_fall_back_to_none():
+    async def scenario():
+        prefetcher = TurnPrefetcher(ttl_seconds=60)
+        prefetcher.start("s1", note_key("bad"), AsyncMock(side_effect=RuntimeError("db locked")))
+        failed = await prefetcher.take("s1", note_key("bad"))
+
+        prefetcher.ttl_seconds = 0
+        prefetcher.start("s1", note_key("old"), AsyncMock(return_value={"id": "old"}))
+        await asyncio.sleep(0.01)
+        expired = await prefetcher.take("s1", note_key("old"))
+        return failed, expired, prefetcher.stats()
+
+    failed, expired, stats = asyncio.run(scenario())
+    assert failed is None and expired is None
+    assert stats["kinds"]["note"]["errors"] == 1
+    assert stats["kinds"]["note"]["wasted"] == 1
+
+
+def test_sessions_never_share_or_discard_each_others_prefetches():
+    async def scenario():
+        prefetcher = TurnPrefetcher(ttl_seconds=60)
+        assert prefetcher.start("s1", search_key("网络协议"), AsyncMock(return_value=["s1"]))
+        # Same query in another session is its own entry, not a duplicate.
+        assert prefetcher.start("s2", search_key("网络协议"), AsyncMock(return_value=["s2"]))
+        assert prefetcher.start("s2", note_key("n2"), AsyncMock(return_value={"id": "n2"}))
+        await asyncio.sleep(0)
+
+        assert await prefetcher.take("s3", search_key("网络协议")) is None
+        # A write in s1 drops only s1's searches.
+        prefetcher.discard("s1", kind="search")
+        assert await prefetcher.take("s1", search_key("网络协议")) is None
+        assert await prefetcher.take("s2", search_key("网络协议")) == ["s2"]
+        assert await prefetcher.take("s2", note_key("n2")) == {"id": "n2"}
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["kinds"]["search"] == {"started": 2, "hits": 1, "wasted": 1, "errors": 0, "hit_rate": 0.5}
+    assert stats["pending"] == 0
+
+
+def test_search_key_normalizes_whitespace_only():
+    assert search_key("  rust   async ") == search_key("rust async")
+    assert search_key("rust") != search_key("rust", rank_mode="recency")
+
+
+def test_router_prefetch_is_consumed_by_search_tool(monkeypatch):
+    from agent import tools
+
+    monkeypatch.setattr(settings, "SPECULATIVE_PREFETCH", True)
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    search = AsyncMock(return_value=[{"id": "n1", "title": "协议", "content": "TCP 三次握手"}])
+
+    async def scenario():
+        with patch("services.rag_service.RAGService.search", new=search), \
+             patch.object(tools.rag_service, "search", new=search):
+            graph._start_prefetch(
+                {"session_id": "s-prefetch", "use_knowledge": True},
+                [HumanMessage(content="TCP 握手")],
+            )
+            token = tool_session.set("s-prefetch")
+            try:
+                return await tools.search_knowledge.ainvoke({"query": "TCP 握手"})
+            finally:
+                tool_session.reset(token)
+
+    before = turn_prefetch.stats()["kinds"].get("search", {}).get("hits", 0)
+    text = asyncio.run(scenario())
+    assert "TCP" in text
+    assert search.await_count == 1
+    assert turn_prefetch.stats()["kinds"]["search"]["hits"] == before + 1
+
+
+def test_prefetch_is_skipped_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_PREFETCH", False)
+    graph = NoteAgentGraph.__new__(NoteAgentGraph)
+    before = turn_prefetch.stats()["pending"]
+    graph._start_prefetch({"session_id": "s-off", "context_note_id": "n1"}, [])
+    assert turn_prefetch.stats()["pending"] == before
@@ -1,13 +1,16 @@
+import sqlite3
 import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 import numpy as np
 
 # Ensure src/backend is importable when running from repo root
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from core.database import close_all_pools  # noqa: E402
 from services.rag_service import RAGService  # noqa: E402
 
 
@@ -18,6 +21,25 @@ def _fake_embedding_for_text(text: str) -> np.ndarray:
     return vec
 
 
+def _seed_notes_db(base: Path, notes):
+    """Minimal notes table (Electron schema subset) used to hydrate search hits."""
+    conn = sqlite3.connect(base / "notes.db")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS notes (id TEXT PRIMARY KEY, title TEXT, plainText TEXT, "
+        "categoryId TEXT, isDeleted INTEGER DEFAULT 0, updatedAt INTEGER)"
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO notes (id, title, plainText, categoryId, isDeleted, updatedAt) "
+        "VALUES (:id, :title, :plainText, :categoryId, :isDeleted, :updatedAt)",
+        [
+            {"categoryId": None, "isDeleted": 0, "updatedAt": 0, **note}
+            for note in notes
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
 class RagIncrementalIndexingTests(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         RAGService._instance = None
@@ -28,6 +50,8 @@ class RagIncrementalIndexingTests(unittest.IsolatedAsyncioTestCase):
         self.service.index_file = base / "index.faiss"
         self.service.meta_file = base / "metadata.json"
         self.service._create_empty_index()
+        self.data_dir_patch = patch("core.config.get_user_data_directory", return_value=base)
+        self.data_dir_patch.start()
 
         self.vectorize_call_count = 0
 
@@ -44,6 +68,8 @@ class RagIncrementalIndexingTests(unittest.IsolatedAsyncioTestCase):
         self.service._vectorize = fake_vectorize
 
     async def asyncTearDown(self):
+        await close_all_pools()
+        self.data_dir_patch.stop()
         self.tmpdir.cleanup()
         RAGService._instance = None
 
@@ -92,6 +118,145 @@ class RagIncrementalIndexingTests(unittest.IsolatedAsyncioTestCase):
         self.assertIn("n2", self.service.id_to_idx)
         self.assertIn("n3", self.service.id_to_idx)
 
+    async def test_upserts_keep_freshness_row_aligned(self):
+        await self.service.add_document("n1", "Note 1", "alpha", updated_at=1_000)
+        await self.service.add_document("n2", "Note 2", "beta", updated_at=2_000)
+        await self.service.add_document("n3", "Note 3", "gamma", updated_at=3_000)
+
+        await self.service.remove_document("n2")
+
+        self.assertEqual(self.service.freshness.tolist(), [1_000.0, 3_000.0])
+        self.assertEqual(
+            [m["updatedAt"] for m in self.service.metadata],
+            self.service.freshness.astype(int).tolist(),
+        )
+
+    async def test_recency_mode_promotes_recently_edited_note(self):
+        import time
+
+        now_ms = int(time.time() * 1000)
+        year_ms = 365 * 86_400_000
+        # Same text length -> identical embeddings -> identical cosine similarity.
+        await self.service.add_document("old", "Old", "topic A", updated_at=now_ms - year_ms)
+        await self.service.add_document("new", "New", "topic B", updated_at=now_ms)
+        self.service._last_integrity_check_ms = now_ms + year_ms  # skip DB reconcile
+        _seed_notes_db(self.service.save_path, [
+            {"id": "old", "title": "Old", "plainText": "topic A", "updatedAt": now_ms - year_ms},
+            {"id": "new", "title": "New", "plainText": "topic B", "updatedAt": now_ms},
+        ])
+
+        results = await self.service.search("topic", top_k=2, rank_mode="recency")
+
+        self.assertEqual([r["id"] for r in results], ["new", "old"])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertAlmostEqual(results[0]["similarity"], results[1]["similarity"], places=4)
+
+    async def test_metadata_holds_no_note_text_and_search_hydrates_from_db(self):
+        await self.service.add_document("n1", "Note 1", "alpha body")
+        await self.service.add_document("n2", "Note 2", "beta body!")
+        self.service._last_integrity_check_ms = 10 ** 15  # skip DB reconcile
+        _seed_notes_db(self.service.save_path, [
+            {"id": "n1", "title": "Note 1", "plainText": "alpha body"},
+            {"id": "n2", "title": "Note 2", "plainText": "beta body!", "isDeleted": 1},
+        ])
+
+        self.assertEqual(self.service.metadata[0]["span"], [0, len("alpha body")])
+        self.assertTrue(all(set(m) == {"id", "updatedAt", "span"} for m in self.service.metadata))
+
+        results = await self.service.search("alpha", top_k=2)
+
+        self.assertEqual([(r["id"], r["title"], r["content"]) for r in results], [("n1", "Note 1", "alpha body")])
+        self.assertIn("n1", self.service._snippet_cache)
+
+
+class RagShardedIndexTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        RAGService._instance = None
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.service = RAGService()
+        base = Path(self.tmpdir.name)
+        self.service.save_path = base
+        self.service.index_file = base / "index.faiss"
+        self.service.meta_file = base / "metadata.json"
+        self.service.sharded = True
+        self.service._create_empty_index()
+        self.data_dir_patch = patch("core.config.get_user_data_directory", return_value=base)
+        self.data_dir_patch.start()
+        self.service._last_integrity_check_ms = 10 ** 15  # skip DB reconcile
+
+        async def fake_vectorize(texts):
+            if not isinstance(texts, list):
+                texts = [texts]
+            arr = np.vstack([_fake_embedding_for_text(str(t)) for t in texts]).astype("float32")
+            arr[:, 1] = 1.0
+            import faiss
+            faiss.normalize_L2(arr)
+            return arr
+
+        self.service._vectorize = fake_vectorize
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.data_dir_patch.stop()
+        self.tmpdir.cleanup()
+        RAGService._instance = None
+
+    async def test_edit_in_one_category_only_rewrites_its_shard(self):
+        await self.service.add_document("a1", "A1", "alpha", category_id="cat-a")
+        await self.service.add_document("b1", "B1", "beta", category_id="cat-b")
+
+        shard_a = self.service.shards[self.service.doc_shard["a1"]]
+        shard_b = self.service.shards[self.service.doc_shard["b1"]]
+        self.assertIsNot(shard_a, shard_b)
+        mtime_b = shard_b.index_file.stat().st_mtime_ns
+
+        await self.service.update_document("a1", "A1", "alpha edited", category_id="cat-a")
+
+        self.assertEqual(shard_b.index_file.stat().st_mtime_ns, mtime_b)
+        self.assertEqual(shard_a.ntotal, 1)
+        self.assertEqual(self.service.ntotal, 2)
+
+    async def test_fan_out_search_merges_shards_and_category_filter_scopes(self):
+        await self.service.add_document("a1", "A1", "alpha", category_id="cat-a")
+        await self.service.add_document("b1", "B1", "beta beta", category_id="cat-b")
+        await self.service.add_document("u1", "U1", "gamma")
+        _seed_notes_db(self.service.save_path, [
+            {"id": "a1", "title": "A1", "plainText": "alpha", "categoryId": "cat-a"},
+            {"id": "b1", "title": "B1", "plainText": "beta beta", "categoryId": "cat-b"},
+            {"id": "u1", "title": "U1", "plainText": "gamma"},
+        ])
+
+        merged = await self.service.search("alpha", top_k=3)
+        self.assertEqual({r["id"] for r in merged}, {"a1", "b1", "u1"})
+        self.assertEqual([r["score"] for r in merged], sorted((r["score"] for r in merged), reverse=True))
+
+        scoped = await self.service.search("alpha", top_k=3, category_id="cat-b")
+        self.assertEqual([r["id"] for r in scoped], ["b1"])
+
+    async def test_category_change_moves_vector_without_reembedding(self):
+        await self.service.add_document("n1", "N1", "alpha", category_id="cat-a")
+        old_key = self.service.doc_shard["n1"]
+
+        async def fail_vectorize(texts):
+            raise AssertionError("moving shards must not re-embed")
+
+        self.service._vectorize = fail_vectorize
+        await self.service.move_document("n1", "cat-b")
+
+        self.assertNotEqual(self.service.doc_shard["n1"], old_key)
+        self.assertNotIn(old_key, self.service.shards)  # emptied shard is dropped
+        self.assertEqual(self.service.ntotal, 1)
+
+
+class RecencyDecayTests(unittest.TestCase):
+    def test_decay_halves_after_one_half_life(self):
+        from services.rag_service import recency_decay
+
+        day_ms = 86_400_000
+        decay = recency_decay(np.array([10 * day_ms, 0.0]), 10 * day_ms, half_life_days=10)
+        self.assertAlmostEqual(decay[0], 1.0)
+        self.assertAlmostEqual(decay[1], 0.5)
+
 
 if __name__ == "__main__":
     unittest.main()
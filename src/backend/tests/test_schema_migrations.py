@@ -0,0 +1,102 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiosqlite
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.database import close_all_pools  # noqa: E402
+from services.note_service import NoteService  # noqa: E402
+from services.schema_migrations import (  # noqa: E402
+    MIGRATIONS,
+    applied_migrations,
+    explain_hot_queries,
+    run_migrations,
+)
+
+NOTES_DDL = """
+CREATE TABLE notes (
+    id TEXT PRIMARY KEY, title TEXT NOT NULL, content TEXT, plainText TEXT,
+    markdownSource TEXT, categoryId TEXT, isPinned INTEGER NOT NULL DEFAULT 0,
+    isDeleted INTEGER NOT NULL DEFAULT 0, deletedAt INTEGER, createdAt INTEGER NOT NULL,
+    updatedAt INTEGER NOT NULL, "order" INTEGER NOT NULL DEFAULT 0
+)
+"""
+CATEGORIES_DDL = 'CREATE TABLE categories (id TEXT PRIMARY KEY, name TEXT, color TEXT, "order" INTEGER)'
+
+
+class SchemaMigrationTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "notes.db")
+
+    async def asyncTearDown(self):
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def _exec(self, *statements):
+        async with aiosqlite.connect(self.db_path) as db:
+            for statement in statements:
+                await db.execute(statement)
+            await db.commit()
+
+    async def test_migrations_wait_for_app_schema_then_apply_once(self):
+        await self._exec("SELECT 1")
+        first = await run_migrations(self.db_path)
+        self.assertEqual(len(first["skipped"]), len(MIGRATIONS))
+        self.assertEqual(await applied_migrations(self.db_path), [])
+
+        await self._exec(NOTES_DDL, CATEGORIES_DDL)
+        second = await run_migrations(self.db_path)
+        self.assertEqual(len(second["applied"]), len(MIGRATIONS))
+        third = await run_migrations(self.db_path)
+        self.assertEqual(len(third["ok"]), len(MIGRATIONS))
+        self.assertEqual(
+            [m["version"] for m in await applied_migrations(self.db_path)],
+            [m.version for m in MIGRATIONS],
+        )
+
+    async def test_missing_objects_are_recreated(self):
+        await self._exec(NOTES_DDL, CATEGORIES_DDL)
+        await run_migrations(self.db_path)
+        await self._exec("DROP INDEX idx_notes_isDeleted_updatedAt_id")
+
+        outcome = await run_migrations(self.db_path)
+        self.assertEqual(outcome["repaired"], ["notes_live_updated_index"])
+
+    async def test_hot_queries_avoid_full_scans_and_sorts(self):
+        await self._exec(NOTES_DDL, CATEGORIES_DDL)
+        await run_migrations(self.db_path)
+
+        plans = await explain_hot_queries(self.db_path)
+        for name in ("list_notes_page", "list_notes_keyset", "get_note", "notes_in_category", "change_feed"):
+            self.assertNotIn("error", plans[name], name)
+            self.assertFalse(plans[name]["full_scan"], (name, plans[name]["plan"]))
+            self.assertFalse(plans[name]["temp_sort"], (name, plans[name]["plan"]))
+
+    async def test_keyword_search_uses_fts_and_follows_app_writes(self):
+        await self._exec(NOTES_DDL, CATEGORIES_DDL)
+        await run_migrations(self.db_path)
+        await self._exec(
+            "INSERT INTO notes (id, title, plainText, createdAt, updatedAt) "
+            "VALUES ('n1', '网络笔记', 'NAT mapping and IPv6 routing', 1, 1)",
+            "INSERT INTO notes (id, title, plainText, createdAt, updatedAt, categoryId) "
+            "VALUES ('n2', 'Groceries', 'apple banana', 1, 2, 'c1')",
+        )
+        service = NoteService()
+        service.db_path = self.db_path
+
+        self.assertEqual([r["id"] for r in await service.keyword_search("ipv6 rout")], ["n1"])
+        self.assertEqual([r["id"] for r in await service.keyword_search("网络")], ["n1"])  # short: LIKE fallback
+        self.assertEqual(await service.keyword_search("banana", category_id="other"), [])
+
+        await self._exec("UPDATE notes SET plainText = 'kiwi only' WHERE id = 'n2'")
+        self.assertEqual(await service.keyword_search("banana"), [])
+        self.assertEqual([r["id"] for r in await service.keyword_search("kiwi")], ["n2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
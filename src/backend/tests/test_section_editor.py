@@ -0,0 +1,129 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.section_editor import _FORMAT_REQUEST_RE, edit_sections, merge_spans, parse_plan, split_sections  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def _note():
+    body = "这是一段很长的正文，用来把笔记撑到分段编辑的阈值以上。" * 20
+    return (
+        "Intro line.\n\n"
+        f"# Setup\n\n{body}\n\n"
+        "## Install\n\n```bash\n# not a heading\npip install x\n```\n\n"
+        f"## Usage\n\n{body}\n\n"
+        f"# FAQ\n\n{body}\n"
+    )
+
+
+class _FakeLLM:
+    def __init__(self, plan):
+        self.plan = plan
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, messages, config=None):
+        user = messages[-1].content
+        self.prompts.append(user)
+        if user.startswith("Outline:"):
+            return SimpleNamespace(content=self.plan)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        part = user.split("---\n", 1)[1].rsplit("\n---\n", 1)[0]
+        heading = part.splitlines()[0]
+        return SimpleNamespace(content=f"```markdown\n{heading}\n\nEDITED\n```")
+
+
+def _edit(llm, content, instruction="把 Usage 和 FAQ 改简洁"):
+    return asyncio.run(edit_sections(
+        llm, content, instruction, "sys", "strict", log=lambda msg: None,
+    ))
+
+
+def test_split_sections_round_trips_and_ignores_fenced_hashes():
+    note = _note()
+    sections = split_sections(note)
+
+    assert "".join(s.text for s in sections) == note
+    assert [(s.level, s.heading) for s in sections] == [
+        (0, ""), (1, "Setup"), (2, "Install"), (2, "Usage"), (1, "FAQ"),
+    ]
+    assert "pip install x" in sections[2].text
+
+
+def test_parse_plan_rejects_out_of_range_or_malformed_replies():
+    assert parse_plan('Sure: {"sections": [3, 1, 3]}', 5) == [1, 3]
+    assert parse_plan('{"sections": [7]}', 5) is None
+    assert parse_plan('{"sections": []}', 5) is None
+    assert parse_plan("sections 1 and 2", 5) is None
+
+
+def test_merge_spans_joins_adjacent_sections():
+    sections = split_sections(_note())
+    spans = merge_spans(sections, [1, 3, 4])
+    assert [(s.first, s.last) for s in spans] == [(1, 1), (3, 4)]
+    assert spans[1].text == sections[3].text + sections[4].text
+
+
+def test_only_planned_sections_are_regenerated_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "SECTION_EDIT_MIN_CHARS", 500)
+    monkeypatch.setattr(settings, "SECTION_EDIT_MAX_SHARE", 0.9)
+    note = _note()
+    sections = split_sections(note)
+    llm = _FakeLLM('{"sections": [1, 4]}')
+
+    edited = _edit(llm, note)
+
+    assert llm.max_active == 2
+    assert len(llm.prompts) == 3  # plan + two independent spans
+    edited_sections = split_sections(edited)
+    assert [s.heading for s in edited_sections] == ["", "Setup", "Install", "Usage", "FAQ"]
+    # Untouched sections are byte-identical; edited ones keep their spacing.
+    for index in (0, 2, 3):
+        assert edited_sections[index].text == sections[index].text
+    assert edited_sections[1].text == "# Setup\n\nEDITED\n\n"
+    assert edited_sections[4].text == "# FAQ\n\nEDITED\n"
+
+
+def test_falls_back_to_whole_note_edit(monkeypatch):
+    monkeypatch.setattr(settings, "SECTION_EDIT_MIN_CHARS", 500)
+    monkeypatch.setattr(settings, "SECTION_EDIT_MAX_SHARE", 0.6)
+    note = _note()
+
+    # Plan touching most of the note.
+    assert _edit(_FakeLLM('{"sections": [1, 3, 4]}'), note) is None
+    # Unusable plan.
+    assert _edit(_FakeLLM("I would edit the FAQ."), note) is None
+    # Formatting requests restructure the whole note; no planner call at all.
+    llm = _FakeLLM('{"sections": [4]}')
+    assert _edit(llm, note, instruction="整理格式") is None
+    assert llm.prompts == []
+    # Short notes.
+    monkeypatch.setattr(settings, "SECTION_EDIT_MIN_CHARS", len(note) + 1)
+    assert _edit(_FakeLLM('{"sections": [4]}'), note) is None
+
+
+def test_format_request_detection_matches_whole_words_only():
+    for instruction in ("Format this note", "reformat the tables", "帮我format一下", "Organize it", "整理格式"):
+        assert _FORMAT_REQUEST_RE.search(instruction), instruction
+    for instruction in ("Add more information to the Setup section", "Explain the transformation step",
+                        "Mention the informal tone", "补充 Usage 的内容"):
+        assert not _FORMAT_REQUEST_RE.search(instruction), instruction
+
+
+def test_information_request_uses_section_editing(monkeypatch):
+    monkeypatch.setattr(settings, "SECTION_EDIT_MIN_CHARS", 500)
+    monkeypatch.setattr(settings, "SECTION_EDIT_MAX_SHARE", 0.6)
+    llm = _FakeLLM('{"sections": [1]}')
+    edited = _edit(llm, _note(), instruction="Add more information to the Setup section")
+
+    assert edited is not None
+    assert split_sections(edited)[1].text == "# Setup\n\nEDITED\n\n"
@@ -0,0 +1,32 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from api import chat  # noqa: E402
+from core.database import close_all_pools  # noqa: E402
+
+
+class SessionTitleTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "checkpoints.db")
+
+    async def asyncTearDown(self):
+        chat._session_meta_ready.discard(self.db_path)
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def test_missing_table_reads_as_no_titles(self):
+        self.assertEqual(await chat._load_session_titles(self.db_path, ["s1"]), {})
+        self.assertFalse(await chat._has_session_title(self.db_path, "s1"))
+
+    async def test_saved_title_is_visible_through_read_only_connections(self):
+        await chat._save_session_title(self.db_path, "s1", "网络协议笔记")
+
+        self.assertEqual(await chat._load_session_titles(self.db_path, ["s1", "s2"]), {"s1": "网络协议笔记"})
+        self.assertTrue(await chat._has_session_title(self.db_path, "s1"))
+        self.assertIn(self.db_path, chat._session_meta_ready)
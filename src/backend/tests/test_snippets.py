@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.snippets import build_snippets, extract_snippet, split_sentences  # noqa: E402
+
+
+FILLER = "Nothing relevant is written in this sentence. " * 30
+
+
+def test_extract_snippet_prefers_matching_passage_over_prefix():
+    text = FILLER + "FAISS releases the GIL while searching shards. " + FILLER
+
+    snippet = extract_snippet("faiss gil", text, 200)
+
+    assert len(snippet["text"]) <= 200
+    assert "FAISS releases the GIL" in snippet["text"]
+    assert snippet["truncated"] is True
+    highlighted = [snippet["text"][s:e] for s, e in snippet["highlights"]]
+    assert highlighted == ["FAISS", "GIL"]
+
+
+def test_extract_snippet_handles_cjk_without_spaces():
+    text = "今天天气很好。" * 40 + "向量检索使用余弦相似度。" + "今天天气很好。" * 40
+
+    snippet = extract_snippet("向量检索", text, 60)
+
+    assert "向量检索使用余弦相似度" in snippet["text"]
+    assert [snippet["text"][s:e] for s, e in snippet["highlights"]] == ["向量检索"]
+
+
+def test_split_sentences_returns_trimmed_spans():
+    text = "First one.  Second one!\nThird"
+    assert [text[s:e] for s, e in split_sentences(text)] == ["First one.", "Second one!", "Third"]
+
+
+def test_build_snippets_shares_budget_and_rolls_over_unused_chars():
+    long_text = FILLER * 4
+    snippets = build_snippets("relevant", [long_text, "short note", long_text], 900)
+
+    assert sum(len(s["text"]) for s in snippets) <= 900
+    assert snippets[1]["text"] == "short note"
+    # The short hit's unused share goes to the last hit.
+    assert len(snippets[2]["text"]) > len(snippets[0]["text"])
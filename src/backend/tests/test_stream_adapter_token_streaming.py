@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from agent.stream_adapter import _may_become_control_text, langgraph_stream_to_sse
+
+
+class _FakeCompiledGraph:
+    def __init__(self, events):
+        self._events = events
+
+    async def astream(self, _input, _config, stream_mode=None):
+        for event in self._events:
+            yield event
+
+
+def _token(text, node="fast_chat", message_id="run-1"):
+    return ("messages", (AIMessageChunk(content=text, id=message_id), {"langgraph_node": node}))
+
+
+def _collect(events):
+    async def run():
+        return [json.loads(e) async for e in langgraph_stream_to_sse(_FakeCompiledGraph(events), {}, {})]
+    return asyncio.run(run())
+
+
+def test_fast_chat_tokens_are_forwarded_individually():
+    parts = _collect([
+        _token("Hel"),
+        _token("lo"),
+        _token(" there"),
+        _token("!"),
+        ("updates", {"fast_chat": {"messages": [AIMessage(content="Hello there!", id="run-1")]}}),
+    ])
+
+    deltas = [p["delta"] for p in parts if p.get("part_type") == "text"]
+    assert deltas == ["Hel", "lo", " there", "!"]
+
+
+def test_leaked_control_label_at_message_head_is_dropped():
+    parts = _collect([
+        _token("DENY", node="agent"),
+        _token("_WRITE", node="agent"),
+        _token("\n", node="agent"),
+        _token("该笔记", node="agent"),
+        _token("保持原文。", node="agent"),
+    ])
+
+    deltas = [p["delta"] for p in parts if p.get("part_type") == "text"]
+    assert "".join(deltas) == "该笔记保持原文。"
+
+
+def test_other_nodes_do_not_stream():
+    parts = _collect([_token("TASK", node="router"), _token("[Done] ok", node="status")])
+    assert [p for p in parts if p.get("part_type") == "text"] == []
+
+
+def test_fast_chat_update_is_emitted_when_no_tokens_were_streamed():
+    parts = _collect([
+        ("updates", {"fast_chat": {"messages": [AIMessage(content="Hi!", id="run-2")]}}),
+    ])
+    assert [p["delta"] for p in parts if p.get("part_type") == "text"] == ["Hi!"]
+
+
+def test_control_prefix_detection():
+    assert _may_become_control_text("")
+    assert _may_become_control_text("AL")
+    assert _may_become_control_text("DENY_WR")
+    assert not _may_become_control_text("Hello")
+    assert not _may_become_control_text("你好")
+    assert not _may_become_control_text("NO problem")
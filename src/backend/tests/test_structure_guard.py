@@ -0,0 +1,136 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.structure_guard import (  # noqa: E402
+    RESTEER_NOTE,
+    StructureWatcher,
+    generate_markdown_edit,
+    looks_like_structure_regression,
+    structure_guard_metrics,
+)
+from core.config import settings  # noqa: E402
+
+SOURCE = (
+    "# Plan\n\n"
+    + "".join(f"- item {i} with a short description\n" for i in range(8))
+    + "\n## Notes\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n"
+    + "Closing paragraph with some more words in it. " * 6
+)
+FLAT = "The plan has several items with short descriptions and some notes. " * 40
+STRUCTURED = SOURCE.replace("item", "task")
+
+
+class _StreamingLLM:
+    """Streams `first` in small chunks, answers the strict retry with `retry`."""
+
+    def __init__(self, first, retry=STRUCTURED, chunk=20):
+        self.first, self.retry, self.chunk = first, retry, chunk
+        self.streamed_chars = 0
+        self.stream_closed = False
+        self.invocations = []
+
+    async def astream(self, messages, config=None):
+        try:
+            for start in range(0, len(self.first), self.chunk):
+                piece = self.first[start:start + self.chunk]
+                self.streamed_chars += len(piece)
+                yield SimpleNamespace(content=piece)
+                await asyncio.sleep(0)
+        finally:
+            self.stream_closed = True
+
+    async def ainvoke(self, messages, config=None):
+        self.invocations.append(messages[0].content)
+        return SimpleNamespace(content=self.retry)
+
+
+def _generate(llm, source=SOURCE):
+    return asyncio.run(generate_markdown_edit(
+        llm, "sys", "sys STRICT", "edit it", source=source, log=lambda msg: None,
+    ))
+
+
+def test_watcher_flags_flattened_output_before_it_finishes(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURE_GUARD_MIN_CHARS", 300)
+    watcher = StructureWatcher(SOURCE)
+    doomed_at = None
+    for start in range(0, len(FLAT), 20):
+        if watcher.feed(FLAT[start:start + 20]):
+            doomed_at = watcher.emitted
+            break
+    assert doomed_at is not None and doomed_at < len(FLAT) // 2
+
+    # Structured output, a ```markdown wrapper included, is never flagged.
+    watcher = StructureWatcher(SOURCE)
+    assert not any(watcher.feed(part) for part in ("```markdown\n", *STRUCTURED.split(" ")))
+
+
+def test_prepended_summary_paragraph_is_not_mistaken_for_flattening(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURE_GUARD_MIN_CHARS", 300)
+    intro = "Summary: this plan lists the items we agreed on and what is left to decide. " * 6
+    edited = intro.strip() + "\n\n" + SOURCE
+    assert len(intro) > 400
+
+    watcher = StructureWatcher(SOURCE)
+    assert not any(watcher.feed(edited[i:i + 20]) for i in range(0, len(edited), 20))
+
+    structure_guard_metrics.clear()
+    llm = _StreamingLLM(edited)
+    assert _generate(llm) == edited.strip()
+    assert llm.invocations == []
+    assert structure_guard_metrics.stats()["early_aborts"] == 0
+
+
+def test_early_abort_re_steers_and_records_cost(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURE_GUARD_MIN_CHARS", 300)
+    structure_guard_metrics.clear()
+    llm = _StreamingLLM(FLAT)
+
+    result = _generate(llm)
+
+    assert result == STRUCTURED.strip()
+    assert llm.stream_closed and llm.streamed_chars < len(FLAT)
+    assert llm.invocations == ["sys STRICT" + RESTEER_NOTE]
+    stats = structure_guard_metrics.stats()
+    assert (stats["generations"], stats["early_aborts"], stats["late_regressions"]) == (1, 1, 0)
+    assert stats["retry_rate"] == 1.0
+    assert stats["avg_retry_cost_ms"] is not None
+
+
+def test_late_regression_still_retries_without_streaming(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURE_GUARD_STREAMING", False)
+    structure_guard_metrics.clear()
+    llm = _StreamingLLM(FLAT, retry="")
+
+    async def ainvoke(messages, config=None):
+        llm.invocations.append(messages[0].content)
+        return SimpleNamespace(content=FLAT if len(llm.invocations) == 1 else "")
+
+    llm.ainvoke = ainvoke
+    # Empty strict retry: the complete first attempt is kept.
+    assert _generate(llm) == FLAT.strip()
+    assert llm.invocations == ["sys", "sys STRICT"]
+    assert llm.streamed_chars == 0
+    stats = structure_guard_metrics.stats()
+    assert (stats["late_regressions"], stats["retries"], stats["streamed"]) == (1, 1, 0)
+
+
+def test_structured_edits_and_rewrites_pass_through(monkeypatch):
+    structure_guard_metrics.clear()
+    llm = _StreamingLLM(STRUCTURED)
+    assert _generate(llm) == STRUCTURED.strip()
+    assert llm.invocations == []
+
+    # force_rewrite has no source to preserve: plain generation, no guard.
+    llm = _StreamingLLM(FLAT, retry=FLAT)
+    assert _generate(llm, source=None) == FLAT.strip()
+    assert llm.streamed_chars == 0
+    stats = structure_guard_metrics.stats()
+    assert (stats["generations"], stats["streamed"], stats["retries"]) == (2, 1, 0)
+    assert not looks_like_structure_regression(SOURCE, STRUCTURED)
+    assert looks_like_structure_regression(SOURCE, FLAT)
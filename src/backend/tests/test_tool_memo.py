@@ -0,0 +1,132 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import aiosqlite
+from langchain_core.messages import ToolMessage
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.graph import NoteAgentGraph  # noqa: E402
+from agent.tool_memo import tool_memo  # noqa: E402
+from core.config import settings  # noqa: E402
+from core.database import close_all_pools  # noqa: E402
+from services.change_feed import get_change_feed  # noqa: E402
+
+
+class _CountingToolNode:
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, state):
+        call = state["messages"][0].tool_calls[0]
+        self.calls.append(call["name"])
+        return {"messages": [ToolMessage(
+            content=f"{call['name']} #{len(self.calls)}",
+            tool_call_id=call["id"],
+            name=call["name"],
+        )]}
+
+
+def _call(name, call_id, **args):
+    return {"id": call_id, "name": name, "args": args}
+
+
+class ToolMemoTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / "notes.db")
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                """
+                CREATE TABLE notes (
+                    id TEXT PRIMARY KEY, title TEXT, content TEXT, plainText TEXT,
+                    markdownSource TEXT, categoryId TEXT, isPinned INTEGER,
+                    isDeleted INTEGER, deletedAt INTEGER, createdAt INTEGER, updatedAt INTEGER
+                )
+                """
+            )
+            await db.execute("INSERT INTO notes VALUES ('n1', 'A', '<p>a</p>', 'a', NULL, NULL, 0, 0, NULL, 1, 1)")
+            await db.execute("INSERT INTO notes VALUES ('n2', 'B', '<p>b</p>', 'b', NULL, NULL, 0, 0, NULL, 1, 1)")
+            await db.commit()
+        db_path = self.db_path
+        self.db_patch = patch.object(type(settings), "NOTES_DB_PATH", new=property(lambda _self: db_path))
+        self.db_patch.start()
+        await get_change_feed().ensure_schema()
+        tool_memo.clear()
+
+        self.graph = NoteAgentGraph.__new__(NoteAgentGraph)
+        self.graph.tool_node = _CountingToolNode()
+
+    async def asyncTearDown(self):
+        tool_memo.clear()
+        self.db_patch.stop()
+        await close_all_pools()
+        self.tmpdir.cleanup()
+
+    async def _external_update(self, note_id):
+        # Simulates the Electron app editing a note through its own connection.
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("UPDATE notes SET plainText = 'edited', updatedAt = 2 WHERE id = ?", (note_id,))
+            await db.commit()
+
+    async def test_repeat_read_is_served_from_memo_and_flagged(self):
+        first = await self.graph._invoke_tool_call(_call("read_note_content", "c1", note_id="n1"), "s1")
+        second = await self.graph._invoke_tool_call(_call("read_note_content", "c2", note_id="n1"), "s1")
+
+        self.assertEqual(self.graph.tool_node.calls, ["read_note_content"])
+        self.assertEqual(second[0].content, first[0].content)
+        self.assertEqual(second[0].tool_call_id, "c2")
+        self.assertTrue(second[0].additional_kwargs.get("cached"))
+        self.assertFalse(first[0].additional_kwargs.get("cached"))
+
+    async def test_memo_is_scoped_to_the_thread(self):
+        await self.graph._invoke_tool_call(_call("read_note_content", "c1", note_id="n1"), "s1")
+        await self.graph._invoke_tool_call(_call("read_note_content", "c2", note_id="n1"), "s2")
+        await self.graph._invoke_tool_call(_call("read_note_content", "c3", note_id="n1"), "")
+
+        self.assertEqual(len(self.graph.tool_node.calls), 3)
+
+    async def test_external_edit_invalidates_only_the_affected_note(self):
+        for note_id in ("n1", "n2"):
+            await self.graph._invoke_tool_call(_call("read_note_content", f"r-{note_id}", note_id=note_id), "s1")
+        await self._external_update("n1")
+
+        await self.graph._invoke_tool_call(_call("read_note_content", "again-n2", note_id="n2"), "s1")
+        self.assertEqual(len(self.graph.tool_node.calls), 2)
+        reread = await self.graph._invoke_tool_call(_call("read_note_content", "again-n1", note_id="n1"), "s1")
+        self.assertEqual(len(self.graph.tool_node.calls), 3)
+        self.assertFalse(reread[0].additional_kwargs.get("cached"))
+
+    async def test_write_tool_invalidates_note_and_search_results(self):
+        await self.graph._invoke_tool_call(_call("read_note_content", "c1", note_id="n1"), "s1")
+        await self.graph._invoke_tool_call(_call("read_note_content", "c2", note_id="n2"), "s1")
+        await self.graph._invoke_tool_call(_call("search_knowledge", "c3", query="协议"), "s1")
+
+        tool_memo.invalidate_write("rename_note", {"note_id": "n2", "new_title": "B2"})
+        for call_id, name, args in (("d1", "read_note_content", {"note_id": "n1"}),
+                                    ("d2", "read_note_content", {"note_id": "n2"}),
+                                    ("d3", "search_knowledge", {"query": "协议"})):
+            await self.graph._invoke_tool_call(_call(name, call_id, **args), "s1")
+
+        # n1 stayed cached; n2 and the search ran again.
+        self.assertEqual(
+            self.graph.tool_node.calls,
+            ["read_note_content", "read_note_content", "search_knowledge", "read_note_content", "search_knowledge"],
+        )
+
+    async def test_errors_are_not_memoized(self):
+        async def failing(state):
+            call = state["messages"][0].tool_calls[0]
+            self.graph.tool_node.calls.append(call["name"])
+            return {"messages": [ToolMessage(content="Error: Note with ID n9 not found.", tool_call_id=call["id"])]}
+
+        self.graph.tool_node.ainvoke = failing
+        for call_id in ("c1", "c2"):
+            await self.graph._invoke_tool_call(_call("read_note_content", call_id, note_id="n9"), "s1")
+
+        self.assertEqual(len(self.graph.tool_node.calls), 2)
+        self.assertEqual(tool_memo.stats()["stores"], 0)
@@ -0,0 +1,40 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Ensure src/backend is importable when running from repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core import warmup  # noqa: E402
+from core.warmup import ReadinessTracker  # noqa: E402
+
+
+def test_readiness_reports_phase_status_and_timings(monkeypatch):
+    async def ok():
+        return None
+
+    async def skipped():
+        return "no API key"
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(warmup, "WARMUP_PHASES", [("a", ok), ("b", skipped), ("c", broken)])
+    tracker = ReadinessTracker()
+    assert tracker.snapshot()["state"] == "not_started"
+
+    asyncio.run(warmup.run_warmup(tracker))
+
+    snap = tracker.snapshot()
+    assert snap["ready"] is True
+    assert snap["state"] == "degraded"
+    assert [p["status"] for p in snap["phases"].values()] == ["ok", "skipped", "failed"]
+    assert snap["phases"]["b"]["detail"] == "no API key"
+    assert all(p["ms"] is not None for p in snap["phases"].values())
+
+
+def test_pending_phases_mean_warming():
+    tracker = ReadinessTracker()
+    tracker.register(["vector_index"])
+    assert tracker.ready is False
+    assert tracker.snapshot()["state"] == "warming"